@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 # Cargar variables de entorno desde .env
@@ -19,12 +20,129 @@ class Config:
     REDDIT_CLIENT_ID = os.getenv('REDDIT_CLIENT_ID')
     REDDIT_CLIENT_SECRET = os.getenv('REDDIT_CLIENT_SECRET')
     REDDIT_USER_AGENT = os.getenv('REDDIT_USER_AGENT', 'btc-dashboard:v1.0 (by /u/your_username)')
+
+    # Ingesta de comentarios de Reddit (hilos con alto engagement)
+    REDDIT_COMMENTS_MIN_ENGAGEMENT = int(os.getenv('REDDIT_COMMENTS_MIN_ENGAGEMENT', '100'))
+    REDDIT_COMMENTS_PER_THREAD = int(os.getenv('REDDIT_COMMENTS_PER_THREAD', '500'))
+    REDDIT_COMMENTS_PER_RUN = int(os.getenv('REDDIT_COMMENTS_PER_RUN', '2000'))
     
+    # Feeds RSS de noticias (separados por comas)
+    NEWS_FEEDS = [url.strip() for url in os.getenv(
+        'NEWS_FEEDS',
+        'https://www.coindesk.com/arc/outboundfeeds/rss/,'
+        'https://cointelegraph.com/rss/tag/bitcoin,'
+        'https://bitcoinmagazine.com/.rss/full/'
+    ).split(',') if url.strip()]
+    NEWS_MAX_WORKERS = int(os.getenv('NEWS_MAX_WORKERS', '8'))
+    NEWS_MAX_ARTICLES = int(os.getenv('NEWS_MAX_ARTICLES', '50'))
+
     # Cloudflare R2 / S3 Compatible Storage
     R2_ACCESS_KEY_ID = os.getenv('R2_ACCESS_KEY_ID')
     R2_SECRET_ACCESS_KEY = os.getenv('R2_SECRET_ACCESS_KEY')
     R2_ENDPOINT_URL = os.getenv('R2_ENDPOINT_URL')
     R2_BUCKET_NAME = os.getenv('R2_BUCKET_NAME')
+    R2_UPLOAD_WORKERS = int(os.getenv('R2_UPLOAD_WORKERS', '8'))  # Subidas simultáneas
+    R2_SKIP_UNCHANGED = os.getenv('R2_SKIP_UNCHANGED', 'True').lower() == 'true'  # Omitir archivos sin cambios
+    
+    # Publicación de snapshots para el frontend ('gzip', 'br' o 'none')
+    R2_PUBLISH_ENCODING = os.getenv('R2_PUBLISH_ENCODING', 'none').lower()
+    R2_COMPRESSION_LEVEL = int(os.getenv('R2_COMPRESSION_LEVEL', '6'))
+    R2_CACHE_CONTROL = os.getenv('R2_CACHE_CONTROL', 'public, max-age=60')
+    R2_MULTIPART_CHUNK_MB = int(os.getenv('R2_MULTIPART_CHUNK_MB', '8'))  # Mínimo 5 MB por parte en S3/R2
+    
+    # Snapshots inmutables particionados por fuente y fecha/hora
+    R2_SNAPSHOT_PREFIX = os.getenv('R2_SNAPSHOT_PREFIX', 'snapshots')
+    R2_LATEST_KEY = os.getenv('R2_LATEST_KEY', 'latest.json')
+    R2_IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+    R2_LATEST_CACHE_CONTROL = os.getenv('R2_LATEST_CACHE_CONTROL', 'public, max-age=30')
+    # Deltas JSON Patch entre versiones consecutivas; más allá de la cadena el cliente descarga el snapshot completo
+    R2_DELTA_PREFIX = os.getenv('R2_DELTA_PREFIX', 'deltas')
+    R2_DELTA_MAX_CHAIN = int(os.getenv('R2_DELTA_MAX_CHAIN', '24'))
+    
+    # Retención: los snapshots horarios se compactan en Parquet diarios bajo R2_COMPACTED_PREFIX
+    R2_COMPACTED_PREFIX = os.getenv('R2_COMPACTED_PREFIX', 'compacted')
+    # Políticas por fuente ('*' = por defecto); delete_after_days None conserva los diarios para siempre
+    RETENTION_POLICIES = json.loads(os.getenv('RETENTION_POLICIES', 'null')) or {
+        '*': {'compact_after_days': 2, 'delete_after_days': None},
+        'binance': {'compact_after_days': 1, 'delete_after_days': None},
+        'reddit': {'compact_after_days': 1, 'delete_after_days': 365},
+        'news': {'compact_after_days': 1, 'delete_after_days': 365}
+    }
+    
+    # Orquestador: tiempo máximo de ingesta por fuente en segundos ('*' = por defecto)
+    INGEST_TIMEOUTS = json.loads(os.getenv('INGEST_TIMEOUTS', 'null')) or {
+        '*': 300,
+        'reddit': 600
+    }
+    
+    # Daemon de planificación: cada cuántos segundos se refresca cada fuente
+    SCHEDULE_CADENCES = json.loads(os.getenv('SCHEDULE_CADENCES', 'null')) or {
+        'binance': 60,
+        'coinglass': 300,
+        'news': 300,
+        'reddit': 900,
+        'yfinance': 3600,
+        'fred': 21600
+    }
+    # Multiplicador máximo de la cadencia para fuentes cuyos datos no cambian
+    SCHEDULE_MAX_BACKOFF = int(os.getenv('SCHEDULE_MAX_BACKOFF', '8'))
+    
+    # Velas de Binance: solo se descargan las de KLINE_BASE_INTERVAL; KLINE_INTERVALS se construyen
+    # localmente a partir de ellas y KLINE_PRIMARY_INTERVAL es el que va al snapshot y a los indicadores
+    KLINE_BASE_INTERVAL = os.getenv('KLINE_BASE_INTERVAL', '1h')
+    KLINE_INTERVALS = [interval.strip() for interval in os.getenv('KLINE_INTERVALS', '4h,1d').split(',')
+                       if interval.strip()]
+    KLINE_PRIMARY_INTERVAL = os.getenv('KLINE_PRIMARY_INTERVAL', '4h')
+    KLINE_BASE_LIMIT = int(os.getenv('KLINE_BASE_LIMIT', '1000'))  # Máximo de Binance por petición
+    KLINE_SNAPSHOT_LIMIT = int(os.getenv('KLINE_SNAPSHOT_LIMIT', '500'))
+    
+    # Disponibilidad de las series diarias y macro (se guardan con la fecha de sesión u observación a
+    # las 00:00 UTC): horas tras esa fecha en que se conoce el cierre de yfinance (cierre de NY) y días
+    # de retraso de publicación de cada serie de FRED ('*' para el resto)
+    YFINANCE_AVAILABLE_AFTER_HOURS = float(os.getenv('YFINANCE_AVAILABLE_AFTER_HOURS', '21'))
+    FRED_RELEASE_LAG_DAYS = json.loads(os.getenv('FRED_RELEASE_LAG_DAYS', 'null')) or {
+        '*': 1,
+        'DTWEXBGS': 10,
+        'FEDFUNDS': 32,
+        'GS10': 32,
+        'CPIAUCSL': 45,
+        'UNRATE': 38
+    }
+    
+    # Indicadores técnicos calculados sobre los klines: {'name': indicador, ...parámetros}
+    INDICATORS = json.loads(os.getenv('INDICATORS', 'null')) or [
+        {'name': 'ema', 'period': 20},
+        {'name': 'ema', 'period': 50},
+        {'name': 'ema', 'period': 200},
+        {'name': 'rsi', 'period': 14},
+        {'name': 'macd', 'fast': 12, 'slow': 26, 'signal': 9},
+        {'name': 'atr', 'period': 14},
+        {'name': 'bollinger', 'period': 20, 'width': 2},
+        {'name': 'structure', 'lookback': 20}
+    ]
+    
+    # Volatilidad realizada: ventanas en días y estimadores; el régimen (baja/normal/alta/extrema) se
+    # clasifica con la ventana más corta del estimador indicado según umbrales de volatilidad anualizada en %
+    VOLATILITY_WINDOWS_DAYS = [int(days) for days in os.getenv('VOLATILITY_WINDOWS_DAYS', '7,30,90').split(',')]
+    VOLATILITY_ESTIMATORS = [name.strip() for name in os.getenv(
+        'VOLATILITY_ESTIMATORS', 'close_to_close,parkinson,garman_klass').split(',') if name.strip()]
+    VOLATILITY_REGIME_ESTIMATOR = os.getenv('VOLATILITY_REGIME_ESTIMATOR', 'garman_klass')
+    VOLATILITY_REGIME_THRESHOLDS = [float(value) for value in os.getenv(
+        'VOLATILITY_REGIME_THRESHOLDS', '35,60,90').split(',')]
+    
+    # Motor de decisión: umbrales del score total y plan de trade (stop en múltiplos de ATR, R:R mínimo)
+    SIGNAL_BUY_THRESHOLD = float(os.getenv('SIGNAL_BUY_THRESHOLD', '5'))
+    SIGNAL_SELL_THRESHOLD = float(os.getenv('SIGNAL_SELL_THRESHOLD', '-5'))
+    SIGNAL_STOP_ATR = float(os.getenv('SIGNAL_STOP_ATR', '1.5'))
+    SIGNAL_MIN_RR = float(os.getenv('SIGNAL_MIN_RR', '1.5'))
+    # Regímenes de volatilidad en los que no se abre operación (la decisión pasa a NEUTRAL)
+    SIGNAL_BLOCKED_REGIMES = [name.strip() for name in os.getenv('SIGNAL_BLOCKED_REGIMES', 'extrema').split(',')
+                              if name.strip()]
+    
+    # Backtesting: velas máximas por operación, comisión por lado y procesos del barrido de parámetros
+    BACKTEST_MAX_BARS = int(os.getenv('BACKTEST_MAX_BARS', '30'))
+    BACKTEST_FEE_RATE = float(os.getenv('BACKTEST_FEE_RATE', '0.001'))
+    BACKTEST_WORKERS = int(os.getenv('BACKTEST_WORKERS', '0'))
     
     # URLs de APIs
     BINANCE_BASE_URL = 'https://api.binance.com'
@@ -34,14 +152,22 @@ class Config:
     
     # Configuración de datos
     DATA_DIR = 'data'
+    STATE_DIR = os.path.join(DATA_DIR, '.state')  # Estado local entre ejecuciones (no se sube a R2)
+    TIMESERIES_DIR = os.path.join(DATA_DIR, 'timeseries')  # Series temporales en Parquet particionado por mes
+    TIMESERIES_DB = os.getenv('TIMESERIES_DB', os.path.join(DATA_DIR, 'timeseries.db'))  # Base SQLite indexada
     
     # Configuración de Flask
-    FLASK_HOST = '0.0.0.0'
-    FLASK_PORT = 5000
+    FLASK_HOST = os.getenv('FLASK_HOST', '0.0.0.0')
+    FLASK_PORT = int(os.getenv('FLASK_PORT', '5000'))
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     
+    # API de snapshots: segundos entre comprobaciones de cambios en los archivos y nivel de la
+    # compresión que se hace una vez por versión (gzip 1-9, brotli 0-11)
+    API_RELOAD_INTERVAL = float(os.getenv('API_RELOAD_INTERVAL', '1'))
+    API_COMPRESSION_LEVEL = int(os.getenv('API_COMPRESSION_LEVEL', '9'))
+    
     # Configuración de CORS
-    CORS_ORIGINS = ['*']  # Permitir todas las origins para desarrollo
+    CORS_ORIGINS = [origin.strip() for origin in os.getenv('CORS_ORIGINS', '*').split(',') if origin.strip()]
     
     @classmethod
     def validate_config(cls):
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+API Flask que sirve el último snapshot de cada fuente desde memoria
+Cada snapshot se lee, se compacta y se comprime (gzip y brotli) una sola vez por versión del archivo;
+las peticiones solo comprueban, como mucho cada Config.API_RELOAD_INTERVAL segundos, si el archivo
+cambió, y responden con los bytes ya comprimidos y un ETag fuerte (304 si el cliente ya lo tiene)
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+import threading
+import time
+from email.utils import formatdate
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
+
+from flask import Flask, Response, abort, request
+from flask_cors import CORS
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+from scripts.orchestrator import SOURCES
+from scripts.upload_to_r2 import brotli, compress_payload, encode_json_compact
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Snapshots servidos: nombre en la URL -> archivo en DATA_DIR
+SNAPSHOTS: Dict[str, str] = dict({source: spec[2] for source, spec in SOURCES.items()},
+                                 signals='salida_diaria.json')
+
+# Codificaciones en orden de preferencia del servidor ('identity' siempre disponible)
+ENCODINGS = (['br'] if brotli is not None else []) + ['gzip', 'identity']
+
+class Snapshot:
+    def __init__(self, name: str, payload: bytes, mtime: float, identity: Tuple[int, int], level: int):
+        """
+        Versión de un snapshot lista para servir: JSON compacto y sus variantes comprimidas
+        
+        Args:
+            name: Nombre del snapshot
+            payload: JSON compacto
+            mtime: Fecha de modificación del archivo (epoch en segundos)
+            identity: (mtime_ns, tamaño) del archivo del que se leyó
+            level: Nivel de compresión
+        """
+        self.name = name
+        self.identity = identity
+        self.last_modified = formatdate(mtime, usegmt=True)
+        digest = hashlib.sha256(payload).hexdigest()[:32]
+        self.bodies = {'identity': payload}
+        for encoding in ENCODINGS[:-1]:
+            self.bodies[encoding] = compress_payload(payload, encoding, level)
+        # Cada representación tiene su propio ETag fuerte (los bytes difieren entre codificaciones)
+        self.etags = {encoding: f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+                      for encoding in self.bodies}
+
+    def describe(self) -> Dict[str, Any]:
+        """Resumen del snapshot para el índice de la API"""
+        return {'name': self.name, 'etag': self.etags['identity'], 'last_modified': self.last_modified,
+                'bytes': {encoding: len(body) for encoding, body in self.bodies.items()}}
+
+class SnapshotCache:
+    def __init__(self, data_dir: Optional[str] = None, snapshots: Optional[Dict[str, str]] = None,
+                 reload_interval: Optional[float] = None, level: Optional[int] = None):
+        """
+        Inicializar la caché de snapshots
+        
+        Args:
+            data_dir: Directorio de los archivos (default: Config.DATA_DIR)
+            snapshots: {nombre: archivo} (default: SNAPSHOTS)
+            reload_interval: Segundos entre comprobaciones de cada archivo (default: Config.API_RELOAD_INTERVAL)
+            level: Nivel de compresión (default: Config.API_COMPRESSION_LEVEL)
+        """
+        self.data_dir = data_dir or Config.DATA_DIR
+        self.snapshots = snapshots if snapshots is not None else SNAPSHOTS
+        self.reload_interval = reload_interval if reload_interval is not None else Config.API_RELOAD_INTERVAL
+        self.level = level if level is not None else Config.API_COMPRESSION_LEVEL
+        self.entries: Dict[str, Optional[Snapshot]] = {}
+        self.next_check: Dict[str, float] = {}
+        self.reloads = 0
+        self.lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[Snapshot]:
+        """
+        Obtener la versión vigente de un snapshot, recargándolo si el archivo cambió
+        
+        Args:
+            name: Nombre del snapshot
+        
+        Returns:
+            Snapshot o None si no existe o nunca se pudo leer
+        """
+        if time.monotonic() >= self.next_check.get(name, 0.0):
+            with self.lock:
+                if time.monotonic() >= self.next_check.get(name, 0.0):
+                    self._refresh(name)
+                    self.next_check[name] = time.monotonic() + self.reload_interval
+        return self.entries.get(name)
+
+    def _refresh(self, name: str) -> None:
+        """Releer el archivo de un snapshot si su (mtime, tamaño) cambió"""
+        path = os.path.join(self.data_dir, self.snapshots[name])
+        current = self.entries.get(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.entries[name] = None
+            return
+        identity = (stat.st_mtime_ns, stat.st_size)
+        if current is not None and current.identity == identity:
+            return
+        try:
+            with open(path, 'rb') as f:
+                payload = encode_json_compact(json.loads(f.read()))
+        except Exception as e:
+            # Se sigue sirviendo la versión anterior; se reintenta en la próxima comprobación
+            logger.warning(f"No se pudo leer el snapshot {path}: {e}")
+            return
+        self.entries[name] = Snapshot(name, payload, stat.st_mtime, identity, self.level)
+        self.reloads += 1
+        logger.info(f"Snapshot {name} recargado ({len(payload)} bytes)")
+
+    def available(self) -> List[Snapshot]:
+        """Snapshots que existen ahora mismo"""
+        return [snapshot for snapshot in map(self.get, self.snapshots) if snapshot is not None]
+
+@lru_cache(maxsize=256)
+def negotiate_encoding(accept_encoding: str) -> str:
+    """
+    Elegir la codificación de la respuesta según la cabecera Accept-Encoding
+    
+    Args:
+        accept_encoding: Valor de la cabecera (puede ser vacío)
+    
+    Returns:
+        'br', 'gzip' o 'identity'
+    """
+    weights = {}
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            weights[coding] = quality
+    for encoding in ENCODINGS[:-1]:
+        if weights.get(encoding, weights.get('*', 0.0)) > 0:
+            return encoding
+    return 'identity'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Comparar un ETag con la cabecera If-None-Match (comparación débil, como exige RFC 9110)"""
+    if if_none_match.strip() == '*':
+        return True
+    return any(candidate.strip().removeprefix('W/') == etag for candidate in if_none_match.split(','))
+
+def create_app(cache: Optional[SnapshotCache] = None) -> Flask:
+    """
+    Crear la aplicación Flask de la API de snapshots
+    
+    Args:
+        cache: Caché de snapshots (default: una nueva sobre Config.DATA_DIR)
+    
+    Returns:
+        Aplicación Flask con CORS según Config.CORS_ORIGINS
+    """
+    cache = cache or SnapshotCache()
+    app = Flask(__name__)
+    app.config['snapshot_cache'] = cache
+    CORS(app, origins=Config.CORS_ORIGINS, expose_headers=['ETag'])
+
+    @app.get('/api/health')
+    def health():
+        return {'status': 'ok', 'snapshots': len(cache.available())}
+
+    @app.get('/api/snapshots')
+    def index():
+        return {'snapshots': [snapshot.describe() for snapshot in cache.available()]}
+
+    @app.get('/api/snapshots/<name>')
+    def snapshot(name):
+        if name not in cache.snapshots:
+            abort(404)
+        current = cache.get(name)
+        if current is None:
+            abort(404)
+        
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        etag = current.etags[encoding]
+        headers = {'ETag': etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache',
+                   'Last-Modified': current.last_modified}
+        if etag_matches(request.headers.get('If-None-Match', ''), etag):
+            return Response(status=304, headers=headers)
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return Response(current.bodies[encoding], status=200, headers=headers, mimetype='application/json')
+    
+    return app
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='API de snapshots servidos desde memoria')
+    parser.add_argument('--host', default=Config.FLASK_HOST, help=f"Dirección (default: {Config.FLASK_HOST})")
+    parser.add_argument('--port', type=int, default=Config.FLASK_PORT, help=f"Puerto (default: {Config.FLASK_PORT})")
+    
+    args = parser.parse_args()
+    
+    try:
+        cache = SnapshotCache()
+        loaded = cache.available()
+        print(f"📦 {len(loaded)}/{len(cache.snapshots)} snapshots en memoria desde {cache.data_dir}")
+        create_app(cache).run(host=args.host, port=args.port, debug=Config.FLASK_DEBUG, threaded=True)
+    
+    except Exception as e:
+        logger.error(f"Error en main: {e}")
+        print(f"❌ Error en la API: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Backtesting vectorizado de las reglas de decisión y barrido de parámetros
+Reproduce sobre todo el histórico de velas la decisión del motor de señales y el plan de trade
+(entrada al cierre, stop a un múltiplo del ATR, objetivo con el R:R mínimo) y reparte las
+combinaciones de parámetros entre procesos que leen los arrays de una memoria compartida,
+sin copiarlos a cada worker
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+from scripts.process_signals import SIGNAL_RULES, WEIGHTS, history_features, score_signals
+from scripts.volatility import blocked_codes
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Parámetros que se pueden barrer, además de 'weight:<señal>'
+PARAMS = ['buy_threshold', 'sell_threshold', 'stop_atr', 'min_rr', 'max_bars', 'fee_rate']
+
+# Entradas simuladas a la vez al buscar la salida de cada operación (acota la memoria)
+ENTRY_BLOCK = 65536
+
+# Arrays del worker, enlazados a la memoria compartida por _init_worker
+_WORKER_DATA: Dict[str, np.ndarray] = {}
+_WORKER_SHM: Optional[shared_memory.SharedMemory] = None
+
+class SharedArrays:
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        """
+        Copiar arrays de la misma longitud a un único bloque de memoria compartida
+        
+        Args:
+            arrays: {nombre: array}; se guardan como float64
+        """
+        names = list(arrays)
+        length = len(arrays[names[0]]) if names else 0
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, len(names) * length * 8))
+        block = np.ndarray((len(names), length), dtype=np.float64, buffer=self.shm.buf)
+        for row, name in enumerate(names):
+            block[row] = arrays[name]
+        del block
+        self.spec = {'name': self.shm.name, 'names': names, 'length': length}
+
+    def close(self) -> None:
+        """Liberar el bloque de memoria compartida"""
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self) -> 'SharedArrays':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def attach_arrays(spec: Dict[str, Any]) -> Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]:
+    """
+    Enlazar los arrays de un bloque de memoria compartida sin copiarlos
+    
+    Args:
+        spec: Descripción del bloque (ver SharedArrays.spec)
+    
+    Returns:
+        (bloque, {nombre: vista de solo lectura})
+    """
+    shm = shared_memory.SharedMemory(name=spec['name'])
+    block = np.ndarray((len(spec['names']), spec['length']), dtype=np.float64, buffer=shm.buf)
+    block.flags.writeable = False
+    return shm, {name: block[row] for row, name in enumerate(spec['names'])}
+
+def prepare_data(features: Dict[str, np.ndarray],
+                 rules: Optional[List[Dict[str, Any]]] = None) -> Dict[str, np.ndarray]:
+    """
+    Arrays que necesita el backtest: precios, ATR y el puntaje de cada señal en cada vela
+    
+    Los puntajes no dependen de los parámetros del barrido, así que se calculan una vez y cada
+    combinación solo los vuelve a ponderar.
+    
+    Args:
+        features: Matriz de variables del histórico (ver history_features)
+        rules: Tabla de reglas (default: SIGNAL_RULES)
+    
+    Returns:
+        {'high', 'low', 'close', 'atr', 'score:<señal>': array} y 'regime' (índice del régimen de
+        volatilidad) si las variables incluyen 'volatilidad'
+    """
+    data = {name: np.asarray(features[name], dtype=np.float64) for name in ('high', 'low', 'close', 'atr')}
+    result = score_signals(features, rules)
+    for signal, points in result['scores'].items():
+        data[f"score:{signal}"] = points
+    if 'volatilidad' in features:
+        data['regime'] = result['regime'].astype(np.float64)
+    return data
+
+def default_params(rules: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Parámetros actuales del motor de decisión (Config y pesos de la tabla de reglas)"""
+    rules = rules if rules is not None else SIGNAL_RULES
+    return {
+        'buy_threshold': Config.SIGNAL_BUY_THRESHOLD,
+        'sell_threshold': Config.SIGNAL_SELL_THRESHOLD,
+        'stop_atr': Config.SIGNAL_STOP_ATR,
+        'min_rr': Config.SIGNAL_MIN_RR,
+        'max_bars': Config.BACKTEST_MAX_BARS,
+        'fee_rate': Config.BACKTEST_FEE_RATE,
+        'blocked_regimes': list(Config.SIGNAL_BLOCKED_REGIMES),
+        'weights': {rule['signal']: WEIGHTS[rule['weight']] for rule in rules}
+    }
+
+def expand_grid(grid: Dict[str, List[Any]], rules: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Expandir una rejilla de parámetros en la lista de combinaciones
+    
+    Args:
+        grid: {parámetro: valores}; los pesos se barren con 'weight:<señal>'
+        rules: Tabla de reglas (default: SIGNAL_RULES)
+    
+    Returns:
+        Parámetros completos de cada combinación (lo no barrido toma el valor por defecto)
+    """
+    base = default_params(rules)
+    for key in grid:
+        if key.startswith('weight:'):
+            if key.split(':', 1)[1] not in base['weights']:
+                raise ValueError(f"Señal desconocida: {key.split(':', 1)[1]}")
+        elif key not in PARAMS:
+            raise ValueError(f"Parámetro desconocido: {key}")
+    
+    keys = list(grid)
+    combinations = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        params = dict(base, weights=dict(base['weights']))
+        for key, value in zip(keys, values):
+            if key.startswith('weight:'):
+                params['weights'][key.split(':', 1)[1]] = float(value)
+            else:
+                params[key] = value
+        combinations.append(params)
+    return combinations
+
+def simulate_exits(data: Dict[str, np.ndarray], entries: np.ndarray, direction: np.ndarray,
+                   params: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    Salida de una operación abierta en cada entrada, para todas las entradas a la vez
+    
+    La operación entra al cierre de la vela de la señal y sale en la primera vela posterior que toca
+    el stop o el objetivo; si una vela toca ambos cuenta el stop. Si ninguno se toca en 'max_bars'
+    velas, sale al cierre de la última.
+    
+    Args:
+        data: Arrays del backtest (ver prepare_data)
+        entries: Índices de las velas de entrada (ordenados)
+        direction: +1 largo, -1 corto, por entrada
+        params: Parámetros de la combinación
+    
+    Returns:
+        {'exit_index', 'exit_price', 'outcome' (0 tiempo, 1 objetivo, -1 stop), 'entry_price', 'risk'}
+    """
+    high, low, close, atr = data['high'], data['low'], data['close'], data['atr']
+    last = len(close) - 1
+    horizon = max(1, int(params['max_bars']))
+    offsets = np.arange(1, horizon + 1)
+    
+    entry_price = close[entries]
+    risk = params['stop_atr'] * atr[entries]
+    stop = entry_price - direction * risk
+    target = entry_price + direction * risk * params['min_rr']
+    exit_index = np.empty(len(entries), dtype=np.int64)
+    exit_price = np.empty(len(entries))
+    outcome = np.zeros(len(entries), dtype=np.int8)
+    
+    for begin in range(0, len(entries), ENTRY_BLOCK):
+        block = slice(begin, begin + ENTRY_BLOCK)
+        bars = entries[block, None] + offsets
+        inside = bars <= last
+        bars = np.minimum(bars, last)
+        sign = direction[block, None]
+        adverse = np.where(sign > 0, low[bars], high[bars])
+        favorable = np.where(sign > 0, high[bars], low[bars])
+        stop_hit = inside & (sign * (adverse - stop[block, None]) <= 0)
+        target_hit = inside & (sign * (favorable - target[block, None]) >= 0)
+        
+        first_stop = np.where(stop_hit.any(axis=1), stop_hit.argmax(axis=1), horizon)
+        first_target = np.where(target_hit.any(axis=1), target_hit.argmax(axis=1), horizon)
+        by_stop = (first_stop < horizon) & (first_stop <= first_target)
+        by_target = (first_target < horizon) & ~by_stop
+        
+        timeout_index = np.minimum(entries[block] + horizon, last)
+        exit_index[block] = np.where(by_stop, entries[block] + first_stop + 1,
+                                     np.where(by_target, entries[block] + first_target + 1, timeout_index))
+        exit_price[block] = np.where(by_stop, stop[block], np.where(by_target, target[block], close[timeout_index]))
+        outcome[block] = np.where(by_stop, -1, np.where(by_target, 1, 0))
+    
+    return {'exit_index': exit_index, 'exit_price': exit_price, 'outcome': outcome,
+            'entry_price': entry_price, 'risk': risk}
+
+def backtest(data: Dict[str, np.ndarray], params: Dict[str, Any], include_trades: bool = False) -> Dict[str, Any]:
+    """
+    Backtest de una combinación de parámetros con una sola posición abierta a la vez
+    
+    Args:
+        data: Arrays del backtest (ver prepare_data)
+        params: Parámetros completos (ver default_params)
+        include_trades: Incluir el detalle de cada operación
+    
+    Returns:
+        Parámetros y métricas: operaciones, acierto, PnL, drawdown máximo, profit factor...
+    """
+    if params['buy_threshold'] <= params['sell_threshold']:
+        raise ValueError("El umbral de compra debe ser mayor que el de venta")
+    
+    close, atr = data['close'], data['atr']
+    total = np.zeros(len(close))
+    for signal, weight in params['weights'].items():
+        total += data[f"score:{signal}"] * weight
+    
+    # Candidatas: velas con señal y precio/ATR válidos fuera de los regímenes bloqueados, salvo la
+    # última (no hay vela posterior)
+    tradable = np.isfinite(close) & np.isfinite(atr) & (atr > 0)
+    tradable[-1:] = False
+    if 'regime' in data:
+        tradable &= ~np.isin(data['regime'], blocked_codes(params.get('blocked_regimes')))
+    signal_side = np.where(total >= params['buy_threshold'], 1, np.where(total <= params['sell_threshold'], -1, 0))
+    entries = np.flatnonzero((signal_side != 0) & tradable)
+    direction = signal_side[entries].astype(np.float64)
+    exits = simulate_exits(data, entries, direction, params)
+    
+    # Una posición a la vez: tras cada operación, la siguiente es la primera señal posterior a su salida
+    following = np.searchsorted(entries, exits['exit_index'], side='right').tolist()
+    taken = []
+    position = 0
+    while position < len(entries):
+        taken.append(position)
+        position = following[position]
+    taken = np.asarray(taken, dtype=np.int64)
+    
+    side = direction[taken]
+    entry_price = exits['entry_price'][taken]
+    exit_price = exits['exit_price'][taken]
+    returns = side * (exit_price / entry_price - 1.0) - 2.0 * params['fee_rate']
+    equity = np.cumprod(1.0 + returns)
+    peaks = np.maximum.accumulate(np.concatenate(([1.0], equity)))[1:]
+    drawdown = 1.0 - equity / peaks if len(equity) else np.zeros(0)
+    gains, losses = returns[returns > 0].sum(), -returns[returns < 0].sum()
+    outcome = exits['outcome'][taken]
+    
+    result = {
+        'params': params,
+        'trades': int(len(taken)),
+        'longs': int((side > 0).sum()),
+        'shorts': int((side < 0).sum()),
+        'hit_rate': float((returns > 0).mean() * 100.0) if len(taken) else 0.0,
+        'total_return_pct': float((equity[-1] - 1.0) * 100.0) if len(taken) else 0.0,
+        'avg_return_pct': float(returns.mean() * 100.0) if len(taken) else 0.0,
+        'max_drawdown_pct': float(drawdown.max() * 100.0) if len(taken) else 0.0,
+        'profit_factor': float(gains / losses) if losses > 0 else None,
+        'avg_r_multiple': float((side * (exit_price - entry_price) / exits['risk'][taken]).mean()) if len(taken) else 0.0,
+        'targets': int((outcome == 1).sum()),
+        'stops': int((outcome == -1).sum()),
+        'timeouts': int((outcome == 0).sum()),
+        'exposure_pct': float((exits['exit_index'][taken] - entries[taken]).sum() / max(1, len(close)) * 100.0)
+    }
+    if include_trades:
+        result['trade_list'] = [
+            {'entry_index': int(entries[i]), 'exit_index': int(exits['exit_index'][i]),
+             'direction': 'LARGO' if direction[i] > 0 else 'CORTO', 'entry': float(exits['entry_price'][i]),
+             'exit': float(exits['exit_price'][i]), 'outcome': int(exits['outcome'][i]), 'return_pct': float(r * 100.0)}
+            for i, r in zip(taken.tolist(), returns.tolist())
+        ]
+    return result
+
+def _init_worker(spec: Dict[str, Any]) -> None:
+    """Enlazar en el worker los arrays de la memoria compartida (una vez por proceso)"""
+    global _WORKER_SHM, _WORKER_DATA
+    _WORKER_SHM, _WORKER_DATA = attach_arrays(spec)
+
+def _run_chunk(combinations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Ejecutar en el worker un lote de combinaciones"""
+    return [backtest(_WORKER_DATA, params) for params in combinations]
+
+def run_sweep(data: Dict[str, np.ndarray], combinations: List[Dict[str, Any]],
+              workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Ejecutar el backtest de cada combinación repartiendo el trabajo entre procesos
+    
+    Los arrays se copian una vez a memoria compartida y cada worker los enlaza al arrancar; a los
+    workers solo viajan los parámetros y vuelven las métricas.
+    
+    Args:
+        data: Arrays del backtest (ver prepare_data)
+        combinations: Parámetros de cada combinación (ver expand_grid)
+        workers: Procesos (default: Config.BACKTEST_WORKERS o uno por núcleo); 1 ejecuta en este proceso
+    
+    Returns:
+        Resultado de cada combinación, en el mismo orden
+    """
+    workers = workers or Config.BACKTEST_WORKERS or os.cpu_count() or 1
+    workers = min(workers, max(1, len(combinations)))
+    if workers == 1:
+        return [backtest(data, params) for params in combinations]
+    
+    # Varios lotes por worker para equilibrar la carga sin un envío por combinación
+    size = max(1, -(-len(combinations) // (workers * 4)))
+    chunks = [combinations[i:i + size] for i in range(0, len(combinations), size)]
+    with SharedArrays(data) as shared:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared.spec,)) as executor:
+            return [result for chunk in executor.map(_run_chunk, chunks) for result in chunk]
+
+def rank_results(results: List[Dict[str, Any]], key: str = 'total_return_pct') -> List[Dict[str, Any]]:
+    """Ordenar los resultados de mejor a peor según una métrica"""
+    return sorted(results, key=lambda result: result[key] if result[key] is not None else float('-inf'),
+                  reverse=key != 'max_drawdown_pct')
+
+def describe_params(params: Dict[str, Any], keys: List[str]) -> str:
+    """Texto corto con los parámetros barridos de una combinación"""
+    parts = []
+    for key in keys:
+        value = params['weights'][key.split(':', 1)[1]] if key.startswith('weight:') else params[key]
+        parts.append(f"{key.split(':', 1)[-1]}={value:g}")
+    return ' '.join(parts)
+
+def print_table(results: List[Dict[str, Any]], keys: List[str], top: int = 10) -> None:
+    """Imprimir la tabla de PnL, drawdown y acierto de las mejores combinaciones"""
+    print(f"  {'parámetros':<48}{'ops':>6}{'acierto%':>10}{'PnL%':>10}{'maxDD%':>9}{'PF':>7}{'R medio':>9}")
+    for result in results[:top]:
+        profit_factor = f"{result['profit_factor']:.2f}" if result['profit_factor'] is not None else '-'
+        print(f"  {describe_params(result['params'], keys):<48}{result['trades']:>6}{result['hit_rate']:>10.1f}"
+              f"{result['total_return_pct']:>10.1f}{result['max_drawdown_pct']:>9.1f}{profit_factor:>7}"
+              f"{result['avg_r_multiple']:>9.2f}")
+
+def parse_values(text: str) -> List[float]:
+    """Convertir '1,1.5,2' en [1.0, 1.5, 2.0]"""
+    return [float(value) for value in text.split(',') if value.strip()]
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Backtest de las reglas de decisión y barrido de parámetros')
+    parser.add_argument('--symbol', default='BTCUSDT', help='Par de trading (default: BTCUSDT)')
+    parser.add_argument('--interval', default='4h', help='Intervalo de las velas (default: 4h)')
+    parser.add_argument('--buy', default=None, help='Umbrales de compra separados por comas')
+    parser.add_argument('--sell', default=None, help='Umbrales de venta separados por comas')
+    parser.add_argument('--stop', default=None, help='Stops en múltiplos de ATR separados por comas')
+    parser.add_argument('--rr', default=None, help='Ratios riesgo/beneficio separados por comas')
+    parser.add_argument('--max-bars', default=None, help='Velas máximas por operación separadas por comas')
+    parser.add_argument('--weight', action='append', default=[],
+                        help="Pesos a barrer para una señal, p. ej. 'RSI=0,1,2' (repetible)")
+    parser.add_argument('--workers', '-w', type=int, default=None, help='Procesos (default: uno por núcleo)')
+    parser.add_argument('--sort', default='total_return_pct',
+                        choices=['total_return_pct', 'hit_rate', 'max_drawdown_pct', 'avg_r_multiple'],
+                        help='Métrica para ordenar la tabla')
+    parser.add_argument('--top', type=int, default=10, help='Combinaciones a mostrar')
+    parser.add_argument('--scaling', action='store_true', help='Medir la aceleración con 1, 2, 4... procesos')
+    
+    args = parser.parse_args()
+    
+    try:
+        grid = {}
+        for key, text in (('buy_threshold', args.buy), ('sell_threshold', args.sell), ('stop_atr', args.stop),
+                          ('min_rr', args.rr), ('max_bars', args.max_bars)):
+            if text:
+                grid[key] = parse_values(text)
+        for text in args.weight:
+            signal, values = text.split('=', 1)
+            grid[f"weight:{signal.strip()}"] = parse_values(values)
+        combinations = expand_grid(grid)
+        
+        features = history_features(args.symbol, args.interval)
+        if len(features['close']) == 0:
+            print(f"❌ No hay velas de {args.symbol} {args.interval} en la base de series temporales")
+            sys.exit(1)
+        data = prepare_data(features)
+        print(f"📈 {len(features['close'])} velas, {len(combinations)} combinaciones")
+        
+        if args.scaling:
+            counts = sorted({1} | {2 ** i for i in range(1, 8) if 2 ** i <= (os.cpu_count() or 1)} |
+                            {os.cpu_count() or 1})
+            baseline = None
+            for count in counts:
+                start = time.perf_counter()
+                run_sweep(data, combinations, workers=count)
+                elapsed = time.perf_counter() - start
+                baseline = baseline or elapsed
+                print(f"  {count:>3} procesos: {elapsed:.2f}s, {len(combinations) / elapsed:.1f} comb/s, "
+                      f"x{baseline / elapsed:.2f}")
+            return
+        
+        start = time.perf_counter()
+        results = rank_results(run_sweep(data, combinations, workers=args.workers), args.sort)
+        elapsed = time.perf_counter() - start
+        print_table(results, list(grid), args.top)
+        print(f"📊 {len(combinations)} combinaciones en {elapsed:.2f}s ({len(combinations) / elapsed:.1f} comb/s)")
+    
+    except Exception as e:
+        logger.error(f"Error en main: {e}")
+        print(f"❌ Error en el backtest: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de la API de snapshots
+Arranca la API en un proceso aparte fijado a un solo núcleo (o usa --url) y la bombardea con
+conexiones keep-alive concurrentes, primero descargando el snapshot comprimido y después con
+If-None-Match (respuestas 304), e informa de peticiones por segundo y latencias
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse
+import threading
+import http.client
+import multiprocessing
+from typing import Dict, List, Any, Optional
+from urllib.parse import urlsplit
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+
+def write_synthetic_snapshot(data_dir: str, candles: int = 500) -> None:
+    """
+    Escribir un binance_data.json sintético del tamaño de un snapshot real
+    
+    Args:
+        data_dir: Directorio donde escribirlo
+        candles: Número de velas
+    """
+    rng = random.Random(7)
+    price, klines = 60000.0, []
+    for i in range(candles):
+        close = price * (1 + rng.gauss(0, 0.01))
+        klines.append({'timestamp': 1735689600000 + i * 4 * 3600 * 1000, 'open': price,
+                       'high': max(price, close) * 1.002, 'low': min(price, close) * 0.998, 'close': close,
+                       'volume': rng.random() * 1000})
+        price = close
+    with open(os.path.join(data_dir, 'binance_data.json'), 'w', encoding='utf-8') as f:
+        json.dump({'source': 'binance', 'klines': klines}, f, indent=2)
+
+def serve(data_dir: str, host: str, port: int, cpu: Optional[int]) -> None:
+    """Proceso servidor: la API con el servidor WSGI multihilo de werkzeug, fijada a un núcleo"""
+    from werkzeug.serving import make_server
+    from scripts.api import SnapshotCache, create_app
+    
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+    import logging
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    make_server(host, port, create_app(SnapshotCache(data_dir)), threaded=True).serve_forever()
+
+def wait_ready(host: str, port: int, timeout: float = 10.0) -> None:
+    """Esperar a que el servidor responda en /api/health"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=1)
+            connection.request('GET', '/api/health')
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"La API no arrancó en {host}:{port}")
+            time.sleep(0.05)
+
+def load_test(host: str, port: int, path: str, concurrency: int, duration: float,
+              conditional: bool) -> Dict[str, Any]:
+    """
+    Lanzar peticiones concurrentes durante un tiempo fijo
+    
+    Args:
+        host: Servidor
+        port: Puerto
+        path: Ruta del snapshot
+        concurrency: Conexiones keep-alive simultáneas (un hilo por conexión)
+        duration: Segundos de prueba
+        conditional: Enviar If-None-Match con el ETag de la primera respuesta
+    
+    Returns:
+        Peticiones, peticiones por segundo, latencias p50/p99 en ms, bytes por respuesta y estados
+    """
+    headers = {'Accept-Encoding': 'br, gzip'}
+    connection = http.client.HTTPConnection(host, port)
+    connection.request('GET', path, headers=headers)
+    response = connection.getresponse()
+    body = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"{path} respondió {response.status}")
+    if conditional:
+        headers['If-None-Match'] = response.getheader('ETag')
+    connection.close()
+    
+    latencies: List[List[float]] = [[] for _ in range(concurrency)]
+    statuses: Dict[int, int] = {}
+    sizes: List[int] = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def worker(index):
+        client = http.client.HTTPConnection(host, port)
+        own, seen, size = latencies[index], {}, 0
+        while True:
+            begin = time.perf_counter()
+            if begin >= deadline:
+                break
+            client.request('GET', path, headers=headers)
+            reply = client.getresponse()
+            size = len(reply.read())
+            own.append(time.perf_counter() - begin)
+            seen[reply.status] = seen.get(reply.status, 0) + 1
+        client.close()
+        with lock:
+            sizes.append(size)
+            for status, count in seen.items():
+                statuses[status] = statuses.get(status, 0) + count
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    
+    ordered = sorted(latency for own in latencies for latency in own)
+    total = len(ordered)
+    return {
+        'requests': total,
+        'rps': total / elapsed if elapsed else 0.0,
+        'p50_ms': ordered[total // 2] * 1000 if total else 0.0,
+        'p99_ms': ordered[min(total - 1, int(total * 0.99))] * 1000 if total else 0.0,
+        'bytes': max(sizes) if sizes else len(body),
+        'statuses': statuses
+    }
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Prueba de carga de la API de snapshots')
+    parser.add_argument('--url', default=None,
+                        help='API ya arrancada, p. ej. http://127.0.0.1:5000 (default: arrancar una local)')
+    parser.add_argument('--snapshot', default='binance', help='Snapshot a pedir (default: binance)')
+    parser.add_argument('--data-dir', default=None,
+                        help=f"Directorio de snapshots de la API local (default: {Config.DATA_DIR}, "
+                             "o uno sintético si no hay snapshot)")
+    parser.add_argument('--port', type=int, default=5055, help='Puerto de la API local (default: 5055)')
+    parser.add_argument('--cpu', type=int, default=0, help='Núcleo al que se fija la API local (default: 0)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Conexiones simultáneas (default: 8)')
+    parser.add_argument('--duration', type=float, default=5.0, help='Segundos por escenario (default: 5)')
+    
+    args = parser.parse_args()
+    
+    server = None
+    try:
+        if args.url:
+            parts = urlsplit(args.url)
+            host, port = parts.hostname, parts.port or 80
+        else:
+            data_dir = args.data_dir or Config.DATA_DIR
+            from scripts.api import SNAPSHOTS
+            if not os.path.exists(os.path.join(data_dir, SNAPSHOTS[args.snapshot])):
+                data_dir = tempfile.mkdtemp()
+                write_synthetic_snapshot(data_dir)
+                args.snapshot = 'binance'
+                print(f"⚠️ Sin snapshots en {args.data_dir or Config.DATA_DIR}, se usa uno sintético")
+            host, port = '127.0.0.1', args.port
+            server = multiprocessing.Process(target=serve, args=(data_dir, host, port, args.cpu), daemon=True)
+            server.start()
+            print(f"🚀 API local en {host}:{port} (PID {server.pid}, núcleo {args.cpu}; "
+                  f"{os.cpu_count()} núcleos en la máquina)")
+        wait_ready(host, port)
+        
+        path = f"/api/snapshots/{args.snapshot}"
+        print(f"  {'escenario':<14}{'peticiones':>11}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'bytes':>9}  estados")
+        for label, conditional in (('200 comprimido', False), ('304 ETag', True)):
+            result = load_test(host, port, path, args.concurrency, args.duration, conditional)
+            statuses = ', '.join(f"{status}: {count}" for status, count in sorted(result['statuses'].items()))
+            print(f"  {label:<14}{result['requests']:>11}{result['rps']:>10.0f}{result['p50_ms']:>9.2f}"
+                  f"{result['p99_ms']:>9.2f}{result['bytes']:>9}  {statuses}")
+    
+    except Exception as e:
+        print(f"❌ Error en la prueba de carga: {e}")
+        sys.exit(1)
+    
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark de tamaño y tiempo de codificación de los snapshots publicados
+Compara el JSON indentado actual con JSON compacto y sus variantes gzip/brotli por archivo
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List, Any
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+from scripts.upload_to_r2 import encode_json_compact, compress_payload, brotli
+
+def time_call(func, repeat: int) -> tuple:
+    """
+    Ejecutar una función varias veces y devolver el resultado y el mejor tiempo en ms
+    
+    Args:
+        func: Función sin argumentos
+        repeat: Número de repeticiones
+    
+    Returns:
+        Tupla (resultado, milisegundos)
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+def benchmark_file(path: str, levels: List[int], repeat: int = 3) -> List[Dict[str, Any]]:
+    """
+    Medir tamaño y tiempo de codificación de un archivo JSON en cada variante
+    
+    Args:
+        path: Ruta del archivo JSON
+        levels: Niveles de compresión a probar
+        repeat: Repeticiones por medición
+    
+    Returns:
+        Lista de filas con variante, bytes, ratio y milisegundos
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    pretty, pretty_ms = time_call(lambda: json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8'), repeat)
+    stdlib, stdlib_ms = time_call(lambda: json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), repeat)
+    compact, compact_ms = time_call(lambda: encode_json_compact(data), repeat)
+    
+    rows = [
+        {'variant': 'indent=2', 'bytes': len(pretty), 'ms': pretty_ms},
+        {'variant': 'compact-json', 'bytes': len(stdlib), 'ms': stdlib_ms},
+        {'variant': 'compact', 'bytes': len(compact), 'ms': compact_ms}
+    ]
+    
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+    for encoding in encodings:
+        for level in levels:
+            payload, ms = time_call(lambda: compress_payload(compact, encoding, level), repeat)
+            rows.append({'variant': f"compact+{encoding}-{level}", 'bytes': len(payload), 'ms': compact_ms + ms})
+    
+    for row in rows:
+        row['ratio'] = row['bytes'] / len(pretty) if pretty else 0
+    return rows
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Benchmark de compresión de snapshots JSON')
+    parser.add_argument('files', nargs='*', help='Archivos JSON (default: todos los de DATA_DIR)')
+    parser.add_argument('--levels', default='1,6,9', help='Niveles de compresión separados por comas')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones por medición')
+    
+    args = parser.parse_args()
+    
+    files = args.files
+    if not files:
+        if not os.path.isdir(Config.DATA_DIR):
+            print(f"❌ Directorio de datos {Config.DATA_DIR} no existe")
+            sys.exit(1)
+        files = sorted(os.path.join(Config.DATA_DIR, f) for f in os.listdir(Config.DATA_DIR) if f.endswith('.json'))
+    
+    levels = [int(level) for level in args.levels.split(',')]
+    if brotli is None:
+        print("⚠️ brotli no está instalado, solo se mide gzip")
+    
+    for path in files:
+        print(f"\n📄 {os.path.basename(path)}")
+        print(f"  {'variante':<18}{'bytes':>12}{'ratio':>8}{'ms':>10}")
+        for row in benchmark_file(path, levels, args.repeat):
+            print(f"  {row['variant']:<18}{row['bytes']:>12}{row['ratio']:>8.2f}{row['ms']:>10.2f}")
+
+if __name__ == "__main__":
+    main()
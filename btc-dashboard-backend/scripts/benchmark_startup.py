@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark del tiempo de importación de los scripts con `python -X importtime`
+Falla si algún módulo supera el presupuesto de arranque o importa al cargar un cliente pesado
+(binance, boto3, praw, fredapi, yfinance, pandas, pyarrow...) que debería importarse en el primer uso
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+from typing import Dict, List, Any
+
+# Directorio del backend, desde el que se importan los módulos medidos
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos medidos por defecto
+MODULES = [
+    'scripts.cli',
+    'scripts.ingest_binance',
+    'scripts.ingest_coinglass',
+    'scripts.ingest_fred',
+    'scripts.ingest_yfinance',
+    'scripts.ingest_reddit',
+    'scripts.ingest_news',
+    'scripts.upload_to_r2',
+    'scripts.orchestrator',
+    'scripts.pipeline',
+    'scripts.scheduler',
+    'scripts.compact_snapshots'
+]
+
+# Paquetes que no deben importarse al cargar un script
+HEAVY_PACKAGES = {
+    'binance', 'boto3', 'botocore', 'praw', 'prawcore', 'fredapi', 'yfinance',
+    'pandas', 'pyarrow', 'numpy', 'requests', 'feedparser'
+}
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """
+    Parsear la salida de -X importtime
+    
+    Args:
+        stderr: Salida de error del intérprete
+    
+    Returns:
+        Lista de {'module', 'self_us', 'cumulative_us', 'depth'} en orden de finalización
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        rows.append({
+            'module': name.strip(),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2
+        })
+    return rows
+
+def measure_import(module: str, repeat: int = 3) -> Dict[str, Any]:
+    """
+    Medir la importación de un módulo en un intérprete nuevo (el mejor de `repeat` intentos)
+    
+    Args:
+        module: Nombre del módulo
+        repeat: Número de mediciones
+    
+    Returns:
+        Diccionario con 'cumulative_ms', los paquetes pesados importados y las importaciones más costosas
+    """
+    best = None
+    for _ in range(max(1, repeat)):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+            cwd=BACKEND_DIR, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"No se pudo importar {module}: {completed.stderr.strip().splitlines()[-1]}")
+        rows = parse_importtime(completed.stderr)
+        target = next((row for row in rows if row['module'] == module), None)
+        if target is None:
+            raise RuntimeError(f"{module} no aparece en la salida de -X importtime")
+        if best is None or target['cumulative_us'] < best[0]['cumulative_us']:
+            best = (target, rows)
+    
+    target, rows = best
+    # Importaciones provocadas por el módulo: las que terminan antes que él a mayor profundidad
+    index = rows.index(target)
+    children = []
+    for row in reversed(rows[:index]):
+        if row['depth'] <= target['depth']:
+            break
+        children.append(row)
+    
+    heavy = sorted({row['module'] for row in children if row['module'].split('.')[0] in HEAVY_PACKAGES})
+    top = sorted((row for row in children if row['depth'] == target['depth'] + 1),
+                 key=lambda row: row['cumulative_us'], reverse=True)[:3]
+    return {
+        'module': module,
+        'cumulative_ms': target['cumulative_us'] / 1000,
+        'heavy': heavy,
+        'top': [(row['module'], row['cumulative_us'] / 1000) for row in top]
+    }
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Medir el tiempo de importación de los scripts')
+    parser.add_argument('modules', nargs='*', help='Módulos a medir (default: todos los scripts)')
+    parser.add_argument('--budget-ms', type=float, default=150.0,
+                        help='Tiempo máximo de importación por módulo en ms')
+    parser.add_argument('--repeat', type=int, default=3, help='Mediciones por módulo (se toma la mejor)')
+    
+    args = parser.parse_args()
+    
+    failures = 0
+    print(f"  {'módulo':<28}{'ms':>9}  importaciones más costosas")
+    for module in args.modules or MODULES:
+        try:
+            result = measure_import(module, args.repeat)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            failures += 1
+            continue
+        
+        over_budget = result['cumulative_ms'] > args.budget_ms
+        status = "❌" if over_budget or result['heavy'] else "✅"
+        top = ', '.join(f"{name} {ms:.1f}" for name, ms in result['top'])
+        print(f"{status} {module:<28}{result['cumulative_ms']:>8.1f}  {top}")
+        if result['heavy']:
+            print(f"     importa al cargar: {', '.join(result['heavy'][:8])}")
+        if over_budget or result['heavy']:
+            failures += 1
+    
+    if failures:
+        print(f"\n⚠️ {failures} módulos superan el presupuesto de {args.budget_ms:.0f} ms o importan clientes pesados")
+        sys.exit(1)
+    print(f"\n🎉 Todos los módulos arrancan en menos de {args.budget_ms:.0f} ms")
+
+if __name__ == "__main__":
+    main()
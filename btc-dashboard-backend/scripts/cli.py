@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Punto de entrada único del backend
+Agrupa los scripts como subcomandos; cada subcomando importa su módulo solo al ejecutarse,
+así que --help, el listado de fuentes o un error de argumentos no cargan ningún cliente pesado
+"""
+
+import os
+import sys
+import argparse
+import importlib
+from typing import List, Optional
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Subcomando -> (módulo con main(), descripción)
+COMMANDS = {
+    'run': ('scripts.orchestrator', 'Ejecutar todas las ingestas en paralelo y subir los resultados'),
+    'pipeline': ('scripts.pipeline', 'Pipeline ingesta → señales → publicación con nodos en paralelo'),
+    'schedule': ('scripts.scheduler', 'Daemon de ingesta con cadencia por fuente'),
+    'upload': ('scripts.upload_to_r2', 'Subir archivos a Cloudflare R2'),
+    'signals': ('scripts.process_signals', 'Puntuar las señales y generar salida_diaria.json'),
+    'resample': ('scripts.resample', 'Reconstruir las temporalidades superiores desde las velas base'),
+    'backtest': ('scripts.backtest', 'Backtest de las reglas de decisión y barrido de parámetros'),
+    'volatility': ('scripts.volatility', 'Volatilidad realizada y régimen de volatilidad'),
+    'features': ('scripts.feature_matrix', 'Construir la matriz de variables de todas las fuentes'),
+    'indicators': ('scripts.indicator_state', 'Comprobar o reconstruir el estado incremental de indicadores'),
+    'api': ('scripts.api', 'API de snapshots servidos desde memoria con ETag'),
+    'compact': ('scripts.compact_snapshots', 'Compactar y aplicar retención a los snapshots en R2'),
+    'bench-startup': ('scripts.benchmark_startup', 'Medir el tiempo de importación de los scripts'),
+    'bench-compression': ('scripts.benchmark_compression', 'Benchmark de compresión de snapshots JSON'),
+    'bench-api': ('scripts.benchmark_api', 'Prueba de carga de la API de snapshots')
+}
+
+# Fuente -> módulo del ingester (mismo orden que el orquestador)
+INGESTERS = {
+    'binance': 'scripts.ingest_binance',
+    'coinglass': 'scripts.ingest_coinglass',
+    'fred': 'scripts.ingest_fred',
+    'yfinance': 'scripts.ingest_yfinance',
+    'reddit': 'scripts.ingest_reddit',
+    'news': 'scripts.ingest_news'
+}
+
+def build_parser() -> argparse.ArgumentParser:
+    """Construir el parser con un subcomando por script"""
+    parser = argparse.ArgumentParser(prog='cli.py', description='Backend del dashboard de Bitcoin')
+    subparsers = parser.add_subparsers(dest='command', metavar='<comando>')
+    
+    ingest = subparsers.add_parser('ingest', help='Ejecutar la ingesta de una fuente')
+    ingest.add_argument('source', choices=list(INGESTERS), help='Fuente a ingerir')
+    
+    subparsers.add_parser('sources', help='Listar las fuentes disponibles')
+    
+    for name, (_, description) in COMMANDS.items():
+        # Los argumentos propios de cada script se reenvían tal cual a su main()
+        subparsers.add_parser(name, help=description, add_help=False)
+    
+    return parser
+
+def run_module(module_name: str, prog: str, args: List[str]) -> None:
+    """
+    Importar un script y ejecutar su main() con los argumentos indicados
+    
+    Args:
+        module_name: Módulo con función main()
+        prog: Nombre a mostrar en la ayuda del script
+        args: Argumentos para el script
+    """
+    module = importlib.import_module(module_name)
+    sys.argv = [prog] + args
+    module.main()
+
+def main(argv: Optional[List[str]] = None):
+    """Función principal"""
+    argv = sys.argv[1:] if argv is None else argv
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    
+    if args.command is None:
+        parser.print_help()
+        sys.exit(1)
+    
+    if args.command == 'sources':
+        for source, module_name in INGESTERS.items():
+            print(f"  {source:<10} {module_name}")
+        return
+    
+    if args.command == 'ingest':
+        if rest:
+            parser.error(f"argumentos no reconocidos: {' '.join(rest)}")
+        run_module(INGESTERS[args.source], f"cli.py ingest {args.source}", [])
+        return
+    
+    module_name, _ = COMMANDS[args.command]
+    run_module(module_name, f"cli.py {args.command}", rest)
+
+if __name__ == "__main__":
+    main()
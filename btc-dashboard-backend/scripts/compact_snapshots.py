@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Job de retención y compactación de snapshots almacenados en R2
+Agrupa los snapshots horarios de cada fuente en archivos diarios Parquet y elimina los originales
+con peticiones delete_objects por lotes, según políticas configurables por fuente
+"""
+
+import io
+import os
+import re
+import sys
+import logging
+import argparse
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+from scripts.json_stream import dumps_bytes
+from scripts.lazy import lazy_import
+from scripts.upload_to_r2 import R2Uploader
+
+# pandas (y pyarrow para Parquet) solo se importan al compactar
+pd = lazy_import('pandas')
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class SnapshotRetentionJob:
+    def __init__(self, uploader: Optional[R2Uploader] = None, policies: Optional[Dict[str, Dict[str, Any]]] = None,
+                 dry_run: bool = False):
+        """
+        Inicializar el job de retención
+        
+        Args:
+            uploader: Uploader de R2 a reutilizar (opcional, se crea uno nuevo)
+            policies: Políticas por fuente; la clave '*' aplica a las fuentes sin política propia
+                      (default: Config.RETENTION_POLICIES)
+            dry_run: Solo calcular y registrar las acciones, sin escribir ni borrar nada
+        """
+        self.uploader = uploader or R2Uploader()
+        self.policies = policies if policies is not None else Config.RETENTION_POLICIES
+        self.dry_run = dry_run
+        self.snapshot_pattern = re.compile(
+            rf"^{re.escape(Config.R2_SNAPSHOT_PREFIX)}/(?P<source>[^/]+)/"
+            r"(?P<year>\d{4})/(?P<month>\d{2})/(?P<day>\d{2})/(?P<hour>\d{2})/[^/]+\.json$"
+        )
+        self.delta_pattern = re.compile(
+            rf"^{re.escape(Config.R2_DELTA_PREFIX)}/(?P<source>[^/]+)/(?P<version>\d+)\.json$"
+        )
+        self.compacted_pattern = re.compile(
+            rf"^{re.escape(Config.R2_COMPACTED_PREFIX)}/(?P<source>[^/]+)/"
+            r"(?P<year>\d{4})/(?P<month>\d{2})/[^/]+_(?P<date>\d{8})\.parquet$"
+        )
+
+    def get_policy(self, source: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtener la política de una fuente
+        
+        Args:
+            source: Nombre de la fuente
+        
+        Returns:
+            Política con 'prefix', 'compact_after_days' y 'delete_after_days', o None si no aplica ninguna
+        """
+        policy = self.policies.get(source, self.policies.get('*'))
+        if policy is None:
+            return None
+        return {
+            'prefix': policy.get('prefix', f"{Config.R2_SNAPSHOT_PREFIX}/{source}/"),
+            'compact_after_days': policy.get('compact_after_days', 2),
+            'delete_after_days': policy.get('delete_after_days')
+        }
+
+    def compacted_key(self, source: str, day: str) -> str:
+        """
+        Clave del archivo diario compactado
+        
+        Args:
+            source: Nombre de la fuente
+            day: Fecha en formato AAAAMMDD
+        
+        Returns:
+            Clave con formato <prefijo>/<fuente>/AAAA/MM/<fuente>_AAAAMMDD.parquet
+        """
+        return f"{Config.R2_COMPACTED_PREFIX}/{source}/{day[:4]}/{day[4:6]}/{source}_{day}.parquet"
+
+    def load_latest_copies(self) -> List[Dict[str, Any]]:
+        """
+        Cargar las fuentes de latest.json del bucket y de la copia local del uploader
+        
+        La copia local puede faltar (otro host o contenedor) o estar atrasada, así que se leen las
+        dos y se protege todo lo que cualquiera de ellas referencie.
+        
+        Returns:
+            Lista con el diccionario {fuente: entrada} de cada copia que se pudo leer
+        """
+        copies = []
+        try:
+            copies.append(self.uploader.download_json(Config.R2_LATEST_KEY)['sources'])
+        except Exception as e:
+            logger.warning(f"No se pudo leer {Config.R2_LATEST_KEY} del bucket: {e}")
+        if os.path.exists(self.uploader.latest_path):
+            copies.append(self.uploader.load_latest_manifest()['sources'])
+        if not copies:
+            raise RuntimeError(f"No se pudo leer {Config.R2_LATEST_KEY} ni del bucket ni en local: "
+                               "se aborta para no borrar snapshots vigentes")
+        return copies
+
+    def plan(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Calcular qué snapshots compactar y qué archivos compactados eliminar
+        
+        Args:
+            now: Momento de referencia (default: ahora en UTC)
+        
+        Returns:
+            Plan con 'compact' ({(fuente, día): [claves]}) y 'expire' ([claves])
+        """
+        now = now or datetime.utcnow()
+        
+        self.uploader.refresh_index(f"{Config.R2_SNAPSHOT_PREFIX}/", full=True)
+        self.uploader.refresh_index(f"{Config.R2_COMPACTED_PREFIX}/", full=True)
+        self.uploader.refresh_index(f"{Config.R2_DELTA_PREFIX}/", full=True)
+        
+        # Nunca tocar los snapshots a los que apunta latest.json (remoto o local)
+        copies = self.load_latest_copies()
+        protected = {entry['key'] for sources in copies for entry in sources.values() if entry}
+        # Inicio de la cadena de deltas de cada fuente: el más antiguo entre las copias
+        delta_from = {}
+        for sources in copies:
+            for source, entry in sources.items():
+                if entry and 'delta_from' in entry:
+                    delta_from[source] = min(delta_from.get(source, entry['delta_from']), entry['delta_from'])
+        
+        compact = defaultdict(list)
+        for obj in self.uploader.query_index(f"{Config.R2_SNAPSHOT_PREFIX}/"):
+            match = self.snapshot_pattern.match(obj['key'])
+            if not match or obj['key'] in protected:
+                continue
+            policy = self.get_policy(match['source'])
+            if policy is None or not obj['key'].startswith(policy['prefix']):
+                continue
+            day = f"{match['year']}{match['month']}{match['day']}"
+            day_end = datetime.strptime(day, '%Y%m%d') + timedelta(days=1)
+            if now - day_end >= timedelta(days=policy['compact_after_days']):
+                compact[(match['source'], day)].append(obj['key'])
+        
+        expire = []
+        for obj in self.uploader.query_index(f"{Config.R2_COMPACTED_PREFIX}/"):
+            match = self.compacted_pattern.match(obj['key'])
+            if not match:
+                continue
+            policy = self.get_policy(match['source'])
+            if policy is None or policy['delete_after_days'] is None:
+                continue
+            day_end = datetime.strptime(match['date'], '%Y%m%d') + timedelta(days=1)
+            if now - day_end >= timedelta(days=policy['delete_after_days']):
+                expire.append(obj['key'])
+        
+        # Deltas anteriores al inicio de la cadena vigente: ningún cliente los puede usar ya
+        for obj in self.uploader.query_index(f"{Config.R2_DELTA_PREFIX}/"):
+            match = self.delta_pattern.match(obj['key'])
+            if match and match['source'] in delta_from and int(match['version']) <= delta_from[match['source']]:
+                expire.append(obj['key'])
+        
+        return {'compact': dict(compact), 'expire': expire}
+
+    def build_daily_frame(self, source: str, keys: List[str]) -> 'pd.DataFrame':
+        """
+        Construir la tabla diaria con una fila por snapshot
+        
+        Cada fila guarda el snapshot completo en 'payload' (JSON compacto) y además las hojas
+        escalares de 'data' como columnas tipadas para poder consultarlas sin decodificar el JSON.
+        
+        Args:
+            source: Nombre de la fuente
+            keys: Claves de los snapshots del día
+        
+        Returns:
+            DataFrame ordenado por timestamp
+        """
+        rows = []
+        for key in sorted(keys):
+            snapshot = self.uploader.download_json(key)
+            row = {
+                'snapshot_key': key,
+                'source': source,
+                'timestamp_utc': snapshot.get('timestamp_utc'),
+                'payload': dumps_bytes(snapshot).decode('utf-8')
+            }
+            flat = pd.json_normalize(snapshot.get('data', {}), sep='.')
+            if not flat.empty:
+                for column, value in flat.iloc[0].items():
+                    if pd.api.types.is_scalar(value):
+                        row[f"data.{column}"] = value
+            rows.append(row)
+        
+        frame = pd.DataFrame(rows)
+        # Columnas con tipos mezclados entre snapshots se guardan como texto
+        for column in frame.columns:
+            if frame[column].dtype == object:
+                types = {type(v) for v in frame[column].dropna()}
+                if len(types) > 1:
+                    frame[column] = frame[column].map(lambda v: None if v is None else str(v))
+        return frame.sort_values('timestamp_utc', kind='stable').reset_index(drop=True)
+
+    def compact_day(self, source: str, day: str, keys: List[str]) -> bool:
+        """
+        Compactar los snapshots de un día en un archivo Parquet, fusionando con uno previo si existe
+        
+        Args:
+            source: Nombre de la fuente
+            day: Fecha en formato AAAAMMDD
+            keys: Claves de los snapshots del día
+        
+        Returns:
+            True si el archivo compactado se escribió correctamente
+        """
+        target = self.compacted_key(source, day)
+        frame = self.build_daily_frame(source, keys)
+        
+        # Snapshots tardíos: fusionar con el archivo ya compactado de ese día
+        if target in self.uploader.index['objects']:
+            response = self.uploader.s3_client.get_object(Bucket=self.uploader.bucket_name, Key=target)
+            previous = pd.read_parquet(io.BytesIO(response['Body'].read()))
+            frame = (pd.concat([previous, frame], ignore_index=True)
+                     .drop_duplicates('snapshot_key', keep='last')
+                     .sort_values('timestamp_utc', kind='stable')
+                     .reset_index(drop=True))
+        
+        buffer = io.BytesIO()
+        frame.to_parquet(buffer, index=False, compression='zstd')
+        
+        try:
+            self.uploader.s3_client.put_object(
+                Bucket=self.uploader.bucket_name,
+                Key=target,
+                Body=buffer.getvalue(),
+                ContentType='application/vnd.apache.parquet',
+                CacheControl=Config.R2_IMMUTABLE_CACHE_CONTROL,
+                Metadata={
+                    'uploaded_at': datetime.utcnow().isoformat(),
+                    'source': 'btc-dashboard-backend',
+                    'snapshots': str(len(frame))
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error al subir {target}: {e}")
+            return False
+        
+        logger.info(f"✅ {len(keys)} snapshots de {source} compactados en {target}")
+        return True
+
+    def run(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Ejecutar el job de retención completo
+        
+        Args:
+            now: Momento de referencia (default: ahora en UTC)
+        
+        Returns:
+            Resumen de días compactados y claves eliminadas
+        """
+        plan = self.plan(now)
+        summary = {
+            'dry_run': self.dry_run,
+            'days_compacted': 0,
+            'snapshots_compacted': 0,
+            'files_deleted': 0,
+            'plan': {
+                'compact': {f"{source}/{day}": len(keys) for (source, day), keys in plan['compact'].items()},
+                'expire': plan['expire']
+            }
+        }
+        
+        if self.dry_run:
+            for (source, day), keys in sorted(plan['compact'].items()):
+                logger.info(f"[dry-run] Compactaría {len(keys)} snapshots de {source} del {day} en "
+                            f"{self.compacted_key(source, day)}")
+            for key in plan['expire']:
+                logger.info(f"[dry-run] Eliminaría {key}")
+            return summary
+        
+        to_delete = []
+        for (source, day), keys in sorted(plan['compact'].items()):
+            try:
+                if self.compact_day(source, day, keys):
+                    # Solo se borran los originales cuando el archivo diario está escrito
+                    to_delete.extend(keys)
+                    summary['days_compacted'] += 1
+                    summary['snapshots_compacted'] += len(keys)
+            except Exception as e:
+                logger.error(f"Error al compactar {source} del {day}: {e}")
+        
+        to_delete.extend(plan['expire'])
+        summary['files_deleted'] = len(self.uploader.delete_files(to_delete)) if to_delete else 0
+        
+        logger.info(f"Retención completada: {summary['days_compacted']} días compactados, "
+                    f"{summary['files_deleted']} archivos eliminados")
+        return summary
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Compactar y aplicar retención a los snapshots en R2')
+    parser.add_argument('--dry-run', action='store_true', help='Mostrar las acciones sin ejecutarlas')
+    
+    args = parser.parse_args()
+    
+    try:
+        # Validar configuración
+        Config.validate_config()
+        
+        job = SnapshotRetentionJob(dry_run=args.dry_run)
+        summary = job.run()
+        
+        prefix = "🔍 [dry-run]" if args.dry_run else "✅"
+        print(f"{prefix} {len(summary['plan']['compact'])} días a compactar, "
+              f"{len(summary['plan']['expire'])} archivos compactados expirados")
+        if not args.dry_run:
+            print(f"✅ {summary['snapshots_compacted']} snapshots compactados, {summary['files_deleted']} archivos eliminados")
+    
+    except Exception as e:
+        logger.error(f"Error en main: {e}")
+        print(f"❌ Error en el job de retención: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+Matriz de variables de todas las fuentes en una única tabla por columnas indexada por tiempo
+Cada fila es una vela del intervalo principal; las series de las demás fuentes se alinean con el
+último valor ya publicado al cierre de la vela (forward-fill desde el instante de publicación, con
+antigüedad máxima por fuente) o se agregan dentro de la vela (posts de Reddit). La matriz se guarda
+en disco junto con un resumen por tramo de cada serie de entrada, y al volver a construirla solo se
+recalculan, fuente a fuente, las filas desde el primer tramo que cambió
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+from scripts.resample import interval_ms
+from scripts.storage import TimeSeriesDB, atomic_write, availability_lag_ms, to_epoch_ms
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Versión del formato de la caché (cambiarla invalida las matrices guardadas)
+MATRIX_VERSION = 2
+
+DAY_MS = 24 * 3600 * 1000
+
+def forward_fill(event_ts: np.ndarray, values: np.ndarray, at: np.ndarray, max_age_ms: int) -> np.ndarray:
+    """
+    Valor vigente de una serie en cada instante, si no es más antiguo que max_age_ms
+    
+    Args:
+        event_ts: Timestamps de la serie (ordenados)
+        values: Valores de la serie
+        at: Instantes en los que se consulta
+        max_age_ms: Antigüedad máxima del último valor; más allá el resultado es NaN
+    
+    Returns:
+        Array alineado con `at`
+    """
+    if len(event_ts) == 0:
+        return np.full(len(at), np.nan)
+    positions = np.searchsorted(event_ts, at, side='right') - 1
+    clipped = np.maximum(positions, 0)
+    valid = (positions >= 0) & (at - event_ts[clipped] <= max_age_ms)
+    return np.where(valid, values[clipped], np.nan)
+
+def bucket_sum(event_ts: np.ndarray, values: np.ndarray, bar_starts: np.ndarray, bar_ms: int) -> np.ndarray:
+    """
+    Suma de los valores de cada vela (eventos con bar_start <= timestamp < bar_start + bar_ms)
+    
+    Args:
+        event_ts: Timestamps de los eventos
+        values: Valor de cada evento
+        bar_starts: Apertura de cada vela (ordenadas)
+        bar_ms: Duración de la vela
+    
+    Returns:
+        Array alineado con las velas (0 en las velas sin eventos)
+    """
+    if len(bar_starts) == 0:
+        return np.zeros(0)
+    positions = np.searchsorted(bar_starts, event_ts, side='right') - 1
+    valid = (positions >= 0) & (event_ts < bar_starts[np.maximum(positions, 0)] + bar_ms)
+    return np.bincount(positions[valid], weights=values[valid], minlength=len(bar_starts))
+
+def _column_name(*parts: str) -> str:
+    """Nombre de columna en minúsculas y sin símbolos (p. ej. '^VIX' -> 'vix')"""
+    return re.sub(r'[^a-z0-9]+', '_', '_'.join(parts).lower()).strip('_')
+
+def _series(rows: List[Dict[str, Any]], column: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Timestamps y valores de una columna, sin las filas con el valor vacío"""
+    rows = [row for row in rows if row.get(column) is not None]
+    return (np.array([row['timestamp'] for row in rows], dtype=np.int64),
+            np.array([row[column] for row in rows], dtype=np.float64))
+
+def _grouped(rows: List[Dict[str, Any]], key: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Agrupar filas por el valor de una columna"""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(row[key], []).append(row)
+    return groups
+
+def _price_columns(rows: List[Dict[str, Any]], bar_starts: np.ndarray, bar_ms: int,
+                   max_age_ms: Optional[int]) -> Dict[str, np.ndarray]:
+    """
+    Precio, volumen y operaciones de cada vela (la vela con la misma apertura)
+    
+    Args:
+        rows: Registros de la serie ordenados por tiempo
+        bar_starts: Apertura de cada vela a calcular
+        bar_ms: Duración de la vela
+        max_age_ms: Sin uso: las velas se toman de su misma apertura
+    
+    Returns:
+        {'open', 'high', 'low', 'close', 'volume', 'trades', 'taker_buy_volume'}: array por vela
+    """
+    columns = {}
+    for field, name in (('open', 'open'), ('high', 'high'), ('low', 'low'), ('close', 'close'),
+                        ('volume', 'volume'), ('number_of_trades', 'trades'),
+                        ('taker_buy_base_asset_volume', 'taker_buy_volume')):
+        columns[name] = forward_fill(*_series(rows, field), bar_starts, 0)
+    return columns
+
+def _open_interest_columns(rows: List[Dict[str, Any]], bar_starts: np.ndarray, bar_ms: int,
+                           max_age_ms: Optional[int]) -> Dict[str, np.ndarray]:
+    """
+    Open interest vigente al cierre de cada vela
+    
+    Args:
+        rows: Registros de la serie ordenados por tiempo
+        bar_starts: Apertura de cada vela a calcular
+        bar_ms: Duración de la vela
+        max_age_ms: Antigüedad máxima del último dato
+    
+    Returns:
+        {'open_interest': array por vela}
+    """
+    return {'open_interest': forward_fill(*_series(rows, 'open_interest'), bar_starts + bar_ms - 1, max_age_ms)}
+
+def _funding_columns(rows: List[Dict[str, Any]], bar_starts: np.ndarray, bar_ms: int,
+                     max_age_ms: Optional[int]) -> Dict[str, np.ndarray]:
+    """
+    Funding rate medio entre exchanges vigente al cierre de cada vela
+    
+    Args:
+        rows: Registros de la serie ordenados por tiempo
+        bar_starts: Apertura de cada vela a calcular
+        bar_ms: Duración de la vela
+        max_age_ms: Antigüedad máxima del último dato
+    
+    Returns:
+        {'funding_rate': array por vela}
+    """
+    timestamps, rates = _series(rows, 'funding_rate')
+    unique_ts, groups = np.unique(timestamps, return_inverse=True)
+    mean_rates = np.bincount(groups, weights=rates, minlength=len(unique_ts)) / \
+        np.maximum(np.bincount(groups, minlength=len(unique_ts)), 1)
+    return {'funding_rate': forward_fill(unique_ts, mean_rates, bar_starts + bar_ms - 1, max_age_ms)}
+
+def _fred_columns(rows: List[Dict[str, Any]], bar_starts: np.ndarray, bar_ms: int,
+                  max_age_ms: Optional[int]) -> Dict[str, np.ndarray]:
+    """
+    Última observación ya publicada de cada serie de FRED al cierre de cada vela
+    
+    Args:
+        rows: Registros de la serie ordenados por tiempo
+        bar_starts: Apertura de cada vela a calcular
+        bar_ms: Duración de la vela
+        max_age_ms: Antigüedad máxima desde la publicación
+    
+    Returns:
+        {'fred_<serie>': array por vela}
+    """
+    columns = {}
+    for series_id, group in _grouped(rows, 'series_id').items():
+        timestamps, values = _series(group, 'value')
+        published = timestamps + availability_lag_ms('fred_observations', series_id)
+        columns[_column_name('fred', series_id)] = forward_fill(published, values, bar_starts + bar_ms - 1,
+                                                                max_age_ms)
+    return columns
+
+def _yfinance_columns(rows: List[Dict[str, Any]], bar_starts: np.ndarray, bar_ms: int,
+                      max_age_ms: Optional[int]) -> Dict[str, np.ndarray]:
+    """
+    Último cierre diario ya conocido de cada ticker y su variación, al cierre de cada vela
+    
+    Args:
+        rows: Registros de la serie ordenados por tiempo
+        bar_starts: Apertura de cada vela a calcular
+        bar_ms: Duración de la vela
+        max_age_ms: Antigüedad máxima desde el cierre de la sesión
+    
+    Returns:
+        {'<ticker>_close', '<ticker>_change' (en %)}: array por vela
+    """
+    columns = {}
+    for symbol, group in _grouped(rows, 'symbol').items():
+        timestamps, closes = _series(group, 'close')
+        timestamps = timestamps + availability_lag_ms('yfinance_daily')
+        closes_at = bar_starts + bar_ms - 1
+        columns[_column_name(symbol, 'close')] = forward_fill(timestamps, closes, closes_at, max_age_ms)
+        changes = np.full(len(closes), np.nan)
+        changes[1:] = (closes[1:] / closes[:-1] - 1.0) * 100.0
+        columns[_column_name(symbol, 'change')] = forward_fill(timestamps, changes, closes_at, max_age_ms)
+    return columns
+
+def _reddit_columns(rows: List[Dict[str, Any]], bar_starts: np.ndarray, bar_ms: int,
+                    max_age_ms: Optional[int]) -> Dict[str, np.ndarray]:
+    """
+    Número de posts, score y comentarios de Reddit publicados dentro de cada vela
+    
+    Args:
+        rows: Registros de la serie ordenados por tiempo
+        bar_starts: Apertura de cada vela a calcular
+        bar_ms: Duración de la vela
+        max_age_ms: Sin uso: los posts se agregan por vela
+    
+    Returns:
+        {'reddit_posts', 'reddit_score', 'reddit_comments'}: array por vela (0 sin posts)
+    """
+    timestamps = np.array([row['timestamp'] for row in rows], dtype=np.int64)
+    return {
+        'reddit_posts': bucket_sum(timestamps, np.ones(len(rows)), bar_starts, bar_ms),
+        'reddit_score': bucket_sum(timestamps, np.array([row['score'] or 0 for row in rows], dtype=np.float64),
+                                   bar_starts, bar_ms),
+        'reddit_comments': bucket_sum(timestamps, np.array([row['num_comments'] or 0 for row in rows],
+                                                           dtype=np.float64), bar_starts, bar_ms)
+    }
+
+# Fuentes de la matriz: serie de entrada, filtros, columnas que resumen cada tramo, antigüedad máxima
+# del forward-fill (None: eventos agregados dentro de la vela), histórico extra que necesita el cálculo
+# (lookback_ms, p. ej. el cierre anterior para la variación) y función que calcula sus columnas
+SOURCES: Dict[str, Dict[str, Any]] = {
+    'price': {
+        'dataset': 'binance_klines',
+        'filters': lambda symbol, interval: {'symbol': symbol, 'interval': interval},
+        'checksum': ['open', 'high', 'low', 'close', 'volume'],
+        'max_age_ms': 0,
+        'build': _price_columns
+    },
+    'open_interest': {
+        'dataset': 'binance_open_interest',
+        'filters': lambda symbol, interval: {'symbol': symbol},
+        'checksum': ['open_interest'],
+        'max_age_ms': DAY_MS,
+        'build': _open_interest_columns
+    },
+    'funding': {
+        'dataset': 'coinglass_funding_rates',
+        'filters': lambda symbol, interval: {'symbol': symbol.replace('USDT', '')},
+        'checksum': ['funding_rate'],
+        'max_age_ms': DAY_MS,
+        'build': _funding_columns
+    },
+    'fred': {
+        'dataset': 'fred_observations',
+        'filters': lambda symbol, interval: {},
+        'checksum': ['value'],
+        'max_age_ms': 45 * DAY_MS,
+        'build': _fred_columns
+    },
+    'yfinance': {
+        'dataset': 'yfinance_daily',
+        'filters': lambda symbol, interval: {},
+        'checksum': ['close'],
+        'max_age_ms': 5 * DAY_MS,
+        'lookback_ms': 10 * DAY_MS,
+        'build': _yfinance_columns
+    },
+    'reddit': {
+        'dataset': 'reddit_posts',
+        'filters': lambda symbol, interval: {},
+        'checksum': ['score', 'num_comments'],
+        'max_age_ms': None,
+        'build': _reddit_columns
+    }
+}
+
+def cache_path(symbol: str, interval: str) -> str:
+    """
+    Ruta de la matriz guardada de un par e intervalo (junto al almacén de series temporales)
+    
+    Args:
+        symbol: Par de trading
+        interval: Intervalo de las velas
+    
+    Returns:
+        Ruta del archivo .npz
+    """
+    return os.path.join(Config.TIMESERIES_DIR, 'feature_matrix', f"{symbol}_{interval}.npz")
+
+def _sources_signature() -> Dict[str, Any]:
+    """Lo que define cada fuente en la caché y los retrasos de publicación: si cambia, la caché no sirve"""
+    signature = {name: {'dataset': spec['dataset'], 'checksum': spec['checksum'], 'max_age_ms': spec['max_age_ms']}
+                 for name, spec in SOURCES.items()}
+    signature['availability'] = {'yfinance_hours': Config.YFINANCE_AVAILABLE_AFTER_HOURS,
+                                 'fred_days': Config.FRED_RELEASE_LAG_DAYS}
+    return signature
+
+def load_cache(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Leer una matriz guardada
+    
+    Args:
+        path: Ruta del archivo .npz
+    
+    Returns:
+        {'timestamp', 'columns', 'sources' (columnas de cada fuente), 'checksums'} o None si no existe,
+        es ilegible o es de otra versión
+    """
+    try:
+        with np.load(path, allow_pickle=False) as archive:
+            meta = json.loads(str(archive['meta']))
+            if meta.get('version') != MATRIX_VERSION or meta.get('signature') != _sources_signature():
+                logger.info(f"La definición de la matriz cambió, se reconstruye {path}")
+                return None
+            return {
+                'timestamp': archive['timestamp'],
+                'columns': {name: archive[f"col:{name}"] for cols in meta['sources'].values() for name in cols},
+                'sources': meta['sources'],
+                'checksums': {name: archive[f"chk:{name}"] for name in meta['sources']}
+            }
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Matriz de variables ilegible en {path}, se reconstruye: {e}")
+        return None
+
+def save_cache(path: str, timestamps: np.ndarray, columns: Dict[str, np.ndarray],
+               sources: Dict[str, List[str]], checksums: Dict[str, np.ndarray]) -> None:
+    """
+    Guardar la matriz y el resumen de sus entradas de forma atómica
+    
+    Args:
+        path: Ruta del archivo .npz
+        timestamps: Apertura de cada vela
+        columns: {columna: array}
+        sources: {fuente: columnas que produce}
+        checksums: {fuente: array (n, 3) con tramo, filas y suma}
+    """
+    meta = {'version': MATRIX_VERSION, 'signature': _sources_signature(), 'sources': sources}
+    arrays = {'meta': np.array(json.dumps(meta)), 'timestamp': timestamps}
+    arrays.update({f"col:{name}": values for name, values in columns.items()})
+    arrays.update({f"chk:{name}": values for name, values in checksums.items()})
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, buffer.getvalue())
+
+def _first_change(previous: Optional[np.ndarray], current: np.ndarray) -> Optional[int]:
+    """Inicio del primer tramo que difiere entre dos resúmenes (None si son iguales)"""
+    if previous is None or len(previous) == 0:
+        return int(current[0, 0]) if len(current) else None
+    length = min(len(previous), len(current))
+    differs = np.flatnonzero(np.any(previous[:length] != current[:length], axis=1))
+    if len(differs):
+        return int(min(previous[differs[0], 0], current[differs[0], 0]))
+    if len(previous) != len(current):
+        longer = current if len(current) > len(previous) else previous
+        return int(longer[length, 0])
+    return None
+
+def build_feature_matrix(symbol: str = 'BTCUSDT', interval: Optional[str] = None, use_cache: bool = True,
+                         db: Optional[TimeSeriesDB] = None) -> Dict[str, Any]:
+    """
+    Construir o actualizar la matriz de variables de todas las fuentes
+    
+    Con caché, cada fuente compara su resumen por tramos con el guardado y solo recalcula sus
+    columnas desde la primera vela afectada por un tramo distinto (las velas nuevas siempre se
+    calculan); las demás filas se reutilizan.
+    
+    Args:
+        symbol: Par de trading
+        interval: Intervalo de las velas (default: Config.KLINE_PRIMARY_INTERVAL)
+        use_cache: Reutilizar la matriz guardada y guardar el resultado
+        db: Base de series temporales (default: una nueva sobre Config.TIMESERIES_DB)
+    
+    Returns:
+        {'timestamp': aperturas, 'columns': {columna: array}, 'rebuilt': {fuente: filas recalculadas},
+        'seconds': duración}
+    """
+    start = time.perf_counter()
+    interval = interval or Config.KLINE_PRIMARY_INTERVAL
+    bar_ms = interval_ms(interval)
+    path = cache_path(symbol, interval)
+    own_db = db is None
+    db = db or TimeSeriesDB()
+    try:
+        checksums = {}
+        for name, spec in SOURCES.items():
+            rows = db.bucket_checksums(spec['dataset'], bar_ms, spec['checksum'], spec['filters'](symbol, interval))
+            checksums[name] = np.array([[row['bucket'], row['count'], row['total']] for row in rows],
+                                       dtype=np.float64).reshape(-1, 3)
+        
+        # El índice son las velas del intervalo principal
+        timestamps = np.array([row['timestamp'] for row in db.query_range(
+            'binance_klines', filters=SOURCES['price']['filters'](symbol, interval), columns=['timestamp'])],
+            dtype=np.int64)
+        cached = load_cache(path) if use_cache else None
+        if cached is not None and not np.array_equal(cached['timestamp'], timestamps[:len(cached['timestamp'])]):
+            logger.info("Las velas guardadas cambiaron de índice, se reconstruye la matriz completa")
+            cached = None
+        first_new = len(cached['timestamp']) if cached is not None else 0
+        
+        columns: Dict[str, np.ndarray] = {}
+        sources: Dict[str, List[str]] = {}
+        rebuilt: Dict[str, int] = {}
+        closes = timestamps + bar_ms - 1
+        for name, spec in SOURCES.items():
+            # Primera fila a recalcular: la que cierra después del primer tramo distinto, o la primera nueva
+            changed = _first_change(cached['checksums'].get(name) if cached is not None else None, checksums[name])
+            begin = first_new
+            if changed is not None:
+                begin = min(begin, int(np.searchsorted(closes, changed)))
+            if cached is None:
+                begin = 0
+            rebuilt[name] = len(timestamps) - begin
+            
+            previous = {column: cached['columns'][column][:begin] for column in cached['sources'].get(name, [])} \
+                if cached is not None else {}
+            max_age = spec['max_age_ms']
+            fresh = {}
+            if begin < len(timestamps):
+                read_from = int(timestamps[begin]) - (max_age or 0) - spec.get('lookback_ms', 0) - \
+                    availability_lag_ms(spec['dataset'])
+                rows = db.query_range(spec['dataset'], start=read_from, end=int(closes[-1]) + 1,
+                                      filters=spec['filters'](symbol, interval))
+                fresh = spec['build'](rows, timestamps[begin:], bar_ms, max_age)
+            
+            if begin > 0 and set(fresh) - set(previous):
+                # Apareció una columna nueva (p. ej. otra serie de FRED): la fuente se recalcula entera
+                rows = db.query_range(spec['dataset'], filters=spec['filters'](symbol, interval))
+                fresh = spec['build'](rows, timestamps, bar_ms, max_age)
+                previous, begin = {}, 0
+                rebuilt[name] = len(timestamps)
+            # Las columnas sin datos en el tramo recalculado quedan vacías (0 si son conteos por vela)
+            missing = np.zeros(len(timestamps) - begin) if max_age is None else np.full(len(timestamps) - begin, np.nan)
+            names = sorted(set(previous) | set(fresh))
+            for column in names:
+                columns[column] = np.concatenate((previous.get(column, np.zeros(0)), fresh.get(column, missing)))
+            sources[name] = names
+        
+        if use_cache:
+            save_cache(path, timestamps, columns, sources, checksums)
+    finally:
+        if own_db:
+            db.close()
+    
+    elapsed = time.perf_counter() - start
+    logger.info(f"Matriz de {symbol} {interval}: {len(timestamps)} filas x {len(columns)} columnas "
+                f"en {elapsed * 1000:.1f} ms; filas recalculadas {rebuilt}")
+    return {'timestamp': timestamps, 'columns': columns, 'rebuilt': rebuilt, 'seconds': elapsed}
+
+def row_at(matrix: Dict[str, Any], at: Any) -> Optional[Dict[str, Any]]:
+    """
+    Todas las variables vigentes en un instante (la última vela abierta antes de `at`)
+    
+    Args:
+        matrix: Salida de build_feature_matrix
+        at: Instante (ms, datetime o ISO)
+    
+    Returns:
+        {'timestamp', columna: valor (None si NaN)} o None si `at` es anterior a la primera vela
+    """
+    position = int(np.searchsorted(matrix['timestamp'], to_epoch_ms(at), side='right')) - 1
+    if position < 0:
+        return None
+    row = {'timestamp': int(matrix['timestamp'][position])}
+    for name, values in matrix['columns'].items():
+        value = float(values[position])
+        row[name] = None if np.isnan(value) else value
+    return row
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Construir la matriz de variables de todas las fuentes')
+    parser.add_argument('--symbol', default='BTCUSDT', help='Par de trading (default: BTCUSDT)')
+    parser.add_argument('--interval', default=Config.KLINE_PRIMARY_INTERVAL,
+                        help=f"Intervalo de las velas (default: {Config.KLINE_PRIMARY_INTERVAL})")
+    parser.add_argument('--rebuild', action='store_true', help='Ignorar la matriz guardada')
+    parser.add_argument('--at', default=None, help='Mostrar las variables vigentes en un instante ISO')
+    
+    args = parser.parse_args()
+    
+    try:
+        matrix = build_feature_matrix(args.symbol, args.interval, use_cache=not args.rebuild)
+        if len(matrix['timestamp']) == 0:
+            print(f"❌ No hay velas de {args.symbol} {args.interval} guardadas")
+            sys.exit(1)
+        print(f"📊 {len(matrix['timestamp'])} filas x {len(matrix['columns'])} columnas en "
+              f"{matrix['seconds'] * 1000:.1f} ms; filas recalculadas: {matrix['rebuilt']}")
+        
+        row = row_at(matrix, args.at or datetime.utcnow().isoformat())
+        if row:
+            print(f"🕒 {datetime.utcfromtimestamp(row.pop('timestamp') / 1000).isoformat()}")
+            for name, value in row.items():
+                print(f"  {name:<28}{'-' if value is None else f'{value:.6g}':>16}")
+    
+    except Exception as e:
+        logger.error(f"Error en main: {e}")
+        print(f"❌ Error al construir la matriz de variables: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
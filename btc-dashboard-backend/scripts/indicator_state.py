@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""
+Estado incremental de los indicadores técnicos
+Cada indicador guarda su estado (EMA, medias de Wilder, ventanas móviles...) y se actualiza
+en O(1) por vela nueva; el estado se persiste junto al almacén de klines para que cada ciclo
+solo procese las velas cerradas que no había visto. check_consistency compara el resultado con
+el cálculo vectorizado completo de scripts/indicators.py
+"""
+
+import os
+import sys
+import json
+import math
+import logging
+import argparse
+import time
+from collections import deque
+from typing import Dict, List, Any, Optional
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+from scripts.indicators import PERIODS_PER_YEAR_4H, compute_indicators, indicator_name, klines_to_arrays
+from scripts.storage import TimeSeriesDB, atomic_write_json
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Versión del formato del archivo de estado
+STATE_VERSION = 1
+
+class IncrementalIndicator:
+    """Base de los indicadores incrementales: serializa los atributos listados en FIELDS"""
+    FIELDS: tuple = ()
+    DEQUES: tuple = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Estado serializable a JSON"""
+        return {field: list(getattr(self, field)) if field in self.DEQUES else getattr(self, field)
+                for field in self.FIELDS}
+
+    def load(self, state: Dict[str, Any]) -> None:
+        """Restaurar el estado guardado con to_dict"""
+        for field in self.FIELDS:
+            value = state[field]
+            if field in self.DEQUES:
+                value = deque(tuple(item) if isinstance(item, list) else item for item in value)
+            setattr(self, field, value)
+
+class SmoothedState(IncrementalIndicator):
+    """Media recursiva (EMA o Wilder) inicializada con la media de las primeras velas"""
+    FIELDS = ('count', 'total', 'value')
+
+    def __init__(self, period: int, alpha: float):
+        self.period = period
+        self.alpha = alpha
+        self.count = 0
+        self.total = 0.0
+        self.value: Optional[float] = None
+
+    def update(self, x: float) -> Optional[float]:
+        self.count += 1
+        if self.value is None:
+            self.total += x
+            if self.count == self.period:
+                self.value = self.total / self.period
+        else:
+            self.value = (1.0 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+class EMAState(SmoothedState):
+    def __init__(self, period: int, source: str = 'close'):
+        super().__init__(period, 2.0 / (period + 1))
+        self.source = source
+
+    def update_kline(self, kline: Dict[str, Any]) -> Optional[float]:
+        return self.update(kline[self.source])
+
+class WilderState(SmoothedState):
+    def __init__(self, period: int, source: str = 'close'):
+        super().__init__(period, 1.0 / period)
+        self.source = source
+
+    def update_kline(self, kline: Dict[str, Any]) -> Optional[float]:
+        return self.update(kline[self.source])
+
+class RollingState(IncrementalIndicator):
+    """
+    Media y varianza poblacional de las últimas `period` velas
+    
+    Las sumas se llevan centradas en una referencia que se renueva (recalculando las sumas
+    desde la ventana) cada `period` velas: coste amortizado O(1) sin deriva numérica.
+    """
+    FIELDS = ('window', 'reference', 'total', 'total_sq', 'since_rebase')
+    DEQUES = ('window',)
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window: deque = deque()
+        self.reference: Optional[float] = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.since_rebase = 0
+
+    def update(self, x: float) -> None:
+        if self.reference is None:
+            self.reference = x
+        self.window.append(x)
+        centered = x - self.reference
+        self.total += centered
+        self.total_sq += centered * centered
+        if len(self.window) > self.period:
+            removed = self.window.popleft() - self.reference
+            self.total -= removed
+            self.total_sq -= removed * removed
+        
+        self.since_rebase += 1
+        if self.since_rebase >= self.period:
+            self.reference = self.window[0]
+            self.total = math.fsum(v - self.reference for v in self.window)
+            self.total_sq = math.fsum((v - self.reference) ** 2 for v in self.window)
+            self.since_rebase = 0
+
+    @property
+    def ready(self) -> bool:
+        return len(self.window) == self.period
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.reference + self.total / self.period if self.ready else None
+
+    @property
+    def variance(self) -> Optional[float]:
+        if not self.ready:
+            return None
+        mean = self.total / self.period
+        return max(self.total_sq / self.period - mean * mean, 0.0)
+
+class SMAState(RollingState):
+    def __init__(self, period: int, source: str = 'close'):
+        super().__init__(period)
+        self.source = source
+
+    def update_kline(self, kline: Dict[str, Any]) -> Optional[float]:
+        self.update(kline[self.source])
+        return self.mean
+
+class BollingerState(RollingState):
+    def __init__(self, period: int = 20, width: float = 2.0):
+        super().__init__(period)
+        self.width = width
+
+    def update_kline(self, kline: Dict[str, Any]) -> Dict[str, Optional[float]]:
+        self.update(kline['close'])
+        if not self.ready:
+            return {'middle': None, 'upper': None, 'lower': None}
+        mean, deviation = self.mean, math.sqrt(self.variance)
+        return {'middle': mean, 'upper': mean + self.width * deviation, 'lower': mean - self.width * deviation}
+
+class RealizedVolState(RollingState):
+    """Volatilidad realizada anualizada: media (o varianza) móvil del término de cada vela"""
+    FIELDS = RollingState.FIELDS + ('previous',)
+
+    def __init__(self, period: int = 42, estimator: str = 'close_to_close',
+                 periods_per_year: float = PERIODS_PER_YEAR_4H):
+        super().__init__(period)
+        self.estimator = estimator
+        self.periods_per_year = periods_per_year
+        self.previous: Optional[float] = None
+
+    def update_kline(self, kline: Dict[str, Any]) -> Optional[float]:
+        open_, high, low, close = kline['open'], kline['high'], kline['low'], kline['close']
+        previous, self.previous = self.previous, close
+        if self.estimator == 'close_to_close':
+            if previous is None:
+                return None
+            self.update(math.log(close / previous))
+            variance = self.variance
+        elif self.estimator == 'parkinson':
+            self.update(math.log(high / low) ** 2 / (4.0 * math.log(2.0)))
+            variance = self.mean
+        elif self.estimator == 'garman_klass':
+            self.update(0.5 * math.log(high / low) ** 2 - (2.0 * math.log(2.0) - 1.0) * math.log(close / open_) ** 2)
+            variance = self.mean
+        else:
+            raise ValueError(f"Estimador de volatilidad desconocido: {self.estimator}")
+        return None if variance is None else math.sqrt(max(variance, 0.0) * self.periods_per_year) * 100.0
+
+class RSIState(IncrementalIndicator):
+    FIELDS = ('previous',)
+
+    def __init__(self, period: int = 14, source: str = 'close'):
+        self.source = source
+        self.previous: Optional[float] = None
+        self.gains = SmoothedState(period, 1.0 / period)
+        self.losses = SmoothedState(period, 1.0 / period)
+
+    def update_kline(self, kline: Dict[str, Any]) -> Optional[float]:
+        x = kline[self.source]
+        previous, self.previous = self.previous, x
+        if previous is None:
+            return None
+        gain = self.gains.update(max(x - previous, 0.0))
+        loss = self.losses.update(max(previous - x, 0.0))
+        if gain is None:
+            return None
+        if loss == 0.0:
+            return 50.0 if gain == 0.0 else 100.0
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(super().to_dict(), gains=self.gains.to_dict(), losses=self.losses.to_dict())
+
+    def load(self, state: Dict[str, Any]) -> None:
+        super().load(state)
+        self.gains.load(state['gains'])
+        self.losses.load(state['losses'])
+
+class ATRState(IncrementalIndicator):
+    FIELDS = ('previous',)
+
+    def __init__(self, period: int = 14):
+        self.previous: Optional[float] = None
+        self.ranges = SmoothedState(period, 1.0 / period)
+
+    def update_kline(self, kline: Dict[str, Any]) -> Optional[float]:
+        high, low = kline['high'], kline['low']
+        true_range = high - low
+        if self.previous is not None:
+            true_range = max(true_range, abs(high - self.previous), abs(low - self.previous))
+        self.previous = kline['close']
+        return self.ranges.update(true_range)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(super().to_dict(), ranges=self.ranges.to_dict())
+
+    def load(self, state: Dict[str, Any]) -> None:
+        super().load(state)
+        self.ranges.load(state['ranges'])
+
+class MACDState(IncrementalIndicator):
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMAState(fast)
+        self.slow = EMAState(slow)
+        self.signal = EMAState(signal)
+
+    def update_kline(self, kline: Dict[str, Any]) -> Dict[str, Optional[float]]:
+        fast = self.fast.update_kline(kline)
+        slow = self.slow.update_kline(kline)
+        if fast is None or slow is None:
+            return {'macd': None, 'signal': None, 'hist': None}
+        line = fast - slow
+        # La señal empieza con la primera vela en la que existe la línea MACD
+        signal = self.signal.update(line)
+        return {'macd': line, 'signal': signal, 'hist': None if signal is None else line - signal}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'fast': self.fast.to_dict(), 'slow': self.slow.to_dict(), 'signal': self.signal.to_dict()}
+
+    def load(self, state: Dict[str, Any]) -> None:
+        self.fast.load(state['fast'])
+        self.slow.load(state['slow'])
+        self.signal.load(state['signal'])
+
+class StructureState(IncrementalIndicator):
+    """Estructura por rupturas con máximos y mínimos móviles en colas monótonas (O(1) amortizado)"""
+    FIELDS = ('index', 'state', 'highs', 'lows')
+    DEQUES = ('highs', 'lows')
+
+    def __init__(self, lookback: int = 20):
+        self.lookback = lookback
+        self.index = 0
+        self.state = 0.0
+        # (índice, valor) con valores decrecientes (máximos) o crecientes (mínimos)
+        self.highs: deque = deque()
+        self.lows: deque = deque()
+
+    def update_kline(self, kline: Dict[str, Any]) -> float:
+        high, low, close = kline['high'], kline['low'], kline['close']
+        if self.index >= self.lookback:
+            if close > self.highs[0][1]:
+                self.state = 1.0
+            elif close < self.lows[0][1]:
+                self.state = -1.0
+        
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+        self.highs.append((self.index, high))
+        while self.lows and self.lows[-1][1] >= low:
+            self.lows.pop()
+        self.lows.append((self.index, low))
+        # Quitar lo que sale de la ventana de las `lookback` velas que verá la siguiente
+        oldest = self.index - self.lookback + 1
+        while self.highs[0][0] < oldest:
+            self.highs.popleft()
+        while self.lows[0][0] < oldest:
+            self.lows.popleft()
+        
+        self.index += 1
+        return self.state
+
+# Indicador -> clase incremental (mismos nombres y parámetros que scripts.indicators)
+INCREMENTAL = {
+    'sma': SMAState,
+    'ema': EMAState,
+    'wilder': WilderState,
+    'rsi': RSIState,
+    'macd': MACDState,
+    'atr': ATRState,
+    'bollinger': BollingerState,
+    'structure': StructureState,
+    'realized_vol': RealizedVolState
+}
+
+class IndicatorState:
+    def __init__(self, specs: Optional[List[Dict[str, Any]]] = None):
+        """
+        Inicializar el estado vacío de un conjunto de indicadores
+        
+        Args:
+            specs: Indicadores a mantener (default: Config.INDICATORS)
+        """
+        self.specs = [dict(spec) for spec in (specs if specs is not None else Config.INDICATORS)]
+        self.indicators: Dict[str, IncrementalIndicator] = {}
+        for spec in self.specs:
+            if spec['name'] not in INCREMENTAL:
+                raise ValueError(f"Indicador desconocido: {spec['name']}")
+            params = {key: value for key, value in spec.items() if key not in ('name', 'alias')}
+            self.indicators[spec.get('alias') or indicator_name(spec)] = INCREMENTAL[spec['name']](**params)
+        self.last_timestamp: Optional[int] = None
+        self.count = 0
+        self.values: Dict[str, Optional[float]] = {}
+
+    def update(self, kline: Dict[str, Any]) -> bool:
+        """
+        Añadir una vela cerrada (O(1) por indicador)
+        
+        Args:
+            kline: Vela con timestamp, high, low, close (y volume si algún indicador lo usa)
+        
+        Returns:
+            True si se aplicó, False si ya se había procesado
+        """
+        if self.last_timestamp is not None and kline['timestamp'] <= self.last_timestamp:
+            return False
+        for name, indicator in self.indicators.items():
+            value = indicator.update_kline(kline)
+            if isinstance(value, dict):
+                for series, series_value in value.items():
+                    self.values[f"{name}_{series}"] = series_value
+            else:
+                self.values[name] = value
+        self.last_timestamp = int(kline['timestamp'])
+        self.count += 1
+        return True
+
+    def update_many(self, klines: List[Dict[str, Any]], now_ms: Optional[int] = None) -> int:
+        """
+        Añadir las velas cerradas que todavía no se han procesado
+        
+        La última vela de get_klines_data suele estar abierta (close_time en el futuro): se omite
+        hasta que cierre, porque su cierre todavía puede cambiar.
+        
+        Args:
+            klines: Velas ordenadas por tiempo
+            now_ms: Instante actual en ms (default: ahora)
+        
+        Returns:
+            Número de velas aplicadas
+        """
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        applied = 0
+        for kline in klines:
+            if kline.get('close_time') is not None and kline['close_time'] > now_ms:
+                break
+            applied += self.update(kline)
+        return applied
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Estado completo serializable a JSON"""
+        return {
+            'version': STATE_VERSION,
+            'specs': self.specs,
+            'last_timestamp': self.last_timestamp,
+            'count': self.count,
+            'values': self.values,
+            'indicators': {name: indicator.to_dict() for name, indicator in self.indicators.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'IndicatorState':
+        """Restaurar un estado guardado con to_dict"""
+        state = cls(data['specs'])
+        for name, indicator in state.indicators.items():
+            indicator.load(data['indicators'][name])
+        state.last_timestamp = data['last_timestamp']
+        state.count = data['count']
+        state.values = data['values']
+        return state
+
+    def save(self, path: str) -> None:
+        """
+        Guardar el estado de forma atómica
+        
+        Args:
+            path: Ruta del archivo JSON
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write_json(path, self.to_dict())
+
+    @classmethod
+    def load_file(cls, path: str, specs: Optional[List[Dict[str, Any]]] = None) -> Optional['IndicatorState']:
+        """
+        Cargar un estado guardado si existe y corresponde al mismo conjunto de indicadores
+        
+        Args:
+            path: Ruta del archivo JSON
+            specs: Indicadores esperados (default: Config.INDICATORS)
+        
+        Returns:
+            Estado, o None si no existe, es de otra versión o los indicadores cambiaron
+        """
+        specs = specs if specs is not None else Config.INDICATORS
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Estado de indicadores ilegible en {path}, se reconstruye: {e}")
+            return None
+        if data.get('version') != STATE_VERSION or data.get('specs') != specs:
+            logger.info(f"El conjunto de indicadores cambió, se reconstruye {path}")
+            return None
+        return cls.from_dict(data)
+
+def state_path(symbol: str, interval: str, kind: str = 'indicator_state') -> str:
+    """
+    Ruta del estado de indicadores de un par e intervalo (junto al almacén de series temporales)
+    
+    Args:
+        symbol: Par de trading
+        interval: Intervalo de las velas
+        kind: Directorio del conjunto de indicadores (cada conjunto guarda su propio estado)
+    
+    Returns:
+        Ruta del archivo JSON
+    """
+    return os.path.join(Config.TIMESERIES_DIR, kind, f"{symbol}_{interval}.json")
+
+def load_history(symbol: str, interval: str) -> List[Dict[str, Any]]:
+    """
+    Leer todas las velas guardadas de un par e intervalo
+    
+    Args:
+        symbol: Par de trading
+        interval: Intervalo de las velas
+    
+    Returns:
+        Velas ordenadas por tiempo
+    """
+    db = TimeSeriesDB()
+    try:
+        return db.query_range('binance_klines', filters={'symbol': symbol, 'interval': interval})
+    finally:
+        db.close()
+
+def update_indicator_state(symbol: str, interval: str, klines: List[Dict[str, Any]],
+                           specs: Optional[List[Dict[str, Any]]] = None,
+                           now_ms: Optional[int] = None,
+                           kind: str = 'indicator_state') -> Dict[str, Optional[float]]:
+    """
+    Actualizar y guardar el estado de indicadores con las velas nuevas
+    
+    Sin estado previo (o si cambió el conjunto de indicadores) se reconstruye una vez desde el
+    histórico del almacén; después cada ciclo solo aplica las velas cerradas nuevas.
+    
+    Args:
+        symbol: Par de trading
+        interval: Intervalo de las velas
+        klines: Velas recién obtenidas de get_klines_data
+        specs: Indicadores a mantener (default: Config.INDICATORS)
+        now_ms: Instante actual en ms (default: ahora)
+        kind: Conjunto de indicadores (ver state_path)
+    
+    Returns:
+        Último valor de cada indicador
+    """
+    path = state_path(symbol, interval, kind)
+    state = IndicatorState.load_file(path, specs)
+    if state is None:
+        state = IndicatorState(specs)
+        history = load_history(symbol, interval)
+        if history:
+            logger.info(f"Reconstruyendo indicadores de {symbol} {interval} desde {len(history)} velas")
+            state.update_many(history, now_ms)
+    
+    if klines and state.last_timestamp is not None and klines[0]['timestamp'] > state.last_timestamp:
+        logger.warning(f"Hueco entre el estado de indicadores de {symbol} {interval} y las velas nuevas")
+    applied = state.update_many(klines, now_ms)
+    state.save(path)
+    logger.info(f"Indicadores de {symbol} {interval}: {applied} velas nuevas aplicadas")
+    return state.values
+
+def check_consistency(state: IndicatorState, klines: List[Dict[str, Any]],
+                      tolerance: float = 1e-8) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    Comparar el estado incremental con el cálculo vectorizado completo sobre las mismas velas
+    
+    Args:
+        state: Estado incremental
+        klines: Todas las velas que ha procesado el estado, en orden
+        tolerance: Diferencia relativa máxima admitida
+    
+    Returns:
+        {columna: {'incremental', 'full'}} con las columnas que no coinciden (vacío si todo cuadra)
+    """
+    klines = [k for k in klines if state.last_timestamp is not None and k['timestamp'] <= state.last_timestamp]
+    if len(klines) != state.count:
+        raise ValueError(f"El estado procesó {state.count} velas pero el histórico tiene {len(klines)}")
+    
+    full = compute_indicators(klines_to_arrays(klines), state.specs)
+    mismatches = {}
+    for name, values in full.items():
+        expected = float(values[-1]) if len(values) else math.nan
+        expected = None if math.isnan(expected) else expected
+        actual = state.values.get(name)
+        if expected is None or actual is None:
+            equal = expected is None and actual is None
+        else:
+            equal = abs(actual - expected) <= tolerance * max(1.0, abs(expected))
+        if not equal:
+            mismatches[name] = {'incremental': actual, 'full': expected}
+    return mismatches
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Comprobar o reconstruir el estado incremental de indicadores')
+    parser.add_argument('--symbol', default='BTCUSDT', help='Par de trading (default: BTCUSDT)')
+    parser.add_argument('--interval', default='4h', help='Intervalo de las velas (default: 4h)')
+    parser.add_argument('--rebuild', action='store_true', help='Reconstruir el estado desde el histórico')
+    
+    args = parser.parse_args()
+    
+    try:
+        path = state_path(args.symbol, args.interval)
+        history = load_history(args.symbol, args.interval)
+        state = None if args.rebuild else IndicatorState.load_file(path)
+        if state is None:
+            state = IndicatorState()
+            state.update_many(history)
+            state.save(path)
+            print(f"🔄 Estado reconstruido desde {state.count} velas")
+        
+        mismatches = check_consistency(state, history)
+        if mismatches:
+            for name, values in mismatches.items():
+                print(f"❌ {name}: incremental {values['incremental']} vs completo {values['full']}")
+            sys.exit(1)
+        print(f"✅ {len(state.values)} indicadores coinciden con el cálculo completo ({state.count} velas)")
+    
+    except Exception as e:
+        logger.error(f"Error en main: {e}")
+        print(f"❌ Error al comprobar los indicadores: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
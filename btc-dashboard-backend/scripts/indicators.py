@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Indicadores técnicos vectorizados con NumPy
+Calcula RSI, EMA, SMA, MACD, ATR, bandas de Bollinger, estructura de mercado y volatilidad realizada
+sobre los arrays de klines de get_klines_data; los valores anteriores al periodo de calentamiento son NaN
+
+Las medias recursivas (EMA y suavizado de Wilder) se resuelven por bloques con la forma cerrada
+de la recurrencia, así que el bucle en Python es por bloque y no por vela
+"""
+
+import os
+import sys
+import math
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+
+# Columnas de los klines que se convierten a arrays
+KLINE_FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+# Ventanas por bloque en las medias y varianzas móviles
+ROLLING_BLOCK = 256
+
+# Estimadores de volatilidad realizada
+VOLATILITY_ESTIMATORS = ('close_to_close', 'parkinson', 'garman_klass')
+
+# Velas de 4h en un año (el mercado de BTC no cierra)
+PERIODS_PER_YEAR_4H = 365 * 6
+
+def klines_to_arrays(klines: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Convertir la lista de klines de get_klines_data en un array por columna
+    
+    Args:
+        klines: Klines formateados (dicts con timestamp, open, high, low, close, volume)
+    
+    Returns:
+        Diccionario {columna: array}; timestamp en int64 y el resto en float64
+    """
+    count = len(klines)
+    arrays = {'timestamp': np.fromiter((k['timestamp'] for k in klines), dtype=np.int64, count=count)}
+    for field in KLINE_FIELDS[1:]:
+        arrays[field] = np.fromiter((k[field] for k in klines), dtype=np.float64, count=count)
+    return arrays
+
+def _recursive_average(values: np.ndarray, alpha: float, seed: float, start: int) -> np.ndarray:
+    """
+    Resolver y[t] = (1 - alpha) * y[t-1] + alpha * x[t] a partir de y[start] = seed
+    
+    Dentro de cada bloque y[k] = r^k * (y0 + alpha * Σ x[j] * r^-j) con r = 1 - alpha. El bloque
+    se limita para que r^-k no desborde, y como cada y[k] solo usa la suma hasta k el error
+    relativo no depende del tamaño del bloque; bloques de unos miles de velas caben en caché.
+    
+    Args:
+        values: Serie de entrada
+        alpha: Factor de suavizado (0 < alpha <= 1)
+        seed: Valor inicial en la posición start
+        start: Índice del valor inicial; las posiciones anteriores quedan en NaN
+    
+    Returns:
+        Serie suavizada
+    """
+    result = np.full(len(values), np.nan)
+    if start >= len(values):
+        return result
+    result[start] = seed
+    if alpha >= 1.0:
+        result[start + 1:] = values[start + 1:]
+        return result
+    
+    decay = 1.0 - alpha
+    block = max(1, int(200 / -math.log10(decay)))
+    exponents = np.arange(1, block + 1, dtype=np.float64)
+    growth = decay ** -exponents
+    shrink = decay ** exponents
+    
+    previous = seed
+    position = start + 1
+    while position < len(values):
+        chunk = values[position:position + block]
+        size = len(chunk)
+        smoothed = shrink[:size] * (previous + alpha * np.cumsum(chunk * growth[:size]))
+        result[position:position + size] = smoothed
+        previous = smoothed[-1]
+        position += size
+    return result
+
+def _rolling_moments(values: np.ndarray, period: int, variance: bool = False) -> tuple:
+    """
+    Media y varianza poblacional móviles con sumas acumuladas por bloques
+    
+    Cada bloque de ventanas se centra en su primer valor antes de acumular, así que las sumas
+    no crecen con la longitud de la serie ni con el nivel del precio y no se pierde precisión.
+    
+    Args:
+        values: Serie de entrada
+        period: Número de velas de la ventana
+        variance: Calcular también la varianza
+    
+    Returns:
+        (media, varianza o None), alineadas con la serie y NaN en las primeras period - 1 posiciones
+    """
+    mean = np.full(len(values), np.nan)
+    var = np.full(len(values), np.nan) if variance else None
+    count = len(values) - period + 1
+    if count <= 0:
+        return mean, var
+    
+    block = max(ROLLING_BLOCK, 4 * period)
+    blocks = -(-count // block)
+    padded = np.empty(blocks * block + period - 1)
+    padded[:len(values)] = values
+    padded[len(values):] = values[-1]
+    # Fila k: las velas que cubren las ventanas que empiezan en k * block ... (k + 1) * block - 1
+    segments = sliding_window_view(padded, block + period - 1)[::block]
+    reference = segments[:, :1]
+    centered = segments - reference
+    
+    sums = np.zeros((blocks, block + period))
+    np.cumsum(centered, axis=1, out=sums[:, 1:])
+    window_mean = (sums[:, period:] - sums[:, :block]) / period
+    mean[period - 1:] = (window_mean + reference).ravel()[:count]
+    if variance:
+        np.cumsum(centered * centered, axis=1, out=sums[:, 1:])
+        window_var = (sums[:, period:] - sums[:, :block]) / period - window_mean * window_mean
+        var[period - 1:] = np.maximum(window_var, 0.0).ravel()[:count]
+    return mean, var
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Media móvil simple
+    
+    Args:
+        values: Serie de entrada
+        period: Número de velas de la ventana
+    
+    Returns:
+        SMA (NaN en las primeras period - 1 posiciones)
+    """
+    return _rolling_moments(values, period)[0]
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Media móvil exponencial con alpha = 2 / (period + 1), inicializada con la SMA de las primeras velas
+    
+    Args:
+        values: Serie de entrada
+        period: Periodo de la EMA
+    
+    Returns:
+        EMA (NaN en las primeras period - 1 posiciones)
+    """
+    if len(values) < period:
+        return np.full(len(values), np.nan)
+    return _recursive_average(values, 2.0 / (period + 1), float(np.mean(values[:period])), period - 1)
+
+def wilder(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Media suavizada de Wilder (alpha = 1 / period), inicializada con la media de las primeras velas
+    
+    Args:
+        values: Serie de entrada
+        period: Periodo del suavizado
+    
+    Returns:
+        Media de Wilder (NaN en las primeras period - 1 posiciones)
+    """
+    if len(values) < period:
+        return np.full(len(values), np.nan)
+    return _recursive_average(values, 1.0 / period, float(np.mean(values[:period])), period - 1)
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """
+    RSI de Wilder
+    
+    Args:
+        close: Precios de cierre
+        period: Periodo del RSI
+    
+    Returns:
+        RSI entre 0 y 100 (NaN en las primeras period posiciones)
+    """
+    result = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return result
+    
+    delta = np.diff(close)
+    gains = wilder(np.maximum(delta, 0.0), period)
+    losses = wilder(np.maximum(-delta, 0.0), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = 100.0 - 100.0 / (1.0 + gains / losses)
+    # Sin pérdidas en la ventana el RSI es 100 (o 50 si el precio no se movió)
+    values = np.where(losses == 0.0, np.where(gains == 0.0, 50.0, 100.0), values)
+    result[1:] = values
+    return result
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    """
+    MACD: diferencia de EMAs, su línea de señal y el histograma
+    
+    Args:
+        close: Precios de cierre
+        fast: Periodo de la EMA rápida
+        slow: Periodo de la EMA lenta
+        signal: Periodo de la EMA de la señal
+    
+    Returns:
+        {'macd', 'signal', 'hist'}
+    """
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = np.full(len(close), np.nan)
+    first = slow - 1
+    if len(close) > first:
+        signal_line[first:] = ema(line[first:], signal)
+    return {'macd': line, 'signal': signal_line, 'hist': line - signal_line}
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """
+    Rango verdadero: max(high - low, |high - cierre previo|, |low - cierre previo|)
+    
+    Args:
+        high: Máximos
+        low: Mínimos
+        close: Cierres
+    
+    Returns:
+        Rango verdadero (la primera vela usa high - low)
+    """
+    ranges = high - low
+    if len(close) > 1:
+        previous = close[:-1]
+        ranges[1:] = np.maximum(ranges[1:], np.maximum(np.abs(high[1:] - previous), np.abs(low[1:] - previous)))
+    return ranges
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    """
+    Average True Range de Wilder
+    
+    Args:
+        high: Máximos
+        low: Mínimos
+        close: Cierres
+        period: Periodo del ATR
+    
+    Returns:
+        ATR (NaN en las primeras period - 1 posiciones)
+    """
+    return wilder(true_range(high, low, close), period)
+
+def bollinger(close: np.ndarray, period: int = 20, width: float = 2.0) -> Dict[str, np.ndarray]:
+    """
+    Bandas de Bollinger con desviación típica poblacional
+    
+    Args:
+        close: Precios de cierre
+        period: Ventana de la media
+        width: Número de desviaciones típicas de las bandas
+    
+    Returns:
+        {'middle', 'upper', 'lower'}
+    """
+    middle, variance = _rolling_moments(close, period, variance=True)
+    deviation = np.sqrt(variance)
+    return {'middle': middle, 'upper': middle + width * deviation, 'lower': middle - width * deviation}
+
+def rolling_max(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Máximo móvil en O(n log period) combinando ventanas de tamaño potencia de dos
+    
+    Args:
+        values: Serie de entrada
+        period: Número de velas de la ventana
+    
+    Returns:
+        Máximo de cada ventana terminada en la posición (NaN en las primeras period - 1)
+    """
+    result = np.full(len(values), np.nan)
+    if len(values) < period:
+        return result
+    span, level = 1, values
+    while span * 2 <= period:
+        level = np.maximum(level[:-span], level[span:])
+        span *= 2
+    # level[i] cubre [i, i + span); dos ventanas solapadas cubren [i, i + period)
+    result[period - 1:] = np.maximum(level[:len(values) - period + 1], level[period - span:])
+    return result
+
+def rolling_min(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Mínimo móvil (ver rolling_max)
+    
+    Args:
+        values: Serie de entrada
+        period: Número de velas de la ventana
+    
+    Returns:
+        Mínimo de cada ventana terminada en la posición (NaN en las primeras period - 1)
+    """
+    return -rolling_max(-values, period)
+
+def structure(high: np.ndarray, low: np.ndarray, close: np.ndarray, lookback: int = 20) -> np.ndarray:
+    """
+    Estructura de mercado por rupturas: +1 alcista tras cerrar por encima del máximo de las
+    `lookback` velas anteriores, -1 bajista tras cerrar por debajo de su mínimo; se mantiene
+    hasta la siguiente ruptura en sentido contrario
+    
+    Args:
+        high: Máximos
+        low: Mínimos
+        close: Cierres
+        lookback: Velas previas que definen el rango
+    
+    Returns:
+        Array con +1, -1 o 0 (sin ruptura todavía)
+    """
+    result = np.zeros(len(close))
+    if len(close) <= lookback:
+        return result
+    
+    previous_high = rolling_max(high, lookback)[lookback - 1:-1]
+    previous_low = rolling_min(low, lookback)[lookback - 1:-1]
+    current = close[lookback:]
+    breaks = np.where(current > previous_high, 1.0, np.where(current < previous_low, -1.0, 0.0))
+    
+    # Propagar la última ruptura hacia delante
+    positions = np.where(breaks != 0, np.arange(len(breaks)), -1)
+    last = np.maximum.accumulate(positions)
+    result[lookback:] = np.where(last >= 0, breaks[np.maximum(last, 0)], 0.0)
+    return result
+
+def volatility_terms(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                     estimator: str) -> np.ndarray:
+    """
+    Término por vela cuya media móvil (o varianza, en close_to_close) es la varianza realizada
+    
+    close_to_close: retorno logarítmico entre cierres. parkinson: ln(H/L)² / (4 ln 2).
+    garman_klass: ½ ln(H/L)² - (2 ln 2 - 1) ln(C/O)².
+    
+    Args:
+        open_: Aperturas
+        high: Máximos
+        low: Mínimos
+        close: Cierres
+        estimator: Uno de VOLATILITY_ESTIMATORS
+    
+    Returns:
+        Array con el término de cada vela (NaN donde no se puede calcular)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if estimator == 'close_to_close':
+            return np.log(close / np.concatenate(([np.nan], close[:-1])))
+        range_term = np.log(high / low) ** 2
+        if estimator == 'parkinson':
+            return range_term / (4.0 * math.log(2.0))
+        if estimator == 'garman_klass':
+            return 0.5 * range_term - (2.0 * math.log(2.0) - 1.0) * np.log(close / open_) ** 2
+    raise ValueError(f"Estimador de volatilidad desconocido: {estimator}")
+
+def realized_volatility(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                        period: int = 42, estimator: str = 'close_to_close',
+                        periods_per_year: float = PERIODS_PER_YEAR_4H) -> np.ndarray:
+    """
+    Volatilidad realizada anualizada en % sobre las últimas `period` velas
+    
+    Args:
+        open_: Aperturas
+        high: Máximos
+        low: Mínimos
+        close: Cierres
+        period: Velas de la ventana
+        estimator: 'close_to_close' (desviación de los retornos), 'parkinson' o 'garman_klass'
+        periods_per_year: Velas por año para anualizar
+    
+    Returns:
+        Array alineado con las velas (NaN durante el calentamiento)
+    """
+    terms = volatility_terms(open_, high, low, close, estimator)
+    variance = np.full(len(close), np.nan)
+    if estimator == 'close_to_close':
+        # El primer retorno existe a partir de la segunda vela
+        variance[1:] = _rolling_moments(terms[1:], period, variance=True)[1]
+    else:
+        variance = _rolling_moments(terms, period)[0]
+    return np.sqrt(np.maximum(variance, 0.0) * periods_per_year) * 100.0
+
+def indicator_name(spec: Dict[str, Any]) -> str:
+    """Nombre por defecto de un indicador a partir de su especificación (p. ej. 'rsi_14')"""
+    params = [str(value) for key, value in spec.items() if key not in ('name', 'alias')]
+    return '_'.join([spec['name']] + params)
+
+def compute_indicators(arrays: Dict[str, np.ndarray],
+                       specs: Optional[List[Dict[str, Any]]] = None) -> Dict[str, np.ndarray]:
+    """
+    Calcular un conjunto de indicadores sobre los arrays de klines
+    
+    Cada especificación es {'name': indicador, ...parámetros} y opcionalmente 'alias'; los
+    indicadores con varias series (macd, bollinger) generan una columna por serie con sufijo.
+    
+    Args:
+        arrays: Arrays de klines (ver klines_to_arrays)
+        specs: Indicadores a calcular (default: Config.INDICATORS)
+    
+    Returns:
+        Diccionario {columna: array} alineado con las velas
+    """
+    specs = specs if specs is not None else Config.INDICATORS
+    high, low, close = arrays['high'], arrays['low'], arrays['close']
+    results: Dict[str, np.ndarray] = {}
+    
+    for spec in specs:
+        params = {key: value for key, value in spec.items() if key not in ('name', 'alias')}
+        name = spec.get('alias') or indicator_name(spec)
+        kind = spec['name']
+        if kind in ('sma', 'ema', 'rsi', 'wilder'):
+            results[name] = INDICATORS[kind](arrays.get(params.pop('source', 'close'), close), **params)
+        elif kind in ('atr', 'structure'):
+            results[name] = INDICATORS[kind](high, low, close, **params)
+        elif kind == 'realized_vol':
+            results[name] = INDICATORS[kind](arrays['open'], high, low, close, **params)
+        elif kind in ('macd', 'bollinger'):
+            for series, values in INDICATORS[kind](close, **params).items():
+                results[f"{name}_{series}"] = values
+        else:
+            raise ValueError(f"Indicador desconocido: {kind}")
+    return results
+
+def latest_values(results: Dict[str, np.ndarray]) -> Dict[str, Optional[float]]:
+    """
+    Último valor de cada indicador listo para JSON
+    
+    Args:
+        results: Salida de compute_indicators
+    
+    Returns:
+        {columna: valor} con None si todavía no hay valor
+    """
+    latest = {}
+    for name, values in results.items():
+        value = float(values[-1]) if len(values) else math.nan
+        latest[name] = None if math.isnan(value) else value
+    return latest
+
+# Indicadores disponibles en las especificaciones
+INDICATORS = {
+    'sma': sma,
+    'ema': ema,
+    'wilder': wilder,
+    'rsi': rsi,
+    'macd': macd,
+    'atr': atr,
+    'bollinger': bollinger,
+    'structure': structure,
+    'realized_vol': realized_volatility
+}
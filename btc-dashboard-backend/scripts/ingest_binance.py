@@ -6,17 +6,25 @@ Obtiene datos de klines (velas) y open interest para BTC/USDT
 
 import os
 import sys
-import json
+import time
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
 # Añadir el directorio padre al path para importar config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from binance.client import Client
-from binance.exceptions import BinanceAPIException
 from config.config import Config
+from scripts.lazy import lazy_import
+from scripts.storage import save_snapshot, write_series
+
+# python-binance se importa en el primer uso (su importación cuesta cientos de ms)
+binance_client = lazy_import('binance.client')
+binance_exceptions = lazy_import('binance.exceptions')
+# Los indicadores, el remuestreo y la volatilidad dependen de NumPy: también en el primer uso
+indicator_state = lazy_import('scripts.indicator_state')
+resample = lazy_import('scripts.resample')
+volatility = lazy_import('scripts.volatility')
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,13 +34,14 @@ class BinanceDataIngester:
     def __init__(self):
         """Inicializar el cliente de Binance"""
         try:
-            self.client = Client(Config.BINANCE_API_KEY, Config.BINANCE_API_SECRET)
+            self.client = binance_client.Client(Config.BINANCE_API_KEY, Config.BINANCE_API_SECRET)
             logger.info("Cliente de Binance inicializado correctamente")
         except Exception as e:
             logger.error(f"Error al inicializar cliente de Binance: {e}")
             raise
 
-    def get_klines_data(self, symbol: str = 'BTCUSDT', interval: str = '4h', limit: int = 500) -> List[Dict]:
+    def get_klines_data(self, symbol: str = 'BTCUSDT', interval: str = '4h', limit: int = 500,
+                        start_time: Optional[int] = None, end_time: Optional[int] = None) -> List[Dict]:
         """
         Obtener datos de klines (velas) de Binance
         
@@ -40,6 +49,8 @@ class BinanceDataIngester:
             symbol: Par de trading (default: BTCUSDT)
             interval: Intervalo de tiempo (default: 4h)
             limit: Número de velas a obtener (default: 500)
+            start_time: Apertura de la primera vela en ms (default: las `limit` más recientes)
+            end_time: Apertura máxima de las velas en ms (default: sin límite)
         
         Returns:
             Lista de diccionarios con datos de klines
@@ -48,7 +59,12 @@ class BinanceDataIngester:
             logger.info(f"Obteniendo klines para {symbol} con intervalo {interval}")
             
             # Obtener klines desde Binance
-            klines = self.client.get_klines(symbol=symbol, interval=interval, limit=limit)
+            params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+            if start_time is not None:
+                params['startTime'] = start_time
+            if end_time is not None:
+                params['endTime'] = end_time
+            klines = self.client.get_klines(**params)
             
             # Formatear los datos
             formatted_klines = []
@@ -72,7 +88,7 @@ class BinanceDataIngester:
             logger.info(f"Obtenidos {len(formatted_klines)} klines para {symbol}")
             return formatted_klines
             
-        except BinanceAPIException as e:
+        except binance_exceptions.BinanceAPIException as e:
             logger.error(f"Error de API de Binance: {e}")
             raise
         except Exception as e:
@@ -106,7 +122,7 @@ class BinanceDataIngester:
             logger.info(f"Open interest obtenido para {symbol}: {formatted_oi['open_interest']}")
             return formatted_oi
             
-        except BinanceAPIException as e:
+        except binance_exceptions.BinanceAPIException as e:
             logger.error(f"Error de API de Binance al obtener open interest: {e}")
             raise
         except Exception as e:
@@ -151,13 +167,152 @@ class BinanceDataIngester:
             logger.info(f"Estadísticas 24h obtenidas para {symbol}: precio actual {formatted_ticker['last_price']}")
             return formatted_ticker
             
-        except BinanceAPIException as e:
+        except binance_exceptions.BinanceAPIException as e:
             logger.error(f"Error de API de Binance al obtener ticker: {e}")
             raise
         except Exception as e:
             logger.error(f"Error inesperado al obtener ticker: {e}")
             raise
 
+    def save_timeseries(self, klines_data: List[Dict], oi_data: Dict[str, Any],
+                        symbol: str = 'BTCUSDT', interval: str = '4h') -> None:
+        """
+        Guardar klines y open interest en el almacén de series temporales
+        
+        Args:
+            klines_data: Klines formateados por get_klines_data
+            oi_data: Open interest formateado por get_futures_open_interest
+            symbol: Par de trading de los klines
+            interval: Intervalo de los klines
+        """
+        try:
+            write_series('binance_klines', [dict(kline, symbol=symbol, interval=interval) for kline in klines_data])
+            write_series('binance_open_interest', [oi_data])
+        except Exception as e:
+            # El snapshot JSON no depende del almacén: se registra el fallo y la ingesta sigue
+            logger.error(f"Error al guardar las series temporales de Binance: {e}")
+
+    def get_klines_range(self, symbol: str, interval: str, start_time: int, end_time: Optional[int] = None,
+                         now_ms: Optional[int] = None) -> List[Dict]:
+        """
+        Obtener todas las velas desde start_time paginando por startTime (Config.KLINE_BASE_LIMIT por petición)
+        
+        Args:
+            symbol: Par de trading
+            interval: Intervalo de las velas
+            start_time: Apertura de la primera vela en ms
+            end_time: Apertura máxima de las velas en ms (default: hasta la vela abierta)
+            now_ms: Instante actual en ms (default: ahora)
+        
+        Returns:
+            Velas ordenadas por tiempo
+        """
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        klines: List[Dict] = []
+        while True:
+            page = self.get_klines_data(symbol, interval, limit=Config.KLINE_BASE_LIMIT, start_time=start_time,
+                                        end_time=end_time)
+            klines.extend(page)
+            # Se para cuando no hay más velas o se llega a la vela abierta o al final pedido
+            if not page or page[-1]['close_time'] >= now_ms or \
+                    (end_time is not None and page[-1]['close_time'] >= end_time):
+                return klines
+            start_time = page[-1]['timestamp'] + 1
+
+    def get_base_klines(self, symbol: str = 'BTCUSDT', now_ms: Optional[int] = None) -> List[Dict]:
+        """
+        Obtener las velas base nuevas desde la última guardada (incluida, por si seguía abierta)
+        
+        Tras una parada larga se recupera todo el hueco, y si el histórico guardado no cubre
+        Config.KLINE_SNAPSHOT_LIMIT velas de Config.KLINE_PRIMARY_INTERVAL se descarga también lo que
+        falta por delante (en la primera ingesta, todo ese histórico).
+        
+        Args:
+            symbol: Par de trading
+            now_ms: Instante actual en ms (default: ahora)
+        
+        Returns:
+            Velas de Config.KLINE_BASE_INTERVAL ordenadas por tiempo
+        """
+        interval = Config.KLINE_BASE_INTERVAL
+        primary = Config.KLINE_PRIMARY_INTERVAL
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        history_start = int(resample.bucket_start(now_ms, primary)) - \
+            (Config.KLINE_SNAPSHOT_LIMIT - 1) * resample.interval_ms(primary)
+        
+        first = resample.first_timestamp(symbol, interval)
+        last = resample.last_timestamp(symbol, interval)
+        if first is None or last is None:
+            return self.get_klines_range(symbol, interval, history_start, now_ms=now_ms)
+        
+        backfill = []
+        if first > history_start:
+            logger.info(f"Completando el histórico de velas {interval} de {symbol} anterior a {first}")
+            backfill = self.get_klines_range(symbol, interval, history_start, end_time=first - 1, now_ms=now_ms)
+        return backfill + self.get_klines_range(symbol, interval, last, now_ms=now_ms)
+
+    def update_timeframes(self, klines_data: List[Dict], symbol: str = 'BTCUSDT') -> List[Dict]:
+        """
+        Construir las temporalidades superiores a partir de las velas base recién guardadas
+        
+        Args:
+            klines_data: Velas base nuevas
+            symbol: Par de trading
+        
+        Returns:
+            Últimas velas de Config.KLINE_PRIMARY_INTERVAL para el snapshot
+        """
+        intervals = [interval for interval in Config.KLINE_INTERVALS if interval != Config.KLINE_BASE_INTERVAL]
+        try:
+            resample.update_resampled(symbol, Config.KLINE_BASE_INTERVAL, intervals, klines_data)
+            return resample.latest_klines(symbol, Config.KLINE_PRIMARY_INTERVAL, Config.KLINE_SNAPSHOT_LIMIT)
+        except Exception as e:
+            logger.error(f"Error al remuestrear las velas guardadas de {symbol}: {e}")
+            if not klines_data:
+                return []
+            # Sin almacén, el snapshot se construye solo con las velas base recién descargadas
+            bars = resample.resample_arrays(resample.rows_to_arrays(klines_data), Config.KLINE_PRIMARY_INTERVAL,
+                                            Config.KLINE_BASE_INTERVAL)
+            return resample.arrays_to_klines(bars)[-Config.KLINE_SNAPSHOT_LIMIT:]
+
+    def update_indicators(self, klines_data: List[Dict], symbol: str = 'BTCUSDT',
+                          interval: str = '4h') -> Dict[str, Any]:
+        """
+        Actualizar el estado incremental de indicadores con las velas cerradas nuevas
+        
+        Args:
+            klines_data: Klines formateados por get_klines_data
+            symbol: Par de trading de los klines
+            interval: Intervalo de los klines
+        
+        Returns:
+            Último valor de cada indicador (vacío si no se pudieron calcular)
+        """
+        try:
+            return indicator_state.update_indicator_state(symbol, interval, klines_data)
+        except Exception as e:
+            logger.warning(f"No se pudieron actualizar los indicadores de {symbol} {interval}: {e}")
+            return {}
+
+    def update_volatility(self, klines_data: List[Dict], symbol: str = 'BTCUSDT',
+                          interval: str = '4h') -> Dict[str, Any]:
+        """
+        Actualizar la volatilidad realizada con las velas cerradas nuevas y clasificar el régimen
+        
+        Args:
+            klines_data: Klines del intervalo
+            symbol: Par de trading de los klines
+            interval: Intervalo de los klines
+        
+        Returns:
+            Régimen de volatilidad y estimadores (vacío si no se pudieron calcular)
+        """
+        try:
+            return volatility.update_volatility_state(symbol, interval, klines_data)
+        except Exception as e:
+            logger.warning(f"No se pudo actualizar la volatilidad de {symbol} {interval}: {e}")
+            return {}
+
     def save_data_to_file(self, data: Dict[str, Any], filename: str) -> None:
         """
         Guardar datos en archivo JSON
@@ -166,28 +321,20 @@ class BinanceDataIngester:
             data: Datos a guardar
             filename: Nombre del archivo
         """
-        try:
-            # Crear directorio de datos si no existe
-            os.makedirs(Config.DATA_DIR, exist_ok=True)
-            
-            filepath = os.path.join(Config.DATA_DIR, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            logger.info(f"Datos guardados en {filepath}")
-            
-        except Exception as e:
-            logger.error(f"Error al guardar datos en {filename}: {e}")
-            raise
+        save_snapshot(data, filename)
 
-    def run_ingestion(self) -> None:
-        """Ejecutar el proceso completo de ingesta de datos"""
+    def run_ingestion(self) -> Dict[str, Any]:
+        """
+        Ejecutar el proceso completo de ingesta de datos
+        
+        Returns:
+            Datos guardados en el archivo JSON de la fuente
+        """
         try:
             logger.info("Iniciando ingesta de datos de Binance")
             
-            # Obtener datos de klines
-            klines_data = self.get_klines_data()
+            # Obtener las velas base nuevas; el resto de temporalidades se construyen localmente
+            base_klines = self.get_base_klines()
             
             # Obtener open interest
             oi_data = self.get_futures_open_interest()
@@ -195,11 +342,16 @@ class BinanceDataIngester:
             # Obtener estadísticas 24h
             ticker_data = self.get_24hr_ticker_stats()
             
+            # Guardar las velas base y remuestrear solo las velas afectadas
+            self.save_timeseries(base_klines, oi_data, interval=Config.KLINE_BASE_INTERVAL)
+            klines_data = self.update_timeframes(base_klines)
+            
             # Crear estructura de datos completa
             binance_data = {
                 'timestamp_utc': datetime.utcnow().isoformat(),
                 'source': 'binance',
                 'data': {
+                    'interval': Config.KLINE_PRIMARY_INTERVAL,
                     'klines': klines_data,
                     'open_interest': oi_data,
                     'ticker_24h': ticker_data
@@ -207,9 +359,14 @@ class BinanceDataIngester:
             }
             
             # Guardar datos
+            binance_data['data']['indicators'] = self.update_indicators(klines_data,
+                                                                        interval=Config.KLINE_PRIMARY_INTERVAL)
+            binance_data['data']['volatility'] = self.update_volatility(klines_data,
+                                                                        interval=Config.KLINE_PRIMARY_INTERVAL)
             self.save_data_to_file(binance_data, 'binance_data.json')
             
             logger.info("Ingesta de datos de Binance completada exitosamente")
+            return binance_data
             
         except Exception as e:
             logger.error(f"Error en la ingesta de datos de Binance: {e}")
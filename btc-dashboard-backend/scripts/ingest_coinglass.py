@@ -8,7 +8,6 @@ import os
 import sys
 import json
 import logging
-import requests
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 
@@ -16,6 +15,10 @@ from typing import Dict, List, Any, Optional
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.config import Config
+from scripts.lazy import lazy_import
+from scripts.storage import save_snapshot, write_series, to_epoch_ms
+
+requests = lazy_import('requests')
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -244,6 +247,23 @@ class CoinglassDataIngester:
                 'error': str(e)
             }
 
+    def save_timeseries(self, funding_data: List[Dict[str, Any]]) -> None:
+        """
+        Guardar los funding rates en el almacén de series temporales (se omiten los datos mock)
+        
+        Args:
+            funding_data: Funding rates por exchange
+        """
+        records = [
+            dict(item, timestamp=to_epoch_ms(item.get('timestamp')))
+            for item in funding_data if 'error' not in item
+        ]
+        try:
+            write_series('coinglass_funding_rates', records)
+        except Exception as e:
+            # El snapshot JSON no depende del almacén: se registra el fallo y la ingesta sigue
+            logger.error(f"Error al guardar las series temporales de CoinGlass: {e}")
+
     def save_data_to_file(self, data: Dict[str, Any], filename: str) -> None:
         """
         Guardar datos en archivo JSON
@@ -252,23 +272,15 @@ class CoinglassDataIngester:
             data: Datos a guardar
             filename: Nombre del archivo
         """
-        try:
-            # Crear directorio de datos si no existe
-            os.makedirs(Config.DATA_DIR, exist_ok=True)
-            
-            filepath = os.path.join(Config.DATA_DIR, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            logger.info(f"Datos guardados en {filepath}")
-            
-        except Exception as e:
-            logger.error(f"Error al guardar datos en {filename}: {e}")
-            raise
+        save_snapshot(data, filename)
 
-    def run_ingestion(self) -> None:
-        """Ejecutar el proceso completo de ingesta de datos"""
+    def run_ingestion(self) -> Dict[str, Any]:
+        """
+        Ejecutar el proceso completo de ingesta de datos
+        
+        Returns:
+            Datos guardados en el archivo JSON de la fuente
+        """
         try:
             logger.info("Iniciando ingesta de datos de Coinglass")
             
@@ -293,9 +305,11 @@ class CoinglassDataIngester:
             }
             
             # Guardar datos
+            self.save_timeseries(funding_data)
             self.save_data_to_file(coinglass_data, 'coinglass_data.json')
             
             logger.info("Ingesta de datos de Coinglass completada exitosamente")
+            return coinglass_data
             
         except Exception as e:
             logger.error(f"Error en la ingesta de datos de Coinglass: {e}")
@@ -6,7 +6,6 @@ Obtiene datos macroeconómicos como DXY, tasas de interés, etc.
 
 import os
 import sys
-import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
@@ -14,8 +13,13 @@ from typing import Dict, List, Any, Optional
 # Añadir el directorio padre al path para importar config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fredapi import Fred
 from config.config import Config
+from scripts.lazy import lazy_import
+from scripts.storage import save_snapshot, write_series, to_epoch_ms
+
+# fredapi y pandas se importan en el primer uso
+fredapi = lazy_import('fredapi')
+pd = lazy_import('pandas')
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,7 +30,7 @@ class FredDataIngester:
         """Inicializar el cliente de FRED"""
         try:
             if Config.FRED_API_KEY:
-                self.fred = Fred(api_key=Config.FRED_API_KEY)
+                self.fred = fredapi.Fred(api_key=Config.FRED_API_KEY)
                 logger.info("Cliente de FRED inicializado con API key")
             else:
                 logger.warning("No se encontró API key de FRED, usando datos mock")
@@ -147,6 +151,24 @@ class FredDataIngester:
         """
         return self.get_series_data('UNRATE', 'Unemployment Rate')
 
+    def save_timeseries(self, series: List[Dict[str, Any]]) -> None:
+        """
+        Guardar las observaciones de las series en el almacén de series temporales
+        
+        Args:
+            series: Resultados de get_series_data
+        """
+        records = [
+            {'series_id': item['series_id'], 'timestamp': to_epoch_ms(point['date']), 'value': point['value']}
+            for item in series if 'error' not in item
+            for point in item.get('data', [])
+        ]
+        try:
+            write_series('fred_observations', records)
+        except Exception as e:
+            # El snapshot JSON no depende del almacén: se registra el fallo y la ingesta sigue
+            logger.error(f"Error al guardar las series temporales de FRED: {e}")
+
     def save_data_to_file(self, data: Dict[str, Any], filename: str) -> None:
         """
         Guardar datos en archivo JSON
@@ -155,23 +177,15 @@ class FredDataIngester:
             data: Datos a guardar
             filename: Nombre del archivo
         """
-        try:
-            # Crear directorio de datos si no existe
-            os.makedirs(Config.DATA_DIR, exist_ok=True)
-            
-            filepath = os.path.join(Config.DATA_DIR, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            logger.info(f"Datos guardados en {filepath}")
-            
-        except Exception as e:
-            logger.error(f"Error al guardar datos en {filename}: {e}")
-            raise
+        save_snapshot(data, filename)
 
-    def run_ingestion(self) -> None:
-        """Ejecutar el proceso completo de ingesta de datos"""
+    def run_ingestion(self) -> Dict[str, Any]:
+        """
+        Ejecutar el proceso completo de ingesta de datos
+        
+        Returns:
+            Datos guardados en el archivo JSON de la fuente
+        """
         try:
             logger.info("Iniciando ingesta de datos de FRED")
             
@@ -196,9 +210,11 @@ class FredDataIngester:
             }
             
             # Guardar datos
+            self.save_timeseries(list(fred_data['data'].values()))
             self.save_data_to_file(fred_data, 'fred_data.json')
             
             logger.info("Ingesta de datos de FRED completada exitosamente")
+            return fred_data
             
         except Exception as e:
             logger.error(f"Error en la ingesta de datos de FRED: {e}")
@@ -207,14 +223,6 @@ class FredDataIngester:
 def main():
     """Función principal"""
     try:
-        # Importar pandas aquí para evitar error si no está disponible
-        global pd
-        try:
-            import pandas as pd
-        except ImportError:
-            logger.error("pandas no está disponible, usando datos mock")
-            pd = None
-        
         # Crear instancia del ingester
         ingester = FredDataIngester()
         
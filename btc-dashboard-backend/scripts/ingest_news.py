@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Script de ingesta de noticias (RSS)
+Consulta en paralelo los feeds configurados con peticiones condicionales (ETag/Last-Modified)
+y puntúa los titulares nuevos con el mismo análisis de sentimiento que Reddit
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+from scripts.lazy import lazy_import
+from scripts.storage import save_snapshot, atomic_write_json
+from scripts.sentiment import score_text, classify_ratio
+
+requests = lazy_import('requests')
+feedparser = lazy_import('feedparser')
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class NewsDataIngester:
+    def __init__(self, feeds: Optional[List[str]] = None, state_file: Optional[str] = None):
+        """
+        Inicializar el ingester de noticias
+        
+        Args:
+            feeds: Lista de URLs de feeds (default: Config.NEWS_FEEDS)
+            state_file: Ruta del estado entre ejecuciones (default: STATE_DIR/news_state.json)
+        """
+        self.feeds = feeds if feeds is not None else Config.NEWS_FEEDS
+        self.state_file = state_file or os.path.join(Config.STATE_DIR, 'news_state.json')
+        self.session = requests.Session()
+        
+        # Configurar headers
+        self.session.headers.update({
+            'User-Agent': 'btc-dashboard/1.0',
+            'Accept': 'application/rss+xml, application/atom+xml, application/xml;q=0.9, */*;q=0.8'
+        })
+        
+        # Compartir el pool de conexiones entre los hilos de consulta
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(Config.NEWS_MAX_WORKERS, 1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        self.state = self.load_state()
+        logger.info(f"Ingester de noticias inicializado con {len(self.feeds)} feeds")
+
+    def load_state(self) -> Dict[str, Any]:
+        """
+        Cargar el estado de la ejecución anterior (validadores HTTP, items vistos y artículos recientes)
+        
+        Returns:
+            Diccionario de estado
+        """
+        state = {'feeds': {}, 'seen': {}, 'articles': []}
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    state.update(json.load(f))
+        except Exception as e:
+            logger.warning(f"No se pudo leer el estado de noticias, se empieza de cero: {e}")
+        return state
+
+    def save_state(self) -> None:
+        """Guardar el estado para la siguiente ejecución"""
+        try:
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            atomic_write_json(self.state_file, self.state)
+        except Exception as e:
+            logger.error(f"Error al guardar el estado de noticias: {e}")
+            raise
+
+    @staticmethod
+    def get_item_id(entry: Dict[str, Any]) -> str:
+        """
+        Obtener un identificador estable para un item del feed
+        
+        Args:
+            entry: Item parseado por feedparser
+        
+        Returns:
+            Hash del GUID o, si no existe, de la URL (o del título como último recurso)
+        """
+        key = entry.get('id') or entry.get('link') or entry.get('title', '')
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def fetch_feed(self, url: str) -> Dict[str, Any]:
+        """
+        Descargar un feed con petición condicional
+        
+        Args:
+            url: URL del feed
+        
+        Returns:
+            Diccionario con el estado HTTP, los items parseados y los nuevos validadores
+        """
+        cached = self.state['feeds'].get(url, {})
+        headers = {}
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        
+        try:
+            response = self.session.get(url, headers=headers, timeout=30)
+            
+            if response.status_code == 304:
+                logger.info(f"Feed sin cambios (304): {url}")
+                return {'url': url, 'status': 304, 'entries': [], 'validators': cached}
+            
+            response.raise_for_status()
+            
+            parsed = feedparser.parse(response.content)
+            validators = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified')
+            }
+            
+            logger.info(f"Obtenidos {len(parsed.entries)} items de {url}")
+            return {
+                'url': url,
+                'status': response.status_code,
+                'feed_title': parsed.feed.get('title', url),
+                'entries': parsed.entries,
+                'validators': validators
+            }
+        
+        except Exception as e:
+            logger.error(f"Error al obtener feed {url}: {e}")
+            return {'url': url, 'status': None, 'entries': [], 'validators': cached, 'error': str(e)}
+
+    def fetch_all_feeds(self) -> List[Dict[str, Any]]:
+        """
+        Consultar todos los feeds configurados en paralelo
+        
+        Returns:
+            Lista de resultados por feed, en el orden de configuración
+        """
+        if not self.feeds:
+            return []
+        
+        max_workers = max(1, min(Config.NEWS_MAX_WORKERS, len(self.feeds)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self.fetch_feed, self.feeds))
+
+    def extract_new_articles(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Quedarse con los items no vistos en ejecuciones anteriores y puntuarlos
+        
+        Args:
+            results: Resultados de fetch_all_feeds
+        
+        Returns:
+            Lista de artículos nuevos con su puntuación de sentimiento
+        """
+        now = datetime.utcnow().isoformat()
+        seen = self.state['seen']
+        new_articles = []
+        
+        for result in results:
+            # Actualizar validadores solo si la respuesta fue válida
+            if result['status'] is not None:
+                self.state['feeds'][result['url']] = result['validators']
+            
+            for entry in result['entries']:
+                item_id = self.get_item_id(entry)
+                if item_id in seen:
+                    continue
+                seen[item_id] = now
+                
+                title = entry.get('title', '')
+                summary = entry.get('summary', '')[:500]
+                new_articles.append({
+                    'id': item_id,
+                    'title': title,
+                    'url': entry.get('link', ''),
+                    'published': entry.get('published', entry.get('updated')),
+                    'feed': result.get('feed_title', result['url']),
+                    'summary': summary,
+                    'sentiment_score': score_text(f"{title} {summary}"),
+                    'first_seen': now
+                })
+        
+        logger.info(f"Encontrados {len(new_articles)} artículos nuevos")
+        return new_articles
+
+    def prune_seen(self, max_age_days: int = 30) -> None:
+        """
+        Eliminar identificadores vistos hace más de `max_age_days` para acotar el estado
+        
+        Args:
+            max_age_days: Antigüedad máxima en días
+        """
+        cutoff = (datetime.utcnow() - timedelta(days=max_age_days)).isoformat()
+        self.state['seen'] = {k: v for k, v in self.state['seen'].items() if v >= cutoff}
+
+    def analyze_sentiment(self, articles: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Analizar el sentimiento de los titulares recientes
+        
+        Args:
+            articles: Artículos con `sentiment_score` ya calculado
+        
+        Returns:
+            Análisis de sentimiento
+        """
+        positive = sum(1 for a in articles if a.get('sentiment_score', 0) > 0)
+        negative = sum(1 for a in articles if a.get('sentiment_score', 0) < 0)
+        
+        sentiment_ratio = 0.5  # neutral por defecto
+        if positive + negative > 0:
+            sentiment_ratio = positive / (positive + negative)
+        
+        return {
+            'overall_sentiment': classify_ratio(sentiment_ratio),
+            'sentiment_ratio': sentiment_ratio,
+            'total_articles_analyzed': len(articles),
+            'positive_articles': positive,
+            'negative_articles': negative,
+            'neutral_articles': len(articles) - positive - negative,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+
+    def save_data_to_file(self, data: Dict[str, Any], filename: str) -> None:
+        """
+        Guardar datos en archivo JSON
+        
+        Args:
+            data: Datos a guardar
+            filename: Nombre del archivo
+        """
+        save_snapshot(data, filename)
+
+    def run_ingestion(self) -> Dict[str, Any]:
+        """
+        Ejecutar el proceso completo de ingesta de datos
+        
+        Returns:
+            Datos guardados en el archivo JSON de la fuente
+        """
+        try:
+            logger.info("Iniciando ingesta de noticias")
+            
+            # Consultar feeds y quedarse con los items nuevos
+            results = self.fetch_all_feeds()
+            new_articles = self.extract_new_articles(results)
+            
+            # Mantener una ventana acotada de artículos recientes para el panel
+            articles = (new_articles + self.state['articles'])[:Config.NEWS_MAX_ARTICLES]
+            self.state['articles'] = articles
+            self.prune_seen()
+            
+            news_data = {
+                'timestamp_utc': datetime.utcnow().isoformat(),
+                'source': 'news',
+                'data': {
+                    'articles': articles,
+                    'new_articles': len(new_articles),
+                    'sentiment_analysis': self.analyze_sentiment(articles),
+                    'feeds': [{
+                        'url': r['url'],
+                        'status': r['status'],
+                        'items': len(r['entries']),
+                        **({'error': r['error']} if 'error' in r else {})
+                    } for r in results]
+                }
+            }
+            
+            # Guardar datos y estado
+            self.save_data_to_file(news_data, 'news_data.json')
+            self.save_state()
+            
+            logger.info("Ingesta de noticias completada exitosamente")
+            return news_data
+        
+        except Exception as e:
+            logger.error(f"Error en la ingesta de noticias: {e}")
+            raise
+
+def main():
+    """Función principal"""
+    try:
+        # Crear instancia del ingester
+        ingester = NewsDataIngester()
+        
+        # Ejecutar ingesta
+        ingester.run_ingestion()
+        
+        print("✅ Ingesta de noticias completada exitosamente")
+    
+    except Exception as e:
+        logger.error(f"Error en main: {e}")
+        print(f"❌ Error en la ingesta de noticias: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -6,16 +6,21 @@ Obtiene posts populares de subreddits relacionados con Bitcoin y criptomonedas
 
 import os
 import sys
-import json
 import logging
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator
 
 # Añadir el directorio padre al path para importar config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import praw
 from config.config import Config
+from scripts.lazy import lazy_import
+from scripts.storage import save_snapshot, write_series, to_epoch_ms
+from scripts.sentiment import score_text, classify_ratio
+
+# praw se importa en el primer uso
+praw = lazy_import('praw')
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -45,9 +50,102 @@ class RedditDataIngester:
                 'CryptoMarkets'
             ]
             
+            # Presupuesto de comentarios restante para la ejecución actual
+            self.comment_budget = Config.REDDIT_COMMENTS_PER_RUN
+            
         except Exception as e:
             logger.error(f"Error al inicializar cliente de Reddit: {e}")
             self.reddit = None
+            self.comment_budget = Config.REDDIT_COMMENTS_PER_RUN
+
+    def iter_thread_comments(self, submission, max_comments: int) -> Iterator[Dict[str, Any]]:
+        """
+        Recorrer el árbol de comentarios de un hilo de forma incremental
+        
+        Los nodos pendientes se limitan al presupuesto restante y los `MoreComments`
+        solo se expanden mientras quede presupuesto, de modo que nunca se materializa
+        el árbol completo (`replace_more(limit=None)`) aunque el hilo tenga miles de comentarios.
+        
+        Args:
+            submission: Submission de PRAW
+            max_comments: Número máximo de comentarios a emitir
+        
+        Yields:
+            Diccionarios ligeros con el texto y la puntuación de cada comentario
+        """
+        if max_comments <= 0:
+            return
+        
+        # Limitar también la carga inicial del árbol que hace PRAW
+        submission.comment_sort = 'top'
+        submission.comment_limit = max_comments
+        
+        pending = deque()
+        for node in submission.comments:
+            if len(pending) >= max_comments:
+                break
+            pending.append(node)
+        
+        emitted = 0
+        while pending and emitted < max_comments:
+            node = pending.popleft()
+            
+            # MoreComments no tiene `body`: expandir solo el siguiente bloque
+            if getattr(node, 'body', None) is None:
+                try:
+                    children = node.comments(update=False)
+                except Exception as e:
+                    logger.warning(f"No se pudieron expandir comentarios de {submission.id}: {e}")
+                    continue
+            else:
+                emitted += 1
+                yield {
+                    'id': node.id,
+                    'body': node.body[:500],
+                    'score': node.score
+                }
+                children = node.replies
+            
+            for child in children:
+                if emitted + len(pending) >= max_comments:
+                    break
+                pending.append(child)
+
+    def score_thread_comments(self, submission) -> Dict[str, Any]:
+        """
+        Puntuar el sentimiento de los comentarios de un hilo a medida que llegan
+        
+        Args:
+            submission: Submission de PRAW
+        
+        Returns:
+            Resumen del sentimiento de los comentarios del hilo
+        """
+        max_comments = min(Config.REDDIT_COMMENTS_PER_THREAD, self.comment_budget)
+        comments_analyzed = 0
+        positive_comments = 0
+        negative_comments = 0
+        weighted_score = 0
+        
+        for comment in self.iter_thread_comments(submission, max_comments):
+            comments_analyzed += 1
+            sentiment = score_text(comment['body'])
+            if sentiment > 0:
+                positive_comments += 1
+            elif sentiment < 0:
+                negative_comments += 1
+            # Ponderar por los votos del comentario (mínimo 1)
+            weighted_score += (1 if sentiment > 0 else -1 if sentiment < 0 else 0) * max(comment['score'], 1)
+        
+        self.comment_budget -= comments_analyzed
+        
+        return {
+            'comments_analyzed': comments_analyzed,
+            'positive_comments': positive_comments,
+            'negative_comments': negative_comments,
+            'neutral_comments': comments_analyzed - positive_comments - negative_comments,
+            'weighted_score': weighted_score
+        }
 
     def get_subreddit_posts(self, subreddit_name: str, limit: int = 10, time_filter: str = 'day') -> List[Dict[str, Any]]:
         """
@@ -100,6 +198,14 @@ class RedditDataIngester:
                     'domain': submission.domain,
                     'subreddit': subreddit_name
                 }
+                
+                # Analizar comentarios solo en hilos con alto engagement
+                if submission.num_comments >= Config.REDDIT_COMMENTS_MIN_ENGAGEMENT and self.comment_budget > 0:
+                    try:
+                        post_data['comment_sentiment'] = self.score_thread_comments(submission)
+                    except Exception as e:
+                        logger.warning(f"Error al analizar comentarios de {submission.id}: {e}")
+                
                 posts.append(post_data)
             
             logger.info(f"Obtenidos {len(posts)} posts de r/{subreddit_name}")
@@ -134,6 +240,7 @@ class RedditDataIngester:
             Diccionario con posts de todos los subreddits
         """
         all_posts = {}
+        self.comment_budget = Config.REDDIT_COMMENTS_PER_RUN
         
         for subreddit_name in self.subreddits:
             try:
@@ -166,10 +273,9 @@ class RedditDataIngester:
             total_comments = 0
             positive_posts = 0
             negative_posts = 0
-            
-            # Palabras clave para análisis básico de sentimiento
-            positive_keywords = ['bullish', 'moon', 'pump', 'buy', 'hodl', 'up', 'green', 'profit', 'gain']
-            negative_keywords = ['bearish', 'dump', 'sell', 'down', 'red', 'loss', 'crash', 'dip']
+            comments_analyzed = 0
+            positive_comments = 0
+            negative_comments = 0
             
             for subreddit, posts in posts_data.items():
                 for post in posts:
@@ -181,33 +287,32 @@ class RedditDataIngester:
                     total_comments += post.get('num_comments', 0)
                     
                     # Análisis básico de sentimiento basado en título
-                    title_lower = post.get('title', '').lower()
-                    text_lower = post.get('selftext', '').lower()
-                    combined_text = f"{title_lower} {text_lower}"
-                    
-                    positive_count = sum(1 for keyword in positive_keywords if keyword in combined_text)
-                    negative_count = sum(1 for keyword in negative_keywords if keyword in combined_text)
+                    sentiment = score_text(f"{post.get('title', '')} {post.get('selftext', '')}")
                     
-                    if positive_count > negative_count:
+                    if sentiment > 0:
                         positive_posts += 1
-                    elif negative_count > positive_count:
+                    elif sentiment < 0:
                         negative_posts += 1
+                    
+                    # Sumar el sentimiento de los comentarios ya puntuados
+                    comment_sentiment = post.get('comment_sentiment')
+                    if comment_sentiment:
+                        comments_analyzed += comment_sentiment.get('comments_analyzed', 0)
+                        positive_comments += comment_sentiment.get('positive_comments', 0)
+                        negative_comments += comment_sentiment.get('negative_comments', 0)
             
             # Calcular métricas
             avg_score = total_score / total_posts if total_posts > 0 else 0
             avg_comments = total_comments / total_posts if total_posts > 0 else 0
             
             sentiment_ratio = 0.5  # neutral por defecto
-            if positive_posts + negative_posts > 0:
-                sentiment_ratio = positive_posts / (positive_posts + negative_posts)
+            positive_total = positive_posts + positive_comments
+            negative_total = negative_posts + negative_comments
+            if positive_total + negative_total > 0:
+                sentiment_ratio = positive_total / (positive_total + negative_total)
             
             # Determinar sentimiento general
-            if sentiment_ratio > 0.6:
-                overall_sentiment = 'bullish'
-            elif sentiment_ratio < 0.4:
-                overall_sentiment = 'bearish'
-            else:
-                overall_sentiment = 'neutral'
+            overall_sentiment = classify_ratio(sentiment_ratio)
             
             analysis = {
                 'overall_sentiment': overall_sentiment,
@@ -216,6 +321,9 @@ class RedditDataIngester:
                 'positive_posts': positive_posts,
                 'negative_posts': negative_posts,
                 'neutral_posts': total_posts - positive_posts - negative_posts,
+                'comments_analyzed': comments_analyzed,
+                'positive_comments': positive_comments,
+                'negative_comments': negative_comments,
                 'average_score': avg_score,
                 'average_comments': avg_comments,
                 'total_engagement': total_score + total_comments,
@@ -234,6 +342,9 @@ class RedditDataIngester:
                 'positive_posts': 0,
                 'negative_posts': 0,
                 'neutral_posts': 0,
+                'comments_analyzed': 0,
+                'positive_comments': 0,
+                'negative_comments': 0,
                 'average_score': 0,
                 'average_comments': 0,
                 'total_engagement': 0,
@@ -307,6 +418,24 @@ class RedditDataIngester:
                 'timestamp': datetime.utcnow().isoformat()
             }
 
+    def save_timeseries(self, posts_data: Dict[str, List[Dict[str, Any]]]) -> None:
+        """
+        Guardar los posts en el almacén de series temporales (se omiten los datos mock)
+        
+        Args:
+            posts_data: Datos de posts de todos los subreddits
+        """
+        records = [
+            dict(post, timestamp=to_epoch_ms(post.get('created_utc')))
+            for posts in posts_data.values()
+            for post in posts if 'error' not in post
+        ]
+        try:
+            write_series('reddit_posts', records)
+        except Exception as e:
+            # El snapshot JSON no depende del almacén: se registra el fallo y la ingesta sigue
+            logger.error(f"Error al guardar las series temporales de Reddit: {e}")
+
     def save_data_to_file(self, data: Dict[str, Any], filename: str) -> None:
         """
         Guardar datos en archivo JSON
@@ -315,23 +444,15 @@ class RedditDataIngester:
             data: Datos a guardar
             filename: Nombre del archivo
         """
-        try:
-            # Crear directorio de datos si no existe
-            os.makedirs(Config.DATA_DIR, exist_ok=True)
-            
-            filepath = os.path.join(Config.DATA_DIR, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            logger.info(f"Datos guardados en {filepath}")
-            
-        except Exception as e:
-            logger.error(f"Error al guardar datos en {filename}: {e}")
-            raise
+        save_snapshot(data, filename)
 
-    def run_ingestion(self) -> None:
-        """Ejecutar el proceso completo de ingesta de datos"""
+    def run_ingestion(self) -> Dict[str, Any]:
+        """
+        Ejecutar el proceso completo de ingesta de datos
+        
+        Returns:
+            Datos guardados en el archivo JSON de la fuente
+        """
         try:
             logger.info("Iniciando ingesta de datos de Reddit")
             
@@ -356,9 +477,11 @@ class RedditDataIngester:
             }
             
             # Guardar datos
+            self.save_timeseries(posts_data)
             self.save_data_to_file(reddit_data, 'reddit_data.json')
             
             logger.info("Ingesta de datos de Reddit completada exitosamente")
+            return reddit_data
             
         except Exception as e:
             logger.error(f"Error en la ingesta de datos de Reddit: {e}")
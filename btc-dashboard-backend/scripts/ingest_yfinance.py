@@ -6,7 +6,6 @@ Obtiene datos de mercados tradicionales como SPY, QQQ, GLD, etc.
 
 import os
 import sys
-import json
 import logging
 import time
 from datetime import datetime, timedelta
@@ -15,8 +14,12 @@ from typing import Dict, List, Any, Optional
 # Añadir el directorio padre al path para importar config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import yfinance as yf
-from config.config import Config
+from scripts.lazy import lazy_import
+from scripts.storage import save_snapshot, write_series, to_epoch_ms
+
+# yfinance y pandas se importan en el primer uso
+yf = lazy_import('yfinance')
+pd = lazy_import('pandas')
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -227,6 +230,24 @@ class YFinanceDataIngester:
                 'timestamp': datetime.utcnow().isoformat()
             }
 
+    def save_timeseries(self, tickers_data: Dict[str, Any]) -> None:
+        """
+        Guardar las velas diarias de cada ticker en el almacén de series temporales
+        
+        Args:
+            tickers_data: Datos de todos los tickers
+        """
+        records = [
+            dict(bar, symbol=symbol, timestamp=to_epoch_ms(bar['date']))
+            for symbol, ticker in tickers_data.items() if 'error' not in ticker
+            for bar in ticker.get('historical_data', [])
+        ]
+        try:
+            write_series('yfinance_daily', records)
+        except Exception as e:
+            # El snapshot JSON no depende del almacén: se registra el fallo y la ingesta sigue
+            logger.error(f"Error al guardar las series temporales de Yahoo Finance: {e}")
+
     def save_data_to_file(self, data: Dict[str, Any], filename: str) -> None:
         """
         Guardar datos en archivo JSON
@@ -235,23 +256,15 @@ class YFinanceDataIngester:
             data: Datos a guardar
             filename: Nombre del archivo
         """
-        try:
-            # Crear directorio de datos si no existe
-            os.makedirs(Config.DATA_DIR, exist_ok=True)
-            
-            filepath = os.path.join(Config.DATA_DIR, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            logger.info(f"Datos guardados en {filepath}")
-            
-        except Exception as e:
-            logger.error(f"Error al guardar datos en {filename}: {e}")
-            raise
+        save_snapshot(data, filename)
 
-    def run_ingestion(self) -> None:
-        """Ejecutar el proceso completo de ingesta de datos"""
+    def run_ingestion(self) -> Dict[str, Any]:
+        """
+        Ejecutar el proceso completo de ingesta de datos
+        
+        Returns:
+            Datos guardados en el archivo JSON de la fuente
+        """
         try:
             logger.info("Iniciando ingesta de datos de yfinance")
             
@@ -272,9 +285,11 @@ class YFinanceDataIngester:
             }
             
             # Guardar datos
+            self.save_timeseries(tickers_data)
             self.save_data_to_file(yfinance_data, 'yfinance_data.json')
             
             logger.info("Ingesta de datos de yfinance completada exitosamente")
+            return yfinance_data
             
         except Exception as e:
             logger.error(f"Error en la ingesta de datos de yfinance: {e}")
@@ -283,14 +298,6 @@ class YFinanceDataIngester:
 def main():
     """Función principal"""
     try:
-        # Importar pandas aquí para evitar error si no está disponible
-        global pd
-        try:
-            import pandas as pd
-        except ImportError:
-            logger.error("pandas no está disponible, usando datos mock")
-            pd = None
-        
         # Crear instancia del ingester
         ingester = YFinanceDataIngester()
         
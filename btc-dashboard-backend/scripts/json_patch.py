@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Diferencias entre snapshots en formato JSON Patch (RFC 6902)
+Las listas que se desplazan como una ventana (velas, posts...) se codifican como borrados
+al principio y añadidos al final en lugar de reemplazar la lista completa
+"""
+
+import copy
+from typing import Any, Dict, List
+
+from scripts.json_stream import dumps_bytes
+
+def _escape(token: Any) -> str:
+    """Escapar un segmento de JSON Pointer (RFC 6901)"""
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+def _unescape(token: str) -> str:
+    """Deshacer el escapado de un segmento de JSON Pointer"""
+    return token.replace('~1', '/').replace('~0', '~')
+
+def make_patch(old: Any, new: Any, path: str = '') -> List[Dict[str, Any]]:
+    """
+    Calcular las operaciones JSON Patch que transforman `old` en `new`
+    
+    Args:
+        old: Documento anterior
+        new: Documento nuevo
+        path: JSON Pointer del nodo actual ('' = raíz)
+    
+    Returns:
+        Lista de operaciones add/remove/replace
+    """
+    if old == new:
+        return []
+    
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = [{'op': 'remove', 'path': f"{path}/{_escape(key)}"} for key in old if key not in new]
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({'op': 'add', 'path': child, 'value': value})
+            else:
+                ops.extend(make_patch(old[key], value, child))
+        return ops
+    
+    if isinstance(old, list) and isinstance(new, list):
+        return _diff_list(old, new, path)
+    
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+def _diff_list(old: List[Any], new: List[Any], path: str) -> List[Dict[str, Any]]:
+    """
+    Diferencia de listas alineando la ventana: borrar los elementos que salieron por el principio,
+    comparar posición a posición el tramo común y añadir la cola nueva
+    
+    Si el parche resultante ocupa más que la lista completa, se reemplaza la lista.
+    """
+    shift = 0
+    if old and new and old[0] != new[0]:
+        try:
+            shift = old.index(new[0])
+        except ValueError:
+            shift = 0
+    
+    ops = [{'op': 'remove', 'path': f"{path}/0"} for _ in range(shift)]
+    aligned = old[shift:]
+    common = min(len(aligned), len(new))
+    for i in range(common):
+        ops.extend(make_patch(aligned[i], new[i], f"{path}/{i}"))
+    for i in reversed(range(len(new), len(aligned))):
+        ops.append({'op': 'remove', 'path': f"{path}/{i}"})
+    for value in new[common:]:
+        ops.append({'op': 'add', 'path': f"{path}/-", 'value': value})
+    
+    replace = [{'op': 'replace', 'path': path, 'value': new}]
+    return ops if len(dumps_bytes(ops)) < len(dumps_bytes(replace)) else replace
+
+def apply_patch(document: Any, ops: List[Dict[str, Any]]) -> Any:
+    """
+    Aplicar operaciones JSON Patch (add/remove/replace) sobre una copia del documento
+    
+    Args:
+        document: Documento de partida
+        ops: Operaciones generadas por make_patch
+    
+    Returns:
+        Documento resultante
+    """
+    document = copy.deepcopy(document)
+    for op in ops:
+        if op['path'] == '':
+            document = copy.deepcopy(op['value'])
+            continue
+        
+        tokens = [_unescape(t) for t in op['path'].split('/')[1:]]
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        
+        if isinstance(parent, list):
+            if op['op'] == 'add':
+                if last == '-':
+                    parent.append(copy.deepcopy(op['value']))
+                else:
+                    parent.insert(int(last), copy.deepcopy(op['value']))
+            elif op['op'] == 'remove':
+                del parent[int(last)]
+            elif op['op'] == 'replace':
+                parent[int(last)] = copy.deepcopy(op['value'])
+            else:
+                raise ValueError(f"Operación no soportada: {op['op']}")
+        else:
+            if op['op'] in ('add', 'replace'):
+                parent[last] = copy.deepcopy(op['value'])
+            elif op['op'] == 'remove':
+                del parent[last]
+            else:
+                raise ValueError(f"Operación no soportada: {op['op']}")
+    return document
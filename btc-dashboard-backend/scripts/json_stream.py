@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Serialización JSON por bloques
+Genera JSON compacto en trozos de bytes para subirlo sin construir el documento completo en memoria
+"""
+
+import json
+from typing import Any, Iterator
+
+# orjson es opcional: serializa directamente a bytes y es bastante más rápido que json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps_bytes(data: Any) -> bytes:
+    """
+    Serializar datos a JSON compacto en UTF-8 con el backend más rápido disponible
+    
+    Args:
+        data: Datos serializables a JSON
+    
+    Returns:
+        JSON codificado en UTF-8
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def loads_bytes(payload: bytes) -> Any:
+    """
+    Parsear JSON con el backend más rápido disponible
+    
+    Args:
+        payload: JSON codificado en UTF-8
+    
+    Returns:
+        Datos parseados
+    """
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+def iter_json_chunks(data: Any, max_depth: int = 4, batch_size: int = 1000) -> Iterator[bytes]:
+    """
+    Serializar datos a JSON compacto emitiendo trozos de bytes
+    
+    Los diccionarios se recorren hasta `max_depth` y las listas se serializan por lotes de
+    `batch_size` elementos con dumps_bytes, de modo que las listas largas (velas, posts...)
+    usan el backend rápido sin materializar nunca el documento completo.
+    
+    Args:
+        data: Datos serializables a JSON
+        max_depth: Profundidad máxima a la que se recorren contenedores
+        batch_size: Elementos de lista serializados en cada trozo
+    
+    Yields:
+        Trozos de JSON codificado en UTF-8
+    """
+    if max_depth <= 0 or not isinstance(data, (dict, list, tuple)) or not data:
+        yield dumps_bytes(data)
+        return
+    
+    if isinstance(data, dict):
+        yield b'{'
+        for i, (key, value) in enumerate(data.items()):
+            yield (b',' if i else b'') + dumps_bytes(str(key)) + b':'
+            yield from iter_json_chunks(value, max_depth - 1, batch_size)
+        yield b'}'
+    else:
+        yield b'['
+        for start in range(0, len(data), batch_size):
+            # Serializar el lote como lista y quitar los corchetes
+            batch = dumps_bytes(list(data[start:start + batch_size]))[1:-1]
+            yield (b',' if start else b'') + batch
+        yield b']'
+
+def iter_json_parts(data: Any, part_size: int, max_depth: int = 4) -> Iterator[bytes]:
+    """
+    Cortar el JSON en bloques de exactamente `part_size` bytes (salvo el último, que puede ser menor)
+    
+    S3/R2 exigen que todas las partes de una subida multipart menos la última tengan el mismo
+    tamaño, así que los trozos se cortan por bytes sin respetar sus límites (un lote de lista
+    puede ser mayor que un bloque).
+    
+    Args:
+        data: Datos serializables a JSON
+        part_size: Tamaño de cada bloque en bytes
+        max_depth: Profundidad máxima a la que se recorren contenedores
+    
+    Yields:
+        Bloques de JSON codificado en UTF-8
+    """
+    pending = []
+    pending_size = 0
+    for chunk in iter_json_chunks(data, max_depth):
+        view = memoryview(chunk)
+        while pending_size + len(view) >= part_size:
+            # Completar el bloque con el principio del trozo y seguir con el resto
+            take = part_size - pending_size
+            pending.append(view[:take])
+            view = view[take:]
+            yield b''.join(pending)
+            pending = []
+            pending_size = 0
+        if view:
+            pending.append(view)
+            pending_size += len(view)
+    if pending:
+        yield b''.join(pending)
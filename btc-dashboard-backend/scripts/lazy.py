@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Importación diferida de dependencias pesadas
+Los clientes de APIs (binance, boto3, praw, fredapi, yfinance...) tardan cientos de ms en importarse:
+con lazy_import solo se paga ese coste cuando se usan, no en --help ni en fallos tempranos
+"""
+
+import importlib
+import threading
+import types
+
+_lock = threading.Lock()
+
+class LazyModule(types.ModuleType):
+    """Módulo que se importa la primera vez que se accede a uno de sus atributos"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_module'] = None
+
+    def _load(self) -> types.ModuleType:
+        """Importar el módulo real (una sola vez, también con varios hilos)"""
+        module = self.__dict__['_module']
+        if module is None:
+            with _lock:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = 'cargado' if self.__dict__['_module'] is not None else 'sin cargar'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Obtener un módulo que se importará en el primer acceso a un atributo
+    
+    Args:
+        name: Nombre completo del módulo (p. ej. 'binance.client')
+    
+    Returns:
+        Proxy del módulo
+    """
+    return LazyModule(name)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Orquestador de ingesta y subida en un solo proceso
+Ejecuta todos los ingesters a la vez con un tiempo máximo por fuente y sube cada archivo
+a R2 en cuanto su fuente termina, sin esperar a las demás
+"""
+
+import os
+import sys
+import queue
+import logging
+import argparse
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Optional, Set, Tuple
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Fuentes disponibles: módulo, clase del ingester y archivo que genera en DATA_DIR
+SOURCES: Dict[str, Tuple[str, str, str]] = {
+    'binance': ('scripts.ingest_binance', 'BinanceDataIngester', 'binance_data.json'),
+    'coinglass': ('scripts.ingest_coinglass', 'CoinglassDataIngester', 'coinglass_data.json'),
+    'fred': ('scripts.ingest_fred', 'FredDataIngester', 'fred_data.json'),
+    'yfinance': ('scripts.ingest_yfinance', 'YFinanceDataIngester', 'yfinance_data.json'),
+    'reddit': ('scripts.ingest_reddit', 'RedditDataIngester', 'reddit_data.json'),
+    'news': ('scripts.ingest_news', 'NewsDataIngester', 'news_data.json')
+}
+
+class IngestionOrchestrator:
+    def __init__(self, sources: Optional[Dict[str, Tuple[str, str, str]]] = None, uploader=None,
+                 upload: bool = True, partitioned: bool = False, encoding: Optional[str] = None,
+                 timeouts: Optional[Dict[str, float]] = None):
+        """
+        Inicializar el orquestador
+        
+        Args:
+            sources: Fuentes a ejecutar {nombre: (módulo, clase, archivo)} (default: SOURCES)
+            uploader: R2Uploader a reutilizar (opcional, se crea uno si upload=True)
+            upload: Subir a R2 cada archivo al terminar su ingesta
+            partitioned: Publicar como snapshots particionados con latest.json en lugar de subir el archivo
+            encoding: 'gzip', 'br' o 'none' (default: Config.R2_PUBLISH_ENCODING)
+            timeouts: Tiempo máximo por fuente en segundos; '*' aplica al resto (default: Config.INGEST_TIMEOUTS)
+        """
+        self.sources = sources if sources is not None else SOURCES
+        self.upload = upload
+        self.partitioned = partitioned
+        self.encoding = encoding if encoding is not None else Config.R2_PUBLISH_ENCODING
+        self.timeouts = timeouts if timeouts is not None else Config.INGEST_TIMEOUTS
+        self.uploader = uploader
+        if self.upload and self.uploader is None:
+            from scripts.upload_to_r2 import R2Uploader
+            self.uploader = R2Uploader()
+        
+        # Ingesters ya creados, para reutilizar clientes y pools de conexiones entre ciclos
+        self.ingesters: Dict[str, Any] = {}
+        self.ingesters_lock = threading.Lock()
+        # Las publicaciones particionadas se serializan (latest.json) y su resultado se lee del resumen
+        self.publish_lock = threading.Lock()
+        # Fuentes con un hilo de ingesta vivo (también los que superaron su tiempo máximo)
+        self.active: Set[str] = set()
+        self.active_lock = threading.Lock()
+
+    def get_timeout(self, source: str) -> float:
+        """
+        Obtener el tiempo máximo de ingesta de una fuente
+        
+        Args:
+            source: Nombre de la fuente
+        
+        Returns:
+            Segundos
+        """
+        return float(self.timeouts.get(source, self.timeouts.get('*', 300)))
+
+    def get_ingester(self, source: str) -> Any:
+        """
+        Importar y crear el ingester de una fuente (una sola vez por proceso)
+        
+        Un fallo al importar la dependencia de una fuente solo afecta a esa fuente.
+        
+        Args:
+            source: Nombre de la fuente
+        
+        Returns:
+            Instancia del ingester
+        """
+        with self.ingesters_lock:
+            if source not in self.ingesters:
+                module_name, class_name, _ = self.sources[source]
+                module = importlib.import_module(module_name)
+                self.ingesters[source] = getattr(module, class_name)()
+            return self.ingesters[source]
+
+    def run_source(self, source: str) -> Dict[str, Any]:
+        """
+        Ejecutar la ingesta de una fuente capturando cualquier error
+        
+        Args:
+            source: Nombre de la fuente
+        
+        Returns:
+            Resultado con 'success', 'seconds' y 'error' si falló
+        """
+        start = time.perf_counter()
+        try:
+            self.get_ingester(source).run_ingestion()
+            return {'source': source, 'success': True, 'seconds': time.perf_counter() - start}
+        except Exception as e:
+            logger.error(f"Error en la ingesta de {source}: {e}")
+            return {'source': source, 'success': False, 'seconds': time.perf_counter() - start, 'error': str(e)}
+
+    def is_running(self, source: str) -> bool:
+        """
+        Comprobar si sigue vivo el hilo de una ingesta anterior de la fuente
+        
+        Args:
+            source: Nombre de la fuente
+        
+        Returns:
+            True si la fuente tiene una ingesta en curso
+        """
+        with self.active_lock:
+            return source in self.active
+
+    def start_source(self, source: str, on_done: Callable[[Dict[str, Any]], Any]) -> bool:
+        """
+        Lanzar la ingesta de una fuente en un hilo daemon, salvo que siga viva una anterior
+        
+        Un hilo que superó su tiempo máximo deja de esperarse pero sigue ejecutando el mismo
+        ingester (mismos archivos, filas y estado), así que la fuente no se relanza hasta que termina.
+        
+        Args:
+            source: Nombre de la fuente
+            on_done: Función que recibe el resultado de run_source cuando la ingesta termina
+        
+        Returns:
+            True si se lanzó, False si la ingesta anterior sigue en curso
+        """
+        with self.active_lock:
+            if source in self.active:
+                return False
+            self.active.add(source)
+        
+        def target():
+            try:
+                result = self.run_source(source)
+            finally:
+                with self.active_lock:
+                    self.active.discard(source)
+            on_done(result)
+        
+        threading.Thread(target=target, name=f"ingest-{source}", daemon=True).start()
+        return True
+
+    def upload_source(self, source: str) -> Dict[str, Any]:
+        """
+        Subir a R2 el archivo generado por una fuente
+        
+        Args:
+            source: Nombre de la fuente
+        
+        Returns:
+            Resultado con 'success', 'skipped' y 'seconds'
+        """
+        start = time.perf_counter()
+        path = os.path.join(Config.DATA_DIR, self.sources[source][2])
+        encoding = None if self.encoding == 'none' else self.encoding
+        try:
+            if self.partitioned:
+                with self.publish_lock:
+                    success = self.uploader.publish_partitioned_files([path], max_workers=1, encoding=encoding)
+                    summary = self.uploader.last_upload_summary
+                skipped = bool(summary and summary['results'] and summary['results'][0]['skipped'])
+            else:
+                result = self.uploader.upload_files([path], skip_unchanged=Config.R2_SKIP_UNCHANGED,
+                                                    encoding=encoding)[0]
+                success, skipped = result['success'], result['skipped']
+            return {'success': success, 'skipped': skipped, 'seconds': time.perf_counter() - start}
+        except Exception as e:
+            logger.error(f"Error al subir los datos de {source}: {e}")
+            return {'success': False, 'skipped': False, 'seconds': time.perf_counter() - start, 'error': str(e)}
+
+    def run(self, names: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Ejecutar un ciclo completo: todas las ingestas en paralelo y la subida de cada fuente al terminar
+        
+        Las ingestas corren en hilos daemon: una fuente que supera su tiempo máximo se da por fallida
+        y deja de esperarse, sin bloquear al resto ni la salida del proceso. Mientras su hilo siga
+        vivo, los ciclos siguientes la dan por fallida sin relanzarla.
+        
+        Args:
+            names: Fuentes a ejecutar (default: todas)
+        
+        Returns:
+            Resumen con el resultado por fuente y la duración total
+        """
+        names = list(names or self.sources)
+        unknown = [name for name in names if name not in self.sources]
+        if unknown:
+            raise ValueError(f"Fuentes desconocidas: {unknown}")
+        
+        start = time.perf_counter()
+        completed: 'queue.Queue[Dict[str, Any]]' = queue.Queue()
+        deadlines = {name: start + self.get_timeout(name) for name in names}
+        results: Dict[str, Dict[str, Any]] = {}
+        uploads = {}
+        
+        for name in names:
+            if not self.start_source(name, completed.put):
+                logger.warning(f"La ingesta anterior de {name} sigue en curso, no se relanza")
+                completed.put({'source': name, 'success': False, 'busy': True, 'seconds': 0.0,
+                               'error': "La ingesta anterior sigue en curso"})
+        
+        with ThreadPoolExecutor(max_workers=max(1, len(names))) as upload_executor:
+            pending = set(names)
+            while pending:
+                wait = max(0.0, min(deadlines[name] for name in pending) - time.perf_counter())
+                try:
+                    result = completed.get(timeout=wait)
+                except queue.Empty:
+                    result = None
+                
+                if result is not None and result['source'] in pending:
+                    name = result['source']
+                    pending.discard(name)
+                    result['finished_at'] = time.perf_counter() - start
+                    results[name] = result
+                    logger.info(f"Ingesta de {name} {'completada' if result['success'] else 'fallida'} "
+                                f"en {result['seconds']:.2f}s")
+                    if result['success'] and self.upload:
+                        uploads[name] = upload_executor.submit(self._timed_upload, name, start)
+                
+                now = time.perf_counter()
+                for name in [n for n in pending if deadlines[n] <= now]:
+                    pending.discard(name)
+                    results[name] = {'source': name, 'success': False, 'timed_out': True,
+                                     'seconds': now - start, 'finished_at': now - start,
+                                     'error': f"Tiempo máximo de {self.get_timeout(name):.0f}s superado"}
+                    logger.error(f"Ingesta de {name} cancelada por tiempo máximo")
+            
+            for name, future in uploads.items():
+                results[name]['upload'] = future.result()
+        
+        elapsed = time.perf_counter() - start
+        summary = {
+            'seconds': elapsed,
+            'sources': results,
+            'success': all(r['success'] and r.get('upload', {'success': True})['success'] for r in results.values())
+        }
+        logger.info(f"Ciclo completado en {elapsed:.2f}s: "
+                    f"{sum(1 for r in results.values() if r['success'])}/{len(results)} fuentes")
+        return summary
+
+    def _timed_upload(self, source: str, cycle_start: float) -> Dict[str, Any]:
+        """Subir una fuente registrando cuándo terminó respecto al inicio del ciclo"""
+        result = self.upload_source(source)
+        result['finished_at'] = time.perf_counter() - cycle_start
+        return result
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Ejecutar todas las ingestas en paralelo y subir los resultados a R2')
+    parser.add_argument('--sources', '-s', default=None,
+                        help=f"Fuentes separadas por comas (default: {','.join(SOURCES)})")
+    parser.add_argument('--no-upload', action='store_true', help='Solo ejecutar las ingestas')
+    parser.add_argument('--partitioned', action='store_true',
+                        help='Publicar snapshots inmutables por fuente y fecha más el manifiesto latest.json')
+    parser.add_argument('--compress', '-c', choices=['gzip', 'br', 'none'], default=None,
+                        help='Codificación de publicación (default: R2_PUBLISH_ENCODING)')
+    
+    args = parser.parse_args()
+    
+    try:
+        names = args.sources.split(',') if args.sources else None
+        orchestrator = IngestionOrchestrator(upload=not args.no_upload, partitioned=args.partitioned,
+                                             encoding=args.compress)
+        summary = orchestrator.run(names)
+        
+        for name, result in summary['sources'].items():
+            status = "✅" if result['success'] else "⏱️" if result.get('timed_out') else "❌"
+            line = f"  {status} {name}: ingesta {result['seconds']:.2f}s"
+            if 'upload' in result:
+                upload = result['upload']
+                upload_status = "⏭️" if upload['skipped'] else "✅" if upload['success'] else "❌"
+                line += f", subida {upload_status} {upload['seconds']:.2f}s"
+            print(line)
+        print(f"📊 Ciclo completado en {summary['seconds']:.2f}s")
+        
+        if not summary['success']:
+            sys.exit(1)
+    
+    except Exception as e:
+        logger.error(f"Error en main: {e}")
+        print(f"❌ Error en el orquestador: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Pipeline ingesta → señales → publicación como grafo de dependencias
+Cada nodo declara sus entradas y arranca en cuanto están listas; los resultados pasan
+en memoria al nodo siguiente, sin volver a leer el JSON del disco, y las ramas
+independientes (cada fuente con su subida) se ejecutan en paralelo
+"""
+
+import os
+import sys
+import logging
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Any, Optional
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.lazy import lazy_import
+from scripts.orchestrator import IngestionOrchestrator, SOURCES
+
+# El motor de señales usa NumPy: se importa solo al construir el pipeline completo
+process_signals = lazy_import('scripts.process_signals')
+feature_matrix = lazy_import('scripts.feature_matrix')
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class PipelineNode:
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any], inputs: Optional[List[str]] = None,
+                 require_all: bool = True):
+        """
+        Inicializar un nodo del pipeline
+        
+        Args:
+            name: Nombre único del nodo
+            func: Función que recibe {entrada: resultado} y devuelve el resultado del nodo
+            inputs: Nodos de los que depende
+            require_all: Si es False, el nodo se ejecuta con las entradas que hayan tenido éxito
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs or [])
+        self.require_all = require_all
+
+class Pipeline:
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Inicializar un pipeline vacío
+        
+        Args:
+            max_workers: Nodos ejecutándose a la vez (default: uno por nodo)
+        """
+        self.nodes: Dict[str, PipelineNode] = {}
+        self.max_workers = max_workers
+
+    def add(self, name: str, func: Callable[[Dict[str, Any]], Any], inputs: Optional[List[str]] = None,
+            require_all: bool = True) -> PipelineNode:
+        """
+        Añadir un nodo al pipeline
+        
+        Args:
+            name: Nombre único del nodo
+            func: Función que recibe {entrada: resultado} y devuelve el resultado del nodo
+            inputs: Nodos de los que depende
+            require_all: Si es False, el nodo se ejecuta con las entradas que hayan tenido éxito
+        
+        Returns:
+            Nodo añadido
+        """
+        if name in self.nodes:
+            raise ValueError(f"Nodo duplicado: {name}")
+        node = PipelineNode(name, func, inputs, require_all)
+        self.nodes[name] = node
+        return node
+
+    def order(self) -> List[str]:
+        """
+        Validar el grafo y obtener un orden topológico
+        
+        Returns:
+            Nombres de los nodos de forma que cada uno aparece después de sus entradas
+        """
+        for node in self.nodes.values():
+            unknown = [name for name in node.inputs if name not in self.nodes]
+            if unknown:
+                raise ValueError(f"El nodo {node.name} depende de nodos inexistentes: {unknown}")
+        
+        ordered: List[str] = []
+        remaining = {name: set(node.inputs) for name, node in self.nodes.items()}
+        while remaining:
+            ready = [name for name, inputs in remaining.items() if not inputs]
+            if not ready:
+                raise ValueError(f"Ciclo en el pipeline entre: {sorted(remaining)}")
+            for name in ready:
+                ordered.append(name)
+                del remaining[name]
+            for inputs in remaining.values():
+                inputs.difference_update(ready)
+        return ordered
+
+    def _run_node(self, node: PipelineNode, inputs: Dict[str, Any], run_start: float) -> Dict[str, Any]:
+        """Ejecutar un nodo capturando su error y registrando cuándo empezó y terminó"""
+        started_at = time.perf_counter() - run_start
+        try:
+            value = node.func(inputs)
+            outcome = {'success': True, 'value': value}
+        except Exception as e:
+            logger.error(f"Error en el nodo {node.name}: {e}")
+            outcome = {'success': False, 'error': str(e)}
+        finished_at = time.perf_counter() - run_start
+        outcome.update({'started_at': started_at, 'finished_at': finished_at, 'seconds': finished_at - started_at,
+                        'thread': threading.current_thread().name})
+        return outcome
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Ejecutar el pipeline lanzando cada nodo en cuanto sus entradas terminan
+        
+        Un nodo cuya entrada falló (con require_all) no se ejecuta y queda como 'skipped';
+        los nodos que no dependen de él siguen adelante.
+        
+        Returns:
+            Resumen con el resultado y los tiempos de cada nodo, los valores producidos y la duración total
+        """
+        self.order()
+        start = time.perf_counter()
+        outcomes: Dict[str, Dict[str, Any]] = {}
+        waiting = dict(self.nodes)
+        running = {}
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers or max(1, len(self.nodes)),
+                                thread_name_prefix='pipeline') as executor:
+            while waiting or running:
+                # Lanzar (u omitir) los nodos cuyas entradas ya terminaron
+                for name, node in list(waiting.items()):
+                    if any(dependency not in outcomes for dependency in node.inputs):
+                        continue
+                    del waiting[name]
+                    failed = [dependency for dependency in node.inputs if not outcomes[dependency]['success']]
+                    if node.inputs and (failed if node.require_all else len(failed) == len(node.inputs)):
+                        now = time.perf_counter() - start
+                        outcomes[name] = {'success': False, 'skipped': True, 'started_at': now, 'finished_at': now,
+                                          'seconds': 0.0, 'error': f"Entradas fallidas: {failed}"}
+                        logger.warning(f"Nodo {name} omitido por entradas fallidas: {failed}")
+                        continue
+                    inputs = {dependency: outcomes[dependency]['value'] for dependency in node.inputs
+                              if outcomes[dependency]['success']}
+                    running[executor.submit(self._run_node, node, inputs, start)] = name
+                
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    outcomes[name] = future.result()
+                    logger.info(f"Nodo {name} {'completado' if outcomes[name]['success'] else 'fallido'} "
+                                f"en {outcomes[name]['seconds']:.2f}s")
+        
+        elapsed = time.perf_counter() - start
+        values = {name: outcome.pop('value') for name, outcome in outcomes.items() if 'value' in outcome}
+        summary = {
+            'seconds': elapsed,
+            'nodes': {name: outcomes[name] for name in self.order()},
+            'values': values,
+            'success': all(outcome['success'] for outcome in outcomes.values())
+        }
+        logger.info(f"Pipeline completado en {elapsed:.2f}s: "
+                    f"{sum(1 for o in outcomes.values() if o['success'])}/{len(outcomes)} nodos")
+        return summary
+
+def build_pipeline(orchestrator: IngestionOrchestrator, names: Optional[List[str]] = None,
+                   signals: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                   signals_filename: str = 'salida_diaria.json',
+                   features: Optional[Callable[[], Dict[str, Any]]] = None) -> Pipeline:
+    """
+    Construir el pipeline ingesta → señales → publicación
+    
+    Cada fuente tiene un nodo 'ingest:<fuente>' que devuelve sus datos y, si hay subida, un nodo
+    'upload:<fuente>' que publica esos mismos datos desde memoria. El nodo 'signals' recibe los datos
+    de todas las fuentes que terminaron bien y su resultado se publica en 'upload:signals'. El nodo
+    'features' actualiza la matriz de variables cuando terminan las ingestas, en paralelo con las señales.
+    
+    Args:
+        orchestrator: Orquestador con las fuentes, los ingesters reutilizables y el uploader
+        names: Fuentes a incluir (default: todas las del orquestador)
+        signals: Función {fuente: datos} -> salida del motor de señales (opcional)
+        signals_filename: Nombre del archivo de salida de las señales
+        features: Función que actualiza la matriz de variables desde el almacén (opcional)
+    
+    Returns:
+        Pipeline listo para ejecutar
+    """
+    names = list(names or orchestrator.sources)
+    unknown = [name for name in names if name not in orchestrator.sources]
+    if unknown:
+        raise ValueError(f"Fuentes desconocidas: {unknown}")
+    
+    encoding = orchestrator.encoding
+    pipeline = Pipeline()
+
+    def ingest(source):
+        return lambda inputs: orchestrator.get_ingester(source).run_ingestion()
+
+    def publish(node, filename):
+        def run(inputs):
+            if not orchestrator.uploader.publish_snapshot(inputs[node], filename, encoding=encoding):
+                raise RuntimeError(f"No se pudo publicar {filename}")
+            return filename
+        return run
+    
+    for source in names:
+        pipeline.add(f"ingest:{source}", ingest(source))
+        if orchestrator.upload:
+            pipeline.add(f"upload:{source}", publish(f"ingest:{source}", orchestrator.sources[source][2]),
+                         inputs=[f"ingest:{source}"])
+    
+    if signals is not None:
+        def run_signals(inputs):
+            return signals({node.split(':', 1)[1]: data for node, data in inputs.items()})
+        
+        pipeline.add('signals', run_signals, inputs=[f"ingest:{source}" for source in names], require_all=False)
+        if orchestrator.upload:
+            pipeline.add('upload:signals', publish('signals', signals_filename), inputs=['signals'])
+    
+    if features is not None:
+        pipeline.add('features', lambda inputs: features(), inputs=[f"ingest:{source}" for source in names],
+                     require_all=False)
+    
+    return pipeline
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Ejecutar el pipeline ingesta → señales → publicación')
+    parser.add_argument('--sources', '-s', default=None,
+                        help=f"Fuentes separadas por comas (default: {','.join(SOURCES)})")
+    parser.add_argument('--no-upload', action='store_true', help='Solo ejecutar las ingestas y las señales')
+    parser.add_argument('--compress', '-c', choices=['gzip', 'br', 'none'], default=None,
+                        help='Codificación de publicación (default: R2_PUBLISH_ENCODING)')
+    
+    args = parser.parse_args()
+    
+    try:
+        names = args.sources.split(',') if args.sources else None
+        orchestrator = IngestionOrchestrator(upload=not args.no_upload, encoding=args.compress)
+        summary = build_pipeline(orchestrator, names, signals=process_signals.run_daily,
+                                 features=feature_matrix.build_feature_matrix).run()
+        
+        print(f"  {'nodo':<20}{'inicio':>8}{'fin':>8}{'s':>8}")
+        for name, outcome in summary['nodes'].items():
+            status = "⏭️" if outcome.get('skipped') else "✅" if outcome['success'] else "❌"
+            print(f"{status} {name:<20}{outcome['started_at']:>8.2f}{outcome['finished_at']:>8.2f}"
+                  f"{outcome['seconds']:>8.2f}")
+        print(f"📊 Pipeline completado en {summary['seconds']:.2f}s")
+        
+        if not summary['success']:
+            sys.exit(1)
+    
+    except Exception as e:
+        logger.error(f"Error en main: {e}")
+        print(f"❌ Error en el pipeline: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Motor de señales y decisión diaria
+Puntúa cada señal de -2 a +2 según una tabla de reglas, la pondera por su peso y genera
+salida_diaria.json con la decisión del día (COMPRAR / VENDER / NEUTRAL)
+
+Las mismas reglas se aplican a un único día (último snapshot de cada fuente) o a todo el
+histórico de velas en una sola llamada vectorizada. En los regímenes de volatilidad de
+Config.SIGNAL_BLOCKED_REGIMES la decisión pasa a NEUTRAL
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+from scripts.indicators import compute_indicators, klines_to_arrays
+from scripts.json_stream import loads_bytes
+from scripts.orchestrator import SOURCES
+from scripts.resample import interval_ms
+from scripts.storage import TimeSeriesDB, availability_lag_ms, save_snapshot
+from scripts.volatility import blocked_codes, regime_codes, regime_label, regime_specs
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Peso de cada nivel de importancia
+WEIGHTS = {'bajo': 1.0, 'medio': 2.0, 'alto': 3.0}
+
+# Indicadores de precio de los que salen las señales técnicas
+PRICE_INDICATORS = [
+    {'name': 'structure', 'lookback': 20, 'alias': 'estructura'},
+    {'name': 'rsi', 'period': 14, 'alias': 'rsi'},
+    {'name': 'ema', 'period': 200, 'alias': 'ema_200'},
+    {'name': 'macd', 'fast': 12, 'slow': 26, 'signal': 9, 'alias': 'macd'},
+    {'name': 'atr', 'period': 14, 'alias': 'atr'}
+]
+
+# Tabla de reglas: cada señal toma una variable, la compara con 4 umbrales ascendentes y asigna
+# el puntaje del tramo en que cae (5 tramos: < u1, [u1, u2), [u2, u3), [u3, u4), >= u4)
+SIGNAL_RULES = [
+    {'signal': 'Estructura', 'feature': 'estructura', 'weight': 'alto',
+     'thresholds': [-0.5, -0.5, 0.5, 0.5], 'scores': [-2, 0, 0, 0, 2],
+     'description': 'Ruptura del rango de las últimas 20 velas'},
+    {'signal': 'RSI', 'feature': 'rsi', 'weight': 'medio',
+     'thresholds': [30, 45, 55, 70], 'scores': [2, 1, 0, -1, -2],
+     'description': 'Sobreventa puntúa a favor y sobrecompra en contra'},
+    {'signal': 'Tendencia EMA 200', 'feature': 'distancia_ema_200', 'weight': 'medio',
+     'thresholds': [-5, -1, 1, 5], 'scores': [-2, -1, 0, 1, 2],
+     'description': 'Distancia del precio a la EMA 200 en %'},
+    {'signal': 'Momentum MACD', 'feature': 'macd_atr', 'weight': 'bajo',
+     'thresholds': [-0.5, -0.1, 0.1, 0.5], 'scores': [-2, -1, 0, 1, 2],
+     'description': 'Histograma del MACD en múltiplos de ATR'},
+    {'signal': 'Funding Rate', 'feature': 'funding_rate', 'weight': 'medio',
+     'thresholds': [-0.01, 0.0, 0.03, 0.08], 'scores': [2, 1, 0, -1, -2],
+     'description': 'Funding medio entre exchanges en %; muy positivo indica exceso de largos'},
+    {'signal': 'Dólar (DXY)', 'feature': 'dxy_cambio', 'weight': 'bajo',
+     'thresholds': [-0.5, -0.1, 0.1, 0.5], 'scores': [2, 1, 0, -1, -2],
+     'description': 'Cambio diario del DXY en %'},
+    {'signal': 'Activos de riesgo', 'feature': 'riesgo_cambio', 'weight': 'bajo',
+     'thresholds': [-1, -0.25, 0.25, 1], 'scores': [-2, -1, 0, 1, 2],
+     'description': 'Cambio diario medio de SPY y QQQ en %'},
+    {'signal': 'Sentimiento', 'feature': 'sentimiento', 'weight': 'bajo',
+     'thresholds': [0.3, 0.45, 0.55, 0.7], 'scores': [-2, -1, 0, 1, 2],
+     'description': 'Proporción de titulares y posts positivos'}
+]
+
+# Decisión según el score total
+BUY, SELL, NEUTRAL = 'COMPRAR', 'VENDER', 'NEUTRAL'
+
+def load_snapshots(data_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Leer el último snapshot de cada fuente en una sola pasada
+    
+    Args:
+        data_dir: Directorio de datos (default: Config.DATA_DIR)
+    
+    Returns:
+        {fuente: datos} con las fuentes cuyo archivo existe y es válido
+    """
+    data_dir = data_dir or Config.DATA_DIR
+    snapshots = {}
+    for source, (_, _, filename) in SOURCES.items():
+        path = os.path.join(data_dir, filename)
+        try:
+            with open(path, 'rb') as f:
+                snapshots[source] = loads_bytes(f.read())
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logger.warning(f"Snapshot de {source} ilegible, se omite: {e}")
+    return snapshots
+
+def price_features(arrays: Dict[str, np.ndarray], interval: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Variables técnicas de cada vela
+    
+    Args:
+        arrays: Arrays de klines (ver klines_to_arrays)
+        interval: Intervalo de las velas, para las ventanas de volatilidad (default: Config.KLINE_PRIMARY_INTERVAL)
+    
+    Returns:
+        {variable: array} alineado con las velas (NaN durante el calentamiento)
+    """
+    volatility = dict(regime_specs(interval)[0], alias='volatilidad')
+    values = compute_indicators(arrays, PRICE_INDICATORS + [volatility])
+    close = arrays['close']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'close': close,
+            'atr': values['atr'],
+            'estructura': values['estructura'],
+            'rsi': values['rsi'],
+            'distancia_ema_200': (close / values['ema_200'] - 1.0) * 100.0,
+            'macd_atr': values['macd_hist'] / values['atr'],
+            'volatilidad': values['volatilidad']
+        }
+
+def _mean(values: List[Optional[float]]) -> float:
+    """Media de los valores disponibles (NaN si no hay ninguno)"""
+    values = [float(v) for v in values if v is not None]
+    return sum(values) / len(values) if values else float('nan')
+
+def extract_features(snapshots: Dict[str, Any], now_ms: Optional[int] = None) -> Dict[str, float]:
+    """
+    Variables del día a partir de los snapshots de las fuentes
+    
+    La última vela del snapshot de Binance suele estar abierta: las variables de precio se calculan
+    solo con velas cerradas, como el estado incremental de indicadores, para que la decisión no
+    cambie a mitad de vela.
+    
+    Args:
+        snapshots: {fuente: datos} (ver load_snapshots)
+        now_ms: Instante actual en ms (default: ahora)
+    
+    Returns:
+        {variable: valor}; NaN si la fuente no está disponible
+    """
+    features = {rule['feature']: float('nan') for rule in SIGNAL_RULES}
+    features.update({'close': float('nan'), 'atr': float('nan'), 'volatilidad': float('nan')})
+    
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    binance = (snapshots.get('binance') or {}).get('data') or {}
+    klines = [kline for kline in binance.get('klines') or []
+              if kline.get('close_time') is None or kline['close_time'] <= now_ms]
+    if klines:
+        for name, values in price_features(klines_to_arrays(klines), binance.get('interval')).items():
+            features[name] = float(values[-1])
+    
+    coinglass = (snapshots.get('coinglass') or {}).get('data') or {}
+    features['funding_rate'] = _mean([item.get('funding_rate') for item in coinglass.get('funding_rates') or []
+                                      if 'error' not in item])
+    
+    summary = ((snapshots.get('yfinance') or {}).get('data') or {}).get('market_summary') or {}
+    if summary.get('dollar_strength') is not None:
+        features['dxy_cambio'] = float(summary['dollar_strength'])
+    features['riesgo_cambio'] = _mean(list((summary.get('risk_on_assets') or {}).values()))
+    
+    features['sentimiento'] = _mean([
+        ((snapshots.get(source) or {}).get('data') or {}).get('sentiment_analysis', {}).get('sentiment_ratio')
+        for source in ('reddit', 'news')
+    ])
+    return features
+
+def score_signals(features: Dict[str, Any], rules: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Puntuar las señales y decidir, para un día o para todo un histórico a la vez
+    
+    Args:
+        features: {variable: valor o array}; las variables ausentes o NaN puntúan 0. Con 'volatilidad'
+            la decisión es NEUTRAL en los regímenes de Config.SIGNAL_BLOCKED_REGIMES
+        rules: Tabla de reglas (default: SIGNAL_RULES)
+    
+    Returns:
+        {'scores': {señal: puntajes}, 'score_total': array, 'decision': array, 'regime': índices de
+        regime_codes (-1 sin volatilidad)}
+    """
+    rules = rules if rules is not None else SIGNAL_RULES
+    length = max([np.size(value) for value in features.values()] + [1])
+    scores = {}
+    total = np.zeros(length)
+    for rule in rules:
+        values = np.broadcast_to(np.asarray(features.get(rule['feature'], np.nan), dtype=np.float64), (length,))
+        points = np.asarray(rule['scores'], dtype=np.float64)[np.digitize(values, rule['thresholds'])]
+        points[np.isnan(values)] = 0.0
+        scores[rule['signal']] = points
+        total += points * WEIGHTS[rule['weight']]
+    
+    decision = np.where(total >= Config.SIGNAL_BUY_THRESHOLD, BUY,
+                        np.where(total <= Config.SIGNAL_SELL_THRESHOLD, SELL, NEUTRAL))
+    regime = np.broadcast_to(regime_codes(features.get('volatilidad', np.nan)), (length,))
+    decision = np.where(np.isin(regime, blocked_codes()), NEUTRAL, decision)
+    return {'scores': scores, 'score_total': total, 'decision': decision, 'regime': regime}
+
+def trade_plan(decision: str, close: float, atr: float) -> Optional[Dict[str, Any]]:
+    """
+    Plan de trade orientativo: stop a un múltiplo del ATR y objetivo con el R:R mínimo
+    
+    Args:
+        decision: COMPRAR, VENDER o NEUTRAL
+        close: Precio actual
+        atr: ATR(14) actual
+    
+    Returns:
+        Plan con entrada, stop y objetivo, o None si no hay operación
+    """
+    if decision == NEUTRAL or np.isnan(close) or np.isnan(atr):
+        return None
+    direction = 1.0 if decision == BUY else -1.0
+    risk = Config.SIGNAL_STOP_ATR * atr
+    return {
+        'direccion': 'LARGO' if decision == BUY else 'CORTO',
+        'entrada': close,
+        'stop_loss': close - direction * risk,
+        'take_profit': close + direction * risk * Config.SIGNAL_MIN_RR,
+        'riesgo_por_unidad': risk,
+        'ratio_riesgo_beneficio': Config.SIGNAL_MIN_RR
+    }
+
+def build_daily_output(snapshots: Dict[str, Any], now_ms: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Generar la salida diaria a partir de los últimos snapshots
+    
+    Args:
+        snapshots: {fuente: datos} (ver load_snapshots)
+        now_ms: Instante actual en ms (default: ahora)
+    
+    Returns:
+        Contenido de salida_diaria.json
+    """
+    features = extract_features(snapshots, now_ms)
+    result = score_signals(features)
+    decision = str(result['decision'][0])
+    score_total = float(result['score_total'][0])
+    
+    table = []
+    for rule in SIGNAL_RULES:
+        value = features[rule['feature']]
+        points = int(result['scores'][rule['signal']][0])
+        table.append({
+            'senal': rule['signal'],
+            'valor': None if np.isnan(value) else value,
+            'puntaje': points,
+            'peso': rule['weight'],
+            'ponderado': points * WEIGHTS[rule['weight']],
+            'descripcion': rule['description'],
+            'disponible': not np.isnan(value)
+        })
+    
+    drivers = sorted((row for row in table if row['ponderado']), key=lambda row: -abs(row['ponderado']))[:3]
+    summary = f"{decision} con score {score_total:+.1f}"
+    if drivers:
+        summary += ": " + ", ".join(f"{row['senal']} ({row['ponderado']:+.0f})" for row in drivers)
+    regime = regime_label(int(result['regime'][0]))
+    if int(result['regime'][0]) in blocked_codes():
+        summary += f". Volatilidad {regime}: sin operación"
+    missing = [row['senal'] for row in table if not row['disponible']]
+    if missing:
+        summary += f". Sin datos: {', '.join(missing)}"
+    
+    return {
+        'timestamp_utc': datetime.utcnow().isoformat(),
+        'decision_del_dia': decision,
+        'score_total': score_total,
+        'resumen_ejecutivo': summary,
+        'tabla_de_senales': table,
+        'regimen_volatilidad': {'regimen': regime,
+                                'volatilidad': None if np.isnan(features['volatilidad']) else features['volatilidad']},
+        'plan_de_trade_sugerido': trade_plan(decision, features['close'], features['atr']),
+        'fuentes': sorted(snapshots)
+    }
+
+def _as_of(timestamps: np.ndarray, source_timestamps: np.ndarray, source_values: np.ndarray) -> np.ndarray:
+    """Valor vigente de una serie en cada instante (último con timestamp <= instante; NaN si no hay)"""
+    if len(source_timestamps) == 0:
+        return np.full(len(timestamps), np.nan)
+    positions = np.searchsorted(source_timestamps, timestamps, side='right') - 1
+    values = source_values[np.maximum(positions, 0)]
+    return np.where(positions >= 0, values, np.nan)
+
+def _daily_change(db: TimeSeriesDB, symbol: str) -> tuple:
+    """
+    Cambio porcentual diario del cierre de un ticker de yfinance: (instantes de publicación, cambios)
+    
+    Cada cambio se fecha cuando se conoce el cierre de su sesión (ver availability_lag_ms), no a las
+    00:00 UTC de la sesión, para que las velas de ese día no lo vean antes de tiempo.
+    """
+    rows = db.query_range('yfinance_daily', filters={'symbol': symbol}, columns=['timestamp', 'close'])
+    rows = [row for row in rows if row['close'] is not None]
+    timestamps = np.array([row['timestamp'] for row in rows], dtype=np.int64)
+    closes = np.array([row['close'] for row in rows], dtype=np.float64)
+    if len(closes) < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    return timestamps[1:] + availability_lag_ms('yfinance_daily'), (closes[1:] / closes[:-1] - 1.0) * 100.0
+
+def history_features(symbol: str = 'BTCUSDT', interval: str = '4h',
+                     db: Optional[TimeSeriesDB] = None) -> Dict[str, np.ndarray]:
+    """
+    Matriz de variables de todo el histórico guardado, una fila por vela
+    
+    Las variables de otras fuentes (funding, DXY, SPY/QQQ) se alinean con el último valor ya
+    publicado al cierre de cada vela; el sentimiento no tiene histórico y queda en NaN.
+    
+    Args:
+        symbol: Par de trading
+        interval: Intervalo de las velas
+        db: Base de series temporales (default: una nueva sobre Config.TIMESERIES_DB)
+    
+    Returns:
+        {variable: array}, incluidos 'timestamp', 'high' y 'low'
+    """
+    own_db = db is None
+    db = db or TimeSeriesDB()
+    try:
+        klines = db.query_range('binance_klines', filters={'symbol': symbol, 'interval': interval},
+                                columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        arrays = klines_to_arrays(klines)
+        features = price_features(arrays, interval)
+        features['timestamp'] = arrays['timestamp']
+        features['high'] = arrays['high']
+        features['low'] = arrays['low']
+        closes_at = arrays['timestamp'] + interval_ms(interval) - 1
+        
+        # Funding medio entre exchanges en cada instante publicado
+        funding = db.query_range('coinglass_funding_rates', filters={'symbol': symbol.replace('USDT', '')},
+                                 columns=['timestamp', 'funding_rate'])
+        funding_ts = np.array([row['timestamp'] for row in funding], dtype=np.int64)
+        funding_rates = np.array([row['funding_rate'] for row in funding], dtype=np.float64)
+        unique_ts, groups = np.unique(funding_ts, return_inverse=True)
+        mean_rates = np.bincount(groups, weights=funding_rates, minlength=len(unique_ts)) / \
+            np.maximum(np.bincount(groups, minlength=len(unique_ts)), 1)
+        features['funding_rate'] = _as_of(closes_at, unique_ts, mean_rates)
+        
+        features['dxy_cambio'] = _as_of(closes_at, *_daily_change(db, 'DXY'))
+        risk = [_as_of(closes_at, *_daily_change(db, ticker)) for ticker in ('SPY', 'QQQ')]
+        with np.errstate(invalid='ignore'):
+            stacked = np.vstack(risk)
+            available = (~np.isnan(stacked)).sum(axis=0)
+            features['riesgo_cambio'] = np.where(available > 0, np.nansum(stacked, axis=0) / np.maximum(available, 1),
+                                                 np.nan)
+        return features
+    finally:
+        if own_db:
+            db.close()
+
+def score_history(features: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """
+    Puntuar todo el histórico en una llamada vectorizada
+    
+    Args:
+        features: Matriz de variables (ver history_features)
+    
+    Returns:
+        Resultado de score_signals más 'timestamp' y el recuento de cada decisión
+    """
+    result = score_signals(features)
+    result['timestamp'] = features['timestamp']
+    decisions, counts = np.unique(result['decision'], return_counts=True)
+    result['counts'] = {str(decision): int(count) for decision, count in zip(decisions, counts)}
+    return result
+
+def run_daily(snapshots: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Generar la salida diaria y guardarla en salida_diaria.json
+    
+    Args:
+        snapshots: {fuente: datos} ya en memoria (default: leer los snapshots de Config.DATA_DIR)
+    
+    Returns:
+        Salida diaria generada
+    """
+    output = build_daily_output(snapshots if snapshots is not None else load_snapshots())
+    save_snapshot(output, 'salida_diaria.json')
+    logger.info(f"Decisión del día: {output['decision_del_dia']} (score {output['score_total']:+.1f})")
+    return output
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Puntuar las señales y generar la decisión diaria')
+    parser.add_argument('--history', action='store_true', help='Puntuar todo el histórico de velas guardado')
+    parser.add_argument('--symbol', default='BTCUSDT', help='Par de trading del histórico (default: BTCUSDT)')
+    parser.add_argument('--interval', default='4h', help='Intervalo del histórico (default: 4h)')
+    
+    args = parser.parse_args()
+    
+    try:
+        start = time.perf_counter()
+        if args.history:
+            result = score_history(history_features(args.symbol, args.interval))
+            elapsed = time.perf_counter() - start
+            print(f"📊 {len(result['score_total'])} velas puntuadas en {elapsed:.2f}s: {result['counts']}")
+            return
+        
+        output = run_daily()
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"✅ {output['decision_del_dia']} (score {output['score_total']:+.1f}) en {elapsed:.1f} ms")
+        print(f"   {output['resumen_ejecutivo']}")
+    
+    except Exception as e:
+        logger.error(f"Error en main: {e}")
+        print(f"❌ Error al procesar las señales: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
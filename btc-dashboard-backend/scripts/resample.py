@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Remuestreo local de velas a temporalidades superiores
+Construye las velas de 4h, 1d... a partir de las velas base guardadas (1m o 1h) en vez de pedir
+cada intervalo a Binance; en cada ingesta solo se recalculan las velas que contienen velas base
+nuevas (normalmente solo la vela abierta), así todas las temporalidades salen de los mismos datos
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+from scripts.storage import TimeSeriesDB, write_series
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MINUTE_MS = 60 * 1000
+
+# Duración de cada intervalo de Binance con duración fija (el mensual '1M' no lo es)
+INTERVAL_MS = {
+    '1m': MINUTE_MS, '3m': 3 * MINUTE_MS, '5m': 5 * MINUTE_MS, '15m': 15 * MINUTE_MS, '30m': 30 * MINUTE_MS,
+    '1h': 60 * MINUTE_MS, '2h': 120 * MINUTE_MS, '4h': 240 * MINUTE_MS, '6h': 360 * MINUTE_MS,
+    '8h': 480 * MINUTE_MS, '12h': 720 * MINUTE_MS, '1d': 1440 * MINUTE_MS, '3d': 3 * 1440 * MINUTE_MS,
+    '1w': 7 * 1440 * MINUTE_MS
+}
+
+# Las velas semanales de Binance empiezan el lunes; el epoch (1970-01-01) fue jueves
+WEEK_OFFSET_MS = 4 * 1440 * MINUTE_MS
+
+# Columnas que se suman al agregar velas base
+SUM_FIELDS = ('volume', 'quote_asset_volume', 'number_of_trades',
+              'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume')
+
+# Columnas de binance_klines que se leen y escriben (sin symbol/interval)
+KLINE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume',
+                 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume']
+
+def interval_ms(interval: str) -> int:
+    """
+    Duración de un intervalo en ms
+    
+    Args:
+        interval: Intervalo de Binance ('1m', '1h', '4h', '1d'...)
+    
+    Returns:
+        Milisegundos del intervalo
+    """
+    if interval not in INTERVAL_MS:
+        raise ValueError(f"Intervalo no soportado para remuestreo: {interval}")
+    return INTERVAL_MS[interval]
+
+def bucket_start(timestamps: Any, interval: str) -> np.ndarray:
+    """
+    Inicio de la vela del intervalo que contiene cada instante
+    
+    Args:
+        timestamps: Instantes en ms UTC (escalar o array)
+        interval: Intervalo destino
+    
+    Returns:
+        Array int64 con el timestamp de apertura de la vela correspondiente
+    """
+    size = interval_ms(interval)
+    offset = WEEK_OFFSET_MS if interval == '1w' else 0
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    return (timestamps - offset) // size * size + offset
+
+def rows_to_arrays(rows: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Convertir velas (dicts) en un array por columna
+    
+    Args:
+        rows: Velas de get_klines_data o de la tabla binance_klines
+    
+    Returns:
+        {columna: array} con las columnas de KLINE_COLUMNS presentes en la primera vela
+    """
+    count = len(rows)
+    fields = [field for field in KLINE_COLUMNS if rows and field in rows[0]]
+    arrays = {}
+    for field in fields:
+        dtype = np.int64 if field in ('timestamp', 'close_time') else np.float64
+        arrays[field] = np.fromiter((row[field] for row in rows), dtype=dtype, count=count)
+    return arrays
+
+def resample_arrays(arrays: Dict[str, np.ndarray], interval: str,
+                    base_interval: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Agregar velas base en velas de un intervalo superior, todas a la vez
+    
+    Apertura de la primera vela base, máximo y mínimo del grupo, cierre de la última y suma de
+    volúmenes, trades y volúmenes taker. Una vela con menos velas base de las que le corresponden
+    (la vela abierta o un hueco en los datos) se marca con complete=False.
+    
+    Args:
+        arrays: Velas base por columna (ver rows_to_arrays), ordenadas por timestamp
+        interval: Intervalo destino
+        base_interval: Intervalo de las velas base (para validar y calcular 'complete')
+    
+    Returns:
+        {columna: array} con una fila por vela destino, más 'base_count' y 'complete'
+    """
+    size = interval_ms(interval)
+    if base_interval is not None and size % interval_ms(base_interval):
+        raise ValueError(f"{interval} no es múltiplo de {base_interval}")
+    
+    timestamps = np.asarray(arrays['timestamp'], dtype=np.int64)
+    if len(timestamps) and np.any(np.diff(timestamps) < 0):
+        order = np.argsort(timestamps, kind='stable')
+        arrays = {field: np.asarray(values)[order] for field, values in arrays.items()}
+        timestamps = timestamps[order]
+    
+    starts = bucket_start(timestamps, interval)
+    first = np.flatnonzero(np.diff(starts, prepend=starts[:1] - 1)) if len(starts) else np.empty(0, dtype=np.int64)
+    ends = np.append(first[1:], len(starts))
+    
+    result = {
+        'timestamp': starts[first],
+        'open': np.asarray(arrays['open'], dtype=np.float64)[first],
+        'high': np.maximum.reduceat(arrays['high'], first) if len(first) else np.empty(0),
+        'low': np.minimum.reduceat(arrays['low'], first) if len(first) else np.empty(0),
+        'close': np.asarray(arrays['close'], dtype=np.float64)[ends - 1]
+    }
+    for field in SUM_FIELDS:
+        if field in arrays:
+            result[field] = np.add.reduceat(np.asarray(arrays[field], dtype=np.float64), first) if len(first) \
+                else np.empty(0)
+    if 'close_time' in arrays:
+        result['close_time'] = result['timestamp'] + size - 1
+    result['base_count'] = ends - first
+    expected = size // interval_ms(base_interval) if base_interval is not None else None
+    result['complete'] = result['base_count'] == expected if expected else np.ones(len(first), dtype=bool)
+    return result
+
+def arrays_to_klines(arrays: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """
+    Convertir velas por columna al formato de get_klines_data
+    
+    Args:
+        arrays: Velas por columna (ver resample_arrays)
+    
+    Returns:
+        Lista de velas con 'datetime' y las columnas de KLINE_COLUMNS presentes
+    """
+    fields = [field for field in KLINE_COLUMNS if field in arrays]
+    columns = [arrays[field].tolist() for field in fields]
+    klines = []
+    for values in zip(*columns):
+        kline = dict(zip(fields, values))
+        kline['datetime'] = datetime.fromtimestamp(kline['timestamp'] / 1000).isoformat()
+        if 'number_of_trades' in kline:
+            kline['number_of_trades'] = int(kline['number_of_trades'])
+        klines.append(kline)
+    return klines
+
+def last_timestamp(symbol: str, interval: str) -> Optional[int]:
+    """
+    Apertura de la última vela guardada de un par e intervalo
+    
+    Args:
+        symbol: Par de trading
+        interval: Intervalo de las velas
+    
+    Returns:
+        Timestamp en ms, o None si no hay velas guardadas
+    """
+    db = TimeSeriesDB()
+    try:
+        row = db.query_as_of('binance_klines', int(time.time() * 1000) + interval_ms(interval),
+                             filters={'symbol': symbol, 'interval': interval})
+    finally:
+        db.close()
+    return row['timestamp'] if row else None
+
+def first_timestamp(symbol: str, interval: str) -> Optional[int]:
+    """
+    Apertura de la primera vela guardada de un par e intervalo
+    
+    Args:
+        symbol: Par de trading
+        interval: Intervalo de las velas
+    
+    Returns:
+        Timestamp en ms, o None si no hay velas guardadas
+    """
+    db = TimeSeriesDB()
+    try:
+        rows = db.query_range('binance_klines', filters={'symbol': symbol, 'interval': interval},
+                              columns=['timestamp'], limit=1)
+    finally:
+        db.close()
+    return rows[0]['timestamp'] if rows else None
+
+def load_klines(symbol: str, interval: str, start: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Leer velas guardadas de un par e intervalo
+    
+    Args:
+        symbol: Par de trading
+        interval: Intervalo de las velas
+        start: Primera apertura a leer en ms (default: todo el histórico)
+    
+    Returns:
+        Velas ordenadas por tiempo con las columnas de KLINE_COLUMNS
+    """
+    db = TimeSeriesDB()
+    try:
+        return db.query_range('binance_klines', start=start, filters={'symbol': symbol, 'interval': interval},
+                              columns=KLINE_COLUMNS)
+    finally:
+        db.close()
+
+def save_resampled(symbol: str, interval: str, bars: Dict[str, np.ndarray], now_ms: Optional[int] = None) -> int:
+    """
+    Guardar velas remuestreadas en binance_klines con su intervalo
+    
+    Las velas ya cerradas a las que les faltan velas base (un hueco en los datos) no se guardan:
+    binance_klines no distingue velas incompletas y se leerían como velas cerradas normales. La
+    vela abierta sí se guarda aunque esté incompleta.
+    
+    Args:
+        symbol: Par de trading
+        interval: Intervalo de las velas
+        bars: Velas por columna de resample_arrays
+        now_ms: Instante actual en ms (default: ahora)
+    
+    Returns:
+        Número de velas escritas
+    """
+    if 'complete' in bars:
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        gaps = ~bars['complete'] & (bars['timestamp'] + interval_ms(interval) <= now_ms)
+        if gaps.any():
+            logger.warning(f"{int(gaps.sum())} velas {interval} de {symbol} cerradas con huecos en las velas "
+                           f"base no se guardan (aperturas en ms: {bars['timestamp'][gaps][:5].tolist()})")
+            bars = {field: values[~gaps] for field, values in bars.items()}
+    records = [dict(kline, symbol=symbol, interval=interval) for kline in arrays_to_klines(bars)]
+    for record in records:
+        del record['datetime']
+    return write_series('binance_klines', records)
+
+def update_resampled(symbol: str, base_interval: str, intervals: List[str],
+                     klines: List[Dict[str, Any]], now_ms: Optional[int] = None) -> Dict[str, int]:
+    """
+    Recalcular las velas de cada intervalo afectadas por velas base nuevas
+    
+    Las velas base ya deben estar guardadas. Solo se leen las velas base desde la apertura de la
+    vela destino que contiene la primera vela nueva, así que en una ingesta normal se reescribe
+    únicamente la vela abierta (o la que acaba de cerrar y la nueva).
+    
+    Args:
+        symbol: Par de trading
+        base_interval: Intervalo de las velas base
+        intervals: Intervalos destino
+        klines: Velas base nuevas o actualizadas
+        now_ms: Instante actual en ms (default: ahora)
+    
+    Returns:
+        {intervalo: velas reescritas}
+    """
+    if not klines or not intervals:
+        return {}
+    first = min(kline['timestamp'] for kline in klines)
+    starts = {interval: int(bucket_start(first, interval)) for interval in intervals}
+    base = rows_to_arrays(load_klines(symbol, base_interval, start=min(starts.values())))
+    if not base:
+        return {}
+    
+    written = {}
+    for interval in intervals:
+        offset = int(np.searchsorted(base['timestamp'], starts[interval]))
+        bars = resample_arrays({field: values[offset:] for field, values in base.items()}, interval, base_interval)
+        written[interval] = save_resampled(symbol, interval, bars, now_ms)
+    logger.info(f"Velas de {symbol} remuestreadas desde {base_interval}: {written}")
+    return written
+
+def rebuild_resampled(symbol: str, base_interval: str, intervals: List[str]) -> Dict[str, int]:
+    """
+    Reconstruir todas las velas de cada intervalo desde el histórico completo de velas base
+    
+    Args:
+        symbol: Par de trading
+        base_interval: Intervalo de las velas base
+        intervals: Intervalos destino
+    
+    Returns:
+        {intervalo: velas escritas}
+    """
+    base = rows_to_arrays(load_klines(symbol, base_interval))
+    if not base:
+        return {}
+    return {interval: save_resampled(symbol, interval, resample_arrays(base, interval, base_interval))
+            for interval in intervals}
+
+def latest_klines(symbol: str, interval: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Últimas velas guardadas de un intervalo en el formato de get_klines_data
+    
+    Args:
+        symbol: Par de trading
+        interval: Intervalo de las velas
+        limit: Número máximo de velas
+    
+    Returns:
+        Velas ordenadas por tiempo (la última puede estar abierta)
+    """
+    last = last_timestamp(symbol, interval)
+    if last is None:
+        return []
+    rows = load_klines(symbol, interval, start=last - (limit - 1) * interval_ms(interval))
+    return arrays_to_klines(rows_to_arrays(rows))[-limit:]
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Construir temporalidades superiores desde las velas base guardadas')
+    parser.add_argument('--symbol', default='BTCUSDT', help='Par de trading (default: BTCUSDT)')
+    parser.add_argument('--base', default=Config.KLINE_BASE_INTERVAL,
+                        help=f"Intervalo de las velas base (default: {Config.KLINE_BASE_INTERVAL})")
+    parser.add_argument('--intervals', default=','.join(Config.KLINE_INTERVALS),
+                        help=f"Intervalos destino separados por comas (default: {','.join(Config.KLINE_INTERVALS)})")
+    
+    args = parser.parse_args()
+    
+    try:
+        intervals = [interval.strip() for interval in args.intervals.split(',') if interval.strip()]
+        start = time.perf_counter()
+        written = rebuild_resampled(args.symbol, args.base, intervals)
+        elapsed = time.perf_counter() - start
+        if not written:
+            print(f"❌ No hay velas {args.base} de {args.symbol} guardadas")
+            sys.exit(1)
+        for interval, count in written.items():
+            print(f"✅ {args.symbol} {interval}: {count} velas")
+        print(f"📊 Remuestreo desde {args.base} completado en {elapsed:.2f}s")
+    
+    except Exception as e:
+        logger.error(f"Error en main: {e}")
+        print(f"❌ Error en el remuestreo: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Daemon de planificación de ingestas
+Refresca cada fuente con su propia cadencia usando `schedule`, espacia las fuentes cuyos datos
+no cambian, no solapa ejecuciones de una misma fuente, deja de esperar las ingestas que superan su
+tiempo máximo (sin relanzarlas hasta que terminan) y mantiene los clientes abiertos entre ciclos
+"""
+
+import os
+import sys
+import json
+import signal
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Any, Optional
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schedule
+from config.config import Config
+from scripts.orchestrator import IngestionOrchestrator
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Claves que cambian en cada ejecución aunque los datos sean los mismos
+VOLATILE_KEYS = {'timestamp', 'timestamp_utc', 'first_seen'}
+
+def _strip_volatile(data: Any) -> Any:
+    """Quitar recursivamente las marcas de tiempo de ejecución para comparar contenidos"""
+    if isinstance(data, dict):
+        return {k: _strip_volatile(v) for k, v in data.items() if k not in VOLATILE_KEYS}
+    if isinstance(data, list):
+        return [_strip_volatile(v) for v in data]
+    return data
+
+class IngestionScheduler:
+    def __init__(self, orchestrator: Optional[IngestionOrchestrator] = None,
+                 cadences: Optional[Dict[str, int]] = None, max_backoff: Optional[int] = None,
+                 scheduler: Optional[schedule.Scheduler] = None):
+        """
+        Inicializar el daemon de planificación
+        
+        Args:
+            orchestrator: Orquestador que ejecuta y sube cada fuente (se reutilizan sus ingesters)
+            cadences: Segundos entre refrescos por fuente (default: Config.SCHEDULE_CADENCES)
+            max_backoff: Multiplicador máximo de la cadencia sin cambios (default: Config.SCHEDULE_MAX_BACKOFF)
+            scheduler: Instancia de schedule.Scheduler (default: una nueva)
+        """
+        self.orchestrator = orchestrator or IngestionOrchestrator()
+        cadences = cadences if cadences is not None else Config.SCHEDULE_CADENCES
+        self.cadences = {name: seconds for name, seconds in cadences.items() if name in self.orchestrator.sources}
+        self.max_backoff = max(1, max_backoff if max_backoff is not None else Config.SCHEDULE_MAX_BACKOFF)
+        self.scheduler = scheduler or schedule.Scheduler()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.cadences)), thread_name_prefix='schedule')
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        
+        # Estado por fuente: ejecución en curso, multiplicador actual, ticks a saltar y último digest
+        self.state: Dict[str, Dict[str, Any]] = {
+            name: {'running': False, 'backoff': 1, 'skip': 0, 'digest': None,
+                   'runs': 0, 'coalesced': 0, 'skipped': 0, 'unchanged': 0, 'failures': 0, 'timeouts': 0}
+            for name in self.cadences
+        }
+
+    def data_digest(self, source: str) -> Optional[str]:
+        """
+        Calcular el hash del contenido del archivo de una fuente sin las marcas de tiempo de ejecución
+        
+        Args:
+            source: Nombre de la fuente
+        
+        Returns:
+            Hash SHA-1, o None si el archivo no se puede leer
+        """
+        path = os.path.join(Config.DATA_DIR, self.orchestrator.sources[source][2])
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = _strip_volatile(json.load(f))
+            return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        except Exception as e:
+            logger.warning(f"No se pudo calcular el digest de {source}: {e}")
+            return None
+
+    def tick(self, source: str) -> Optional[str]:
+        """
+        Tick de la planificación de una fuente: lanzar una ejecución salvo que haya una en curso
+        (se fusiona con ella) o que la fuente esté espaciada por no tener cambios
+        
+        Args:
+            source: Nombre de la fuente
+        
+        Returns:
+            'started', 'coalesced' o 'backoff'
+        """
+        with self.lock:
+            state = self.state[source]
+            if state['running']:
+                state['coalesced'] += 1
+                logger.info(f"{source}: ejecución anterior en curso, se fusiona el tick")
+                return 'coalesced'
+            if state['skip'] > 0:
+                state['skip'] -= 1
+                state['skipped'] += 1
+                return 'backoff'
+            state['running'] = True
+        
+        self.executor.submit(self.run_once, source)
+        return 'started'
+
+    def run_source(self, source: str) -> Dict[str, Any]:
+        """
+        Ejecutar la ingesta de una fuente con su tiempo máximo (Config.INGEST_TIMEOUTS)
+        
+        La ingesta corre en un hilo daemon del orquestador: si no termina a tiempo se da por fallida
+        y deja de esperarse, pero la fuente sigue en curso (sus ticks se fusionan) hasta que el hilo
+        termina de verdad, para no lanzar una segunda ingesta sobre el mismo ingester.
+        
+        Args:
+            source: Nombre de la fuente
+        
+        Returns:
+            Resultado de la ingesta, con 'timed_out' si se superó el tiempo máximo
+        """
+        future: Future = Future()
+        if not self.orchestrator.start_source(source, future.set_result):
+            return {'source': source, 'success': False, 'busy': True, 'seconds': 0.0,
+                    'error': "La ingesta anterior sigue en curso"}
+        timeout = self.orchestrator.get_timeout(source)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            logger.error(f"Ingesta programada de {source} cancelada por tiempo máximo")
+            with self.lock:
+                self.state[source]['timeouts'] += 1
+            future.add_done_callback(lambda _: self._release(source))
+            return {'source': source, 'success': False, 'timed_out': True, 'seconds': timeout,
+                    'error': f"Tiempo máximo de {timeout:.0f}s superado"}
+
+    def _release(self, source: str) -> None:
+        """Marcar la fuente como libre para el siguiente tick"""
+        with self.lock:
+            self.state[source]['running'] = False
+
+    def run_once(self, source: str) -> Dict[str, Any]:
+        """
+        Ejecutar la ingesta de una fuente, subirla si cambió y ajustar su espaciado
+        
+        Args:
+            source: Nombre de la fuente
+        
+        Returns:
+            Resultado de la ingesta, con 'changed' y 'upload' si se subió
+        """
+        # Tras un tiempo máximo la fuente se libera cuando termina el hilo de la ingesta, no aquí
+        release = True
+        try:
+            result = self.run_source(source)
+            release = not result.get('timed_out')
+            state = self.state[source]
+            state['runs'] += 1
+            
+            if not result['success']:
+                state['failures'] += 1
+                return result
+            
+            digest = self.data_digest(source)
+            result['changed'] = digest is None or digest != state['digest']
+            state['digest'] = digest
+            
+            with self.lock:
+                if result['changed']:
+                    state['backoff'] = 1
+                else:
+                    # Sin cambios: duplicar el intervalo efectivo hasta el máximo
+                    state['unchanged'] += 1
+                    state['backoff'] = min(state['backoff'] * 2, self.max_backoff)
+                state['skip'] = state['backoff'] - 1
+            
+            if result['changed'] and self.orchestrator.upload:
+                result['upload'] = self.orchestrator.upload_source(source)
+            return result
+        except Exception as e:
+            logger.error(f"Error en la ejecución programada de {source}: {e}")
+            self.state[source]['failures'] += 1
+            return {'source': source, 'success': False, 'error': str(e)}
+        finally:
+            if release:
+                self._release(source)
+
+    def register_jobs(self) -> None:
+        """Registrar un job de schedule por fuente con su cadencia"""
+        self.scheduler.clear()
+        for source, seconds in self.cadences.items():
+            self.scheduler.every(seconds).seconds.do(self.tick, source).tag(source)
+            logger.info(f"{source}: cada {seconds}s")
+
+    def run_forever(self, run_at_start: bool = True) -> None:
+        """
+        Bucle principal del daemon hasta que se llame a stop()
+        
+        Args:
+            run_at_start: Lanzar todas las fuentes al arrancar sin esperar a su primer tick
+        """
+        self.register_jobs()
+        if run_at_start:
+            for source in self.cadences:
+                self.tick(source)
+        
+        while not self.stop_event.is_set():
+            self.scheduler.run_pending()
+            idle = self.scheduler.idle_seconds
+            self.stop_event.wait(min(max(idle if idle is not None else 1.0, 0.05), 1.0))
+        
+        self.executor.shutdown(wait=True)
+        logger.info("Daemon de planificación detenido")
+
+    def stop(self) -> None:
+        """Pedir la parada del bucle principal (las ejecuciones en curso terminan)"""
+        self.stop_event.set()
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Estado actual de cada fuente
+        
+        Returns:
+            Copia del estado por fuente con su cadencia efectiva en segundos
+        """
+        with self.lock:
+            return {
+                source: dict(state, effective_seconds=self.cadences[source] * state['backoff'])
+                for source, state in self.state.items()
+            }
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Daemon de ingesta con cadencia por fuente')
+    parser.add_argument('--sources', '-s', default=None, help='Fuentes separadas por comas (default: todas)')
+    parser.add_argument('--no-upload', action='store_true', help='Solo ejecutar las ingestas')
+    parser.add_argument('--partitioned', action='store_true',
+                        help='Publicar snapshots inmutables por fuente y fecha más el manifiesto latest.json')
+    
+    args = parser.parse_args()
+    
+    try:
+        orchestrator = IngestionOrchestrator(upload=not args.no_upload, partitioned=args.partitioned)
+        cadences = dict(Config.SCHEDULE_CADENCES)
+        if args.sources:
+            names: List[str] = args.sources.split(',')
+            cadences = {name: seconds for name, seconds in cadences.items() if name in names}
+        
+        daemon = IngestionScheduler(orchestrator, cadences=cadences)
+        
+        # Parada ordenada con Ctrl+C o SIGTERM
+        signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+        try:
+            daemon.run_forever()
+        except KeyboardInterrupt:
+            daemon.stop()
+        
+        for source, state in daemon.status().items():
+            print(f"  {source}: {state['runs']} ejecuciones, {state['unchanged']} sin cambios, "
+                  f"{state['coalesced']} fusionadas, {state['failures']} fallos")
+    
+    except Exception as e:
+        logger.error(f"Error en main: {e}")
+        print(f"❌ Error en el daemon de planificación: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
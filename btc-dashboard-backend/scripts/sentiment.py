@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Análisis básico de sentimiento por palabras clave
+Compartido por los scripts de ingesta de Reddit y de noticias
+"""
+
+# Palabras clave para análisis básico de sentimiento
+POSITIVE_KEYWORDS = ['bullish', 'moon', 'pump', 'buy', 'hodl', 'up', 'green', 'profit', 'gain']
+NEGATIVE_KEYWORDS = ['bearish', 'dump', 'sell', 'down', 'red', 'loss', 'crash', 'dip']
+
+def score_text(text: str) -> int:
+    """
+    Puntuar un texto con el análisis de palabras clave
+    
+    Args:
+        text: Texto a puntuar
+    
+    Returns:
+        Positivo si domina el sentimiento alcista, negativo si domina el bajista, 0 si es neutral
+    """
+    text_lower = text.lower()
+    positive_count = sum(1 for keyword in POSITIVE_KEYWORDS if keyword in text_lower)
+    negative_count = sum(1 for keyword in NEGATIVE_KEYWORDS if keyword in text_lower)
+    return positive_count - negative_count
+
+def classify_ratio(sentiment_ratio: float) -> str:
+    """
+    Clasificar un ratio de sentimiento positivo/total
+    
+    Args:
+        sentiment_ratio: Proporción de elementos positivos sobre positivos + negativos
+    
+    Returns:
+        'bullish', 'bearish' o 'neutral'
+    """
+    if sentiment_ratio > 0.6:
+        return 'bullish'
+    elif sentiment_ratio < 0.4:
+        return 'bearish'
+    return 'neutral'
@@ -0,0 +1,574 @@
+#!/usr/bin/env python3
+"""
+Capa de almacenamiento compartida por los scripts de ingesta
+Los snapshots del dashboard se guardan en JSON y las series temporales en Parquet particionado por mes
+y en una base SQLite indexada, para poder leer rangos largos y consultas as-of sin parsear JSON
+"""
+
+import os
+import json
+import logging
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional
+
+from config.config import Config
+
+# pyarrow es opcional (sin él solo se guardan los snapshots JSON) y se importa en el primer uso con _load_arrow
+pa = pc = pq = None
+_arrow_lock = threading.Lock()
+_arrow_checked = False
+
+# fcntl solo existe en POSIX: en otros sistemas el renombrado sigue siendo atómico pero sin bloqueo entre procesos
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Bloqueo advisory exclusivo sobre un archivo, entre hilos y procesos
+    
+    Se bloquea un archivo oculto '.<nombre>.lock' junto al destino, de modo que el propio
+    destino se pueda reemplazar por renombrado mientras se mantiene el bloqueo.
+    
+    Args:
+        path: Ruta del archivo a proteger
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f".{name}.lock"), 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+def atomic_write(path: str, payload, lock: bool = True) -> None:
+    """
+    Escribir un archivo de forma atómica: archivo temporal en el mismo directorio, fsync y renombrado
+    
+    Los lectores ven siempre la versión anterior completa o la nueva completa, nunca un archivo a medias.
+    
+    Args:
+        path: Ruta de destino
+        payload: Contenido en bytes o str (UTF-8)
+        lock: Serializar con file_lock a otros escritores del mismo archivo (False si ya se tiene el bloqueo)
+    """
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    
+    if lock:
+        with file_lock(path):
+            atomic_write(path, payload, lock=False)
+        return
+    
+    directory, name = os.path.split(os.path.abspath(path))
+    # El sufijo .tmp evita que los temporales se confundan con snapshots *.json
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp crea el archivo con permisos 0600: conservar los del destino o usar 0644
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    
+    # Persistir también la entrada de directorio del renombrado
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def atomic_write_json(path: str, data: Any, indent: Optional[int] = None) -> None:
+    """
+    Serializar datos a JSON y escribirlos con atomic_write
+    
+    Args:
+        path: Ruta de destino
+        data: Datos serializables a JSON
+        indent: Indentación (None = compacto)
+    """
+    separators = None if indent is not None else (',', ':')
+    atomic_write(path, json.dumps(data, indent=indent, ensure_ascii=False, separators=separators))
+
+def save_snapshot(data: Dict[str, Any], filename: str) -> str:
+    """
+    Guardar el snapshot JSON de una fuente en el directorio de datos
+    
+    Args:
+        data: Datos a guardar
+        filename: Nombre del archivo
+    
+    Returns:
+        Ruta del archivo guardado
+    """
+    try:
+        # Crear directorio de datos si no existe
+        os.makedirs(Config.DATA_DIR, exist_ok=True)
+        
+        filepath = os.path.join(Config.DATA_DIR, filename)
+        
+        # Escritura atómica: el uploader o un lector concurrente nunca ve un JSON a medias
+        atomic_write_json(filepath, data, indent=2)
+        
+        logger.info(f"Datos guardados en {filepath}")
+        return filepath
+    
+    except Exception as e:
+        logger.error(f"Error al guardar datos en {filename}: {e}")
+        raise
+
+def to_epoch_ms(value: Any) -> Optional[int]:
+    """
+    Convertir una marca de tiempo a milisegundos desde epoch (UTC)
+    
+    Args:
+        value: Entero en ms, float en segundos, datetime o cadena ISO ('2025-01-01' o '2025-01-01T10:00:00')
+    
+    Returns:
+        Milisegundos desde epoch, o None si no se puede convertir
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value * 1000)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1000)
+    return None
+
+# Esquemas de cada serie temporal: columnas tipadas, clave única (upsert) e índice de consulta
+# Todas las series tienen la columna 'timestamp' en ms UTC
+DATASETS: Dict[str, Dict[str, Any]] = {
+    'binance_klines': {
+        'columns': [
+            ('symbol', 'string'), ('interval', 'string'), ('timestamp', 'int64'),
+            ('open', 'float64'), ('high', 'float64'), ('low', 'float64'), ('close', 'float64'),
+            ('volume', 'float64'), ('close_time', 'int64'), ('quote_asset_volume', 'float64'),
+            ('number_of_trades', 'int64'), ('taker_buy_base_asset_volume', 'float64'),
+            ('taker_buy_quote_asset_volume', 'float64')
+        ],
+        'key': ['symbol', 'interval', 'timestamp'],
+        'index': ['symbol', 'timestamp']
+    },
+    'binance_open_interest': {
+        'columns': [('symbol', 'string'), ('timestamp', 'int64'), ('open_interest', 'float64')],
+        'key': ['symbol', 'timestamp'],
+        'index': ['symbol', 'timestamp']
+    },
+    'coinglass_funding_rates': {
+        'columns': [('exchange', 'string'), ('symbol', 'string'), ('timestamp', 'int64'), ('funding_rate', 'float64')],
+        'key': ['exchange', 'symbol', 'timestamp'],
+        'index': ['symbol', 'timestamp']
+    },
+    'fred_observations': {
+        'columns': [('series_id', 'string'), ('timestamp', 'int64'), ('value', 'float64')],
+        'key': ['series_id', 'timestamp'],
+        'index': ['series_id', 'timestamp']
+    },
+    'yfinance_daily': {
+        'columns': [
+            ('symbol', 'string'), ('timestamp', 'int64'), ('open', 'float64'), ('high', 'float64'),
+            ('low', 'float64'), ('close', 'float64'), ('volume', 'int64')
+        ],
+        'key': ['symbol', 'timestamp'],
+        'index': ['symbol', 'timestamp']
+    },
+    'reddit_posts': {
+        'columns': [
+            ('id', 'string'), ('subreddit', 'string'), ('timestamp', 'int64'), ('title', 'string'),
+            ('score', 'int64'), ('num_comments', 'int64'), ('upvote_ratio', 'float64')
+        ],
+        'key': ['id'],
+        'index': ['subreddit', 'timestamp']
+    }
+}
+
+def availability_lag_ms(dataset: str, key: Optional[str] = None) -> int:
+    """
+    Retraso entre el timestamp de un registro y el instante en que el dato es público
+    
+    Las velas diarias de yfinance y las observaciones de FRED se guardan con la fecha de la sesión u
+    observación (00:00 UTC), pero solo se conocen tras el cierre de la sesión o la publicación del
+    dato; cualquier alineación punto en el tiempo debe sumar este retraso.
+    
+    Args:
+        dataset: Nombre de la serie
+        key: series_id de FRED (default: el mayor retraso configurado)
+    
+    Returns:
+        Milisegundos (0 para las series que se publican en su timestamp)
+    """
+    if dataset == 'yfinance_daily':
+        return int(Config.YFINANCE_AVAILABLE_AFTER_HOURS * 3600 * 1000)
+    if dataset == 'fred_observations':
+        lags = Config.FRED_RELEASE_LAG_DAYS
+        days = lags.get(key, lags.get('*', 0)) if key is not None else max(lags.values(), default=0)
+        return int(float(days) * 24 * 3600 * 1000)
+    return 0
+
+def _load_arrow() -> bool:
+    """
+    Importar pyarrow y construir los esquemas de DATASETS la primera vez que se necesitan
+    
+    Returns:
+        True si pyarrow está instalado
+    """
+    global pa, pc, pq, _arrow_checked
+    with _arrow_lock:
+        if not _arrow_checked:
+            try:
+                import pyarrow
+                import pyarrow.compute
+                import pyarrow.parquet
+                arrow_types = {'string': pyarrow.string(), 'int64': pyarrow.int64(), 'float64': pyarrow.float64()}
+                for spec in DATASETS.values():
+                    spec['schema'] = pyarrow.schema([(name, arrow_types[kind]) for name, kind in spec['columns']])
+                pa, pc, pq = pyarrow, pyarrow.compute, pyarrow.parquet
+            except ImportError:
+                pass
+            _arrow_checked = True
+    return pa is not None
+
+class TimeSeriesStore:
+    def __init__(self, base_dir: Optional[str] = None):
+        """
+        Inicializar el almacén de series temporales
+        
+        Args:
+            base_dir: Directorio raíz (default: Config.TIMESERIES_DIR)
+        """
+        self.base_dir = base_dir or Config.TIMESERIES_DIR
+
+    @property
+    def available(self) -> bool:
+        """True si pyarrow está instalado y se pueden escribir series temporales"""
+        return _load_arrow()
+
+    def partition_path(self, dataset: str, month: str) -> str:
+        """
+        Ruta del archivo Parquet de un mes
+        
+        Args:
+            dataset: Nombre de la serie
+            month: Mes en formato AAAA-MM
+        
+        Returns:
+            Ruta <base>/<serie>/month=AAAA-MM/part.parquet
+        """
+        return os.path.join(self.base_dir, dataset, f"month={month}", 'part.parquet')
+
+    def write(self, dataset: str, records: List[Dict[str, Any]]) -> int:
+        """
+        Insertar o actualizar registros en la serie, fusionando con las particiones existentes
+        
+        Args:
+            dataset: Nombre de la serie (ver DATASETS)
+            records: Registros con al menos las columnas del esquema; 'timestamp' en ms UTC
+        
+        Returns:
+            Número de registros escritos
+        """
+        if not self.available:
+            logger.warning(f"pyarrow no está disponible, no se guarda la serie {dataset}")
+            return 0
+        if not records:
+            return 0
+        
+        spec = DATASETS[dataset]
+        schema = spec['schema']
+        columns = schema.names
+        
+        table = pa.Table.from_pylist([{c: r.get(c) for c in columns} for r in records], schema=schema)
+        table = table.filter(pc.is_valid(table['timestamp']))
+        
+        # Particionar por mes (UTC) de la columna de tiempo
+        months = pc.strftime(pc.cast(table['timestamp'], pa.timestamp('ms', tz='UTC')), format='%Y-%m')
+        unique_months = pc.unique(months).to_pylist()
+        for month in unique_months:
+            part = table.filter(pc.equal(months, month))
+            path = self.partition_path(dataset, month)
+            
+            # Leer, fusionar y reemplazar la partición bajo bloqueo para no perder escrituras concurrentes
+            with file_lock(path):
+                if os.path.exists(path):
+                    part = pa.concat_tables([pq.read_table(path, schema=schema), part])
+                
+                # Conservar la última versión de cada clave y ordenar por tiempo
+                part = part.append_column('__row', pa.array(range(len(part)), pa.int64()))
+                last = part.group_by(spec['key']).aggregate([('__row', 'max')])['__row_max']
+                part = part.take(last).drop_columns(['__row'])
+                part = part.sort_by([('timestamp', 'ascending')] + [(k, 'ascending') for k in spec['key'] if k != 'timestamp'])
+                
+                sink = pa.BufferOutputStream()
+                pq.write_table(part, sink, compression='zstd')
+                atomic_write(path, sink.getvalue().to_pybytes(), lock=False)
+        
+        logger.info(f"Serie {dataset}: {len(table)} registros escritos en {len(unique_months)} particiones")
+        return len(table)
+
+    def read(self, dataset: str, start: Any = None, end: Any = None,
+             filters: Optional[Dict[str, Any]] = None) -> 'pa.Table':
+        """
+        Leer un rango de la serie
+        
+        Args:
+            dataset: Nombre de la serie
+            start: Inicio del rango (inclusive; ms, datetime o ISO)
+            end: Fin del rango (exclusivo; ms, datetime o ISO)
+            filters: Igualdades adicionales por columna, p. ej. {'symbol': 'BTCUSDT'}
+        
+        Returns:
+            Tabla pyarrow ordenada por tiempo (vacía si no hay datos)
+        """
+        if not self.available:
+            raise RuntimeError("pyarrow no está instalado, no se pueden leer series temporales")
+        schema = DATASETS[dataset]['schema']
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        dataset_dir = os.path.join(self.base_dir, dataset)
+        if not os.path.isdir(dataset_dir):
+            return schema.empty_table()
+        
+        # Descartar particiones fuera del rango sin abrirlas
+        start_month = datetime.fromtimestamp(start_ms / 1000, timezone.utc).strftime('%Y-%m') if start_ms is not None else None
+        end_month = datetime.fromtimestamp(end_ms / 1000, timezone.utc).strftime('%Y-%m') if end_ms is not None else None
+        
+        tables = []
+        for entry in sorted(os.listdir(dataset_dir)):
+            if not entry.startswith('month='):
+                continue
+            month = entry[len('month='):]
+            if (start_month and month < start_month) or (end_month and month > end_month):
+                continue
+            path = os.path.join(dataset_dir, entry, 'part.parquet')
+            if os.path.exists(path):
+                tables.append(pq.read_table(path, schema=schema))
+        
+        if not tables:
+            return schema.empty_table()
+        
+        table = pa.concat_tables(tables)
+        conditions = []
+        if start_ms is not None:
+            conditions.append(pc.greater_equal(table['timestamp'], start_ms))
+        if end_ms is not None:
+            conditions.append(pc.less(table['timestamp'], end_ms))
+        for column, value in (filters or {}).items():
+            conditions.append(pc.equal(table[column], value))
+        mask = None
+        for condition in conditions:
+            mask = condition if mask is None else pc.and_(mask, condition)
+        return table.filter(mask) if mask is not None else table
+
+class TimeSeriesDB:
+    # Tamaño de lote de executemany en los upserts
+    BATCH_SIZE = 5000
+    
+    def __init__(self, path: Optional[str] = None):
+        """
+        Inicializar la base SQLite de series temporales (una tabla por serie)
+        
+        Args:
+            path: Ruta del archivo de base de datos (default: Config.TIMESERIES_DB)
+        """
+        self.path = path or Config.TIMESERIES_DB
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        
+        # WAL permite lecturas concurrentes mientras un ingester escribe
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA temp_store=MEMORY')
+        self.create_tables()
+
+    def create_tables(self) -> None:
+        """Crear las tablas e índices de todas las series si no existen"""
+        sql_types = {'string': 'TEXT', 'int64': 'INTEGER', 'float64': 'REAL'}
+        with self.lock, self.conn:
+            for dataset, spec in DATASETS.items():
+                columns = ', '.join(f"{name} {sql_types[kind]}" for name, kind in spec['columns'])
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {dataset} ({columns}, PRIMARY KEY ({', '.join(spec['key'])}))"
+                )
+                if spec['index'] != spec['key'][:len(spec['index'])]:
+                    self.conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_{dataset}_{'_'.join(spec['index'])} "
+                        f"ON {dataset} ({', '.join(spec['index'])})"
+                    )
+
+    def close(self) -> None:
+        """Cerrar la conexión"""
+        self.conn.close()
+
+    def upsert(self, dataset: str, records: List[Dict[str, Any]]) -> int:
+        """
+        Insertar o actualizar registros en bloque (una transacción por llamada)
+        
+        Args:
+            dataset: Nombre de la serie (ver DATASETS)
+            records: Registros con al menos las columnas del esquema; 'timestamp' en ms UTC
+        
+        Returns:
+            Número de registros escritos
+        """
+        spec = DATASETS[dataset]
+        columns = [name for name, _ in spec['columns']]
+        updates = [c for c in columns if c not in spec['key']]
+        sql = (
+            f"INSERT INTO {dataset} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT ({', '.join(spec['key'])}) DO "
+            + (f"UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in updates)}" if updates else "NOTHING")
+        )
+        
+        rows = [tuple(r.get(c) for c in columns) for r in records if r.get('timestamp') is not None]
+        with self.lock, self.conn:
+            for start in range(0, len(rows), self.BATCH_SIZE):
+                self.conn.executemany(sql, rows[start:start + self.BATCH_SIZE])
+        
+        logger.info(f"Serie {dataset}: {len(rows)} registros guardados en {self.path}")
+        return len(rows)
+
+    @staticmethod
+    def _where(start: Any = None, end: Any = None, filters: Optional[Dict[str, Any]] = None) -> tuple:
+        """Construir la cláusula WHERE y sus parámetros para un rango y filtros de igualdad"""
+        clauses, params = [], []
+        for column, value in (filters or {}).items():
+            clauses.append(f"{column} = ?")
+            params.append(value)
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        if start_ms is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start_ms)
+        if end_ms is not None:
+            clauses.append("timestamp < ?")
+            params.append(end_ms)
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ''), params
+
+    def query_range(self, dataset: str, start: Any = None, end: Any = None,
+                    filters: Optional[Dict[str, Any]] = None, columns: Optional[List[str]] = None,
+                    limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Leer un rango de la serie
+        
+        Args:
+            dataset: Nombre de la serie
+            start: Inicio del rango (inclusive; ms, datetime o ISO)
+            end: Fin del rango (exclusivo; ms, datetime o ISO)
+            filters: Igualdades por columna, p. ej. {'symbol': 'BTCUSDT'}
+            columns: Columnas a devolver (default: todas)
+            limit: Número máximo de filas
+        
+        Returns:
+            Lista de registros ordenados por tiempo
+        """
+        self._check_columns(dataset, list(filters or {}) + (columns or []))
+        where, params = self._where(start, end, filters)
+        sql = f"SELECT {', '.join(columns) if columns else '*'} FROM {dataset}{where} ORDER BY timestamp"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def query_as_of(self, dataset: str, at: Any, filters: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Obtener el último registro con timestamp <= `at` (p. ej. el DXY vigente a la hora de una vela)
+        
+        Args:
+            dataset: Nombre de la serie
+            at: Instante de referencia (ms, datetime o ISO)
+            filters: Igualdades por columna, p. ej. {'series_id': 'DTWEXBGS'}
+        
+        Returns:
+            Registro vigente en ese instante, o None si no hay datos anteriores
+        """
+        self._check_columns(dataset, list(filters or {}))
+        where, params = self._where(filters=filters)
+        where += (" AND" if where else " WHERE") + " timestamp <= ?"
+        params.append(to_epoch_ms(at))
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT * FROM {dataset}{where} ORDER BY timestamp DESC LIMIT 1", params
+            ).fetchone()
+        return dict(row) if row else None
+
+    def bucket_checksums(self, dataset: str, bucket_ms: int, columns: List[str],
+                         filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Resumen por intervalos de tiempo: número de filas y suma de columnas numéricas
+
+        Sirve para detectar qué tramos de una serie cambiaron entre dos lecturas sin leer las filas.
+
+        Args:
+            dataset: Nombre de la serie
+            bucket_ms: Tamaño del intervalo en ms (los intervalos empiezan en múltiplos desde el epoch)
+            columns: Columnas numéricas que entran en la suma
+            filters: Igualdades por columna, p. ej. {'symbol': 'BTCUSDT'}
+
+        Returns:
+            Lista de {'bucket': inicio en ms, 'count', 'total'} ordenada por tiempo
+        """
+        self._check_columns(dataset, list(filters or {}) + columns)
+        where, params = self._where(filters=filters)
+        total = ' + '.join(f"TOTAL({column})" for column in columns) or '0'
+        sql = (f"SELECT timestamp / ? * ? AS bucket, COUNT(*) AS count, {total} AS total "
+               f"FROM {dataset}{where} GROUP BY bucket ORDER BY bucket")
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, [bucket_ms, bucket_ms] + params)]
+
+    @staticmethod
+    def _check_columns(dataset: str, columns: List[str]) -> None:
+        """Validar nombres de columnas antes de interpolarlos en SQL"""
+        known = {name for name, _ in DATASETS[dataset]['columns']}
+        unknown = [c for c in columns if c not in known]
+        if unknown:
+            raise ValueError(f"Columnas desconocidas en {dataset}: {unknown}")
+
+def write_series(dataset: str, records: List[Dict[str, Any]]) -> int:
+    """
+    Guardar registros de una serie en la base SQLite y en el almacén Parquet
+    
+    Args:
+        dataset: Nombre de la serie (ver DATASETS)
+        records: Registros con 'timestamp' en ms UTC
+    
+    Returns:
+        Número de registros escritos en la base
+    """
+    if not records:
+        return 0
+    db = TimeSeriesDB()
+    try:
+        written = db.upsert(dataset, records)
+    finally:
+        db.close()
+    TimeSeriesStore().write(dataset, records)
+    return written
@@ -8,20 +8,118 @@ import sys
 import json
 import logging
 import argparse
+import gzip
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List, Dict, Any
 
 # Añadir el directorio padre al path para importar config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import boto3
-from botocore.exceptions import ClientError, NoCredentialsError
 from config.config import Config
+from scripts.lazy import lazy_import
+from scripts.json_patch import make_patch
+from scripts.json_stream import dumps_bytes, iter_json_parts
+from scripts.storage import atomic_write_json
+
+# boto3/botocore se importan en el primer uso (su importación cuesta cientos de ms)
+boto3 = lazy_import('boto3')
+botocore_config = lazy_import('botocore.config')
+botocore_exceptions = lazy_import('botocore.exceptions')
+
+# brotli es opcional: sin él solo se publica con gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Tamaño mínimo de cada parte de una subida multipart (salvo la última) en S3/R2
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+def encode_json_compact(data: Any) -> bytes:
+    """
+    Serializar datos a JSON compacto (sin indentación ni espacios)
+    
+    Args:
+        data: Datos serializables a JSON
+    
+    Returns:
+        JSON codificado en UTF-8
+    """
+    return dumps_bytes(data)
+
+def compress_payload(payload: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """
+    Comprimir un payload para servirlo con Content-Encoding
+    
+    Args:
+        payload: Bytes a comprimir
+        encoding: 'gzip' o 'br'
+        level: Nivel de compresión (gzip 1-9, brotli 0-11; default: Config.R2_COMPRESSION_LEVEL)
+    
+    Returns:
+        Payload comprimido
+    """
+    if level is None:
+        level = Config.R2_COMPRESSION_LEVEL
+    
+    if encoding == 'gzip':
+        # mtime=0 para que el mismo contenido produzca siempre los mismos bytes
+        return gzip.compress(payload, compresslevel=min(max(level, 1), 9), mtime=0)
+    if encoding == 'br':
+        if brotli is None:
+            raise ValueError("La codificación 'br' requiere el paquete brotli")
+        return brotli.compress(payload, quality=min(max(level, 0), 11))
+    raise ValueError(f"Codificación no soportada: {encoding}")
+
+def source_name(filename: str) -> str:
+    """
+    Obtener el nombre de la fuente a partir del archivo de datos ('binance_data.json' -> 'binance')
+    
+    Args:
+        filename: Nombre o ruta del archivo
+    
+    Returns:
+        Nombre de la fuente
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return stem[:-len('_data')] if stem.endswith('_data') else stem
+
+def delta_key(source: str, version: int) -> str:
+    """
+    Construir la clave del delta que lleva una fuente de la versión `version - 1` a `version`
+    
+    Args:
+        source: Nombre de la fuente
+        version: Versión de destino
+    
+    Returns:
+        Clave con formato <prefijo>/<fuente>/<versión>.json
+    """
+    return f"{Config.R2_DELTA_PREFIX}/{source}/{version}.json"
+
+def snapshot_key(source: str, timestamp: datetime, digest: str) -> str:
+    """
+    Construir la clave inmutable de un snapshot particionado por fuente y fecha/hora
+    
+    Args:
+        source: Nombre de la fuente
+        timestamp: Momento del snapshot (UTC)
+        digest: Hash del contenido (se usan los primeros 12 caracteres)
+    
+    Returns:
+        Clave con formato <prefijo>/<fuente>/AAAA/MM/DD/HH/<fuente>_<AAAAMMDDTHHMMSSZ>_<hash>.json
+    """
+    return (f"{Config.R2_SNAPSHOT_PREFIX}/{source}/{timestamp:%Y/%m/%d/%H}/"
+            f"{source}_{timestamp:%Y%m%dT%H%M%SZ}_{digest[:12]}.json")
+
 class R2Uploader:
     def __init__(self):
         """Inicializar el cliente de S3 para Cloudflare R2"""
@@ -37,10 +135,29 @@ class R2Uploader:
                 endpoint_url=Config.R2_ENDPOINT_URL,
                 aws_access_key_id=Config.R2_ACCESS_KEY_ID,
                 aws_secret_access_key=Config.R2_SECRET_ACCESS_KEY,
-                region_name='auto'  # R2 usa 'auto' como región
+                region_name='auto',  # R2 usa 'auto' como región
+                # Un único cliente compartido por todos los hilos de subida
+                config=botocore_config.Config(max_pool_connections=max(Config.R2_UPLOAD_WORKERS, 10))
             )
             
             self.bucket_name = Config.R2_BUCKET_NAME
+            self.last_upload_summary = None
+            
+            # Manifiesto local de hashes para no resubir archivos sin cambios
+            self.manifest_path = os.path.join(Config.STATE_DIR, 'r2_manifest.json')
+            self.manifest = self.load_manifest()
+            self.manifest_lock = threading.Lock()
+            
+            # Índice local de objetos del bucket para consultas sin listar
+            self.index_path = os.path.join(Config.STATE_DIR, 'r2_index.json')
+            self.index = self.load_index()
+            
+            # Copia local del manifiesto latest.json de los snapshots particionados
+            self.latest_path = os.path.join(Config.STATE_DIR, 'latest.json')
+            self.latest_lock = threading.Lock()
+            # Última versión publicada de cada fuente, base para calcular los deltas
+            self.published_dir = os.path.join(Config.STATE_DIR, 'published')
+            
             logger.info(f"Cliente R2 inicializado para bucket: {self.bucket_name}")
             
         except Exception as e:
@@ -107,32 +224,39 @@ class R2Uploader:
         except FileNotFoundError:
             logger.error(f"Archivo no encontrado: {local_file_path}")
             return False
-        except NoCredentialsError:
+        except botocore_exceptions.NoCredentialsError:
             logger.error("Credenciales de R2 no válidas")
             return False
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             logger.error(f"Error del cliente S3/R2: {e}")
             return False
         except Exception as e:
             logger.error(f"Error inesperado al subir archivo: {e}")
             return False
 
-    def upload_json_data(self, data: dict, remote_key: str) -> bool:
+    def upload_json_data(self, data: dict, remote_key: str, part_size: Optional[int] = None) -> bool:
         """
         Subir datos JSON directamente a R2
         
+        El JSON se serializa en bloques compactos que se envían según se generan: los objetos
+        pequeños van en un único put_object y los grandes en una subida multipart, de modo que
+        la memoria pico se mantiene cerca del tamaño de bloque.
+        
         Args:
             data: Datos a subir en formato dict
             remote_key: Clave/nombre del archivo en R2
+            part_size: Tamaño de bloque en bytes (default: Config.R2_MULTIPART_CHUNK_MB; mínimo MIN_PART_SIZE)
         
         Returns:
             True si la subida fue exitosa, False en caso contrario
         """
+        upload_id = None
         try:
             logger.info(f"Subiendo datos JSON a {remote_key}")
             
-            # Convertir datos a JSON
-            json_data = json.dumps(data, indent=2, ensure_ascii=False)
+            if part_size is None:
+                part_size = Config.R2_MULTIPART_CHUNK_MB * 1024 * 1024
+            part_size = max(part_size, MIN_PART_SIZE)
             
             # Preparar metadatos
             metadata = {
@@ -141,28 +265,431 @@ class R2Uploader:
                 'content_type': 'application/json'
             }
             
-            # Subir datos
+            parts = iter_json_parts(data, part_size)
+            first = next(parts, b'')
+            
+            if len(first) < part_size:
+                # Cabe en un bloque: subida directa
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=remote_key,
+                    Body=first,
+                    ContentType='application/json',
+                    Metadata=metadata
+                )
+            else:
+                upload_id = self.s3_client.create_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=remote_key,
+                    ContentType='application/json',
+                    Metadata=metadata
+                )['UploadId']
+                
+                completed = []
+                pending = [first]
+                first = None
+                for body in self._chain_parts(pending, parts):
+                    number = len(completed) + 1
+                    response = self.s3_client.upload_part(
+                        Bucket=self.bucket_name,
+                        Key=remote_key,
+                        UploadId=upload_id,
+                        PartNumber=number,
+                        Body=body
+                    )
+                    completed.append({'PartNumber': number, 'ETag': response['ETag']})
+                    # Soltar la parte antes de generar la siguiente (enumerate la retendría)
+                    del body
+                
+                self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=remote_key,
+                    UploadId=upload_id,
+                    MultipartUpload={'Parts': completed}
+                )
+                logger.info(f"Subida multipart de {remote_key} completada en {len(completed)} partes")
+            
+            logger.info(f"✅ Datos JSON subidos exitosamente: {remote_key}")
+            return True
+            
+        except botocore_exceptions.ClientError as e:
+            logger.error(f"Error del cliente S3/R2: {e}")
+            self._abort_multipart(remote_key, upload_id)
+            return False
+        except Exception as e:
+            logger.error(f"Error inesperado al subir datos JSON: {e}")
+            self._abort_multipart(remote_key, upload_id)
+            return False
+
+    @staticmethod
+    def _chain_parts(pending: List[bytes], rest):
+        """Reencadenar el bloque ya consumido con el resto del generador, sin retenerlo"""
+        while pending:
+            yield pending.pop(0)
+        yield from rest
+
+    def _abort_multipart(self, remote_key: str, upload_id: Optional[str]) -> None:
+        """
+        Abortar una subida multipart incompleta para no dejar partes huérfanas en el bucket
+        
+        Args:
+            remote_key: Clave del objeto
+            upload_id: Identificador de la subida multipart (None si no se inició)
+        """
+        if upload_id is None:
+            return
+        try:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=remote_key, UploadId=upload_id)
+        except Exception as e:
+            logger.warning(f"No se pudo abortar la subida multipart de {remote_key}: {e}")
+
+    def publish_snapshot(self, data: dict, remote_key: str, encoding: Optional[str] = None,
+                         level: Optional[int] = None, cache_control: Optional[str] = None) -> bool:
+        """
+        Publicar un snapshot JSON compacto y precomprimido para el frontend
+        
+        Args:
+            data: Datos a publicar en formato dict
+            remote_key: Clave/nombre del archivo en R2
+            encoding: 'gzip', 'br' o 'none' (default: Config.R2_PUBLISH_ENCODING)
+            level: Nivel de compresión (default: Config.R2_COMPRESSION_LEVEL)
+            cache_control: Cabecera Cache-Control (default: Config.R2_CACHE_CONTROL)
+        
+        Returns:
+            True si la publicación fue exitosa, False en caso contrario
+        """
+        try:
+            if encoding is None:
+                encoding = Config.R2_PUBLISH_ENCODING
+            if cache_control is None:
+                cache_control = Config.R2_CACHE_CONTROL
+            
+            payload = encode_json_compact(data)
+            raw_size = len(payload)
+            
+            extra_args = {
+                'ContentType': 'application/json',
+                'CacheControl': cache_control
+            }
+            if encoding and encoding != 'none':
+                payload = compress_payload(payload, encoding, level)
+                extra_args['ContentEncoding'] = encoding
+            
+            logger.info(f"Publicando snapshot en {remote_key} ({raw_size} -> {len(payload)} bytes, {encoding})")
+            
             self.s3_client.put_object(
                 Bucket=self.bucket_name,
                 Key=remote_key,
-                Body=json_data.encode('utf-8'),
-                ContentType='application/json',
-                Metadata=metadata
+                Body=payload,
+                Metadata={
+                    'uploaded_at': datetime.utcnow().isoformat(),
+                    'source': 'btc-dashboard-backend',
+                    'uncompressed_size': str(raw_size)
+                },
+                **extra_args
             )
             
-            logger.info(f"✅ Datos JSON subidos exitosamente: {remote_key}")
+            logger.info(f"✅ Snapshot publicado exitosamente: {remote_key}")
             return True
             
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             logger.error(f"Error del cliente S3/R2: {e}")
             return False
         except Exception as e:
-            logger.error(f"Error inesperado al subir datos JSON: {e}")
+            logger.error(f"Error inesperado al publicar snapshot: {e}")
+            return False
+
+    def publish_file(self, local_file_path: str, remote_key: Optional[str] = None,
+                     encoding: Optional[str] = None, level: Optional[int] = None) -> bool:
+        """
+        Publicar un archivo JSON local como snapshot compacto y precomprimido
+        
+        Args:
+            local_file_path: Ruta local del archivo JSON
+            remote_key: Clave/nombre del archivo en R2 (opcional, usa el nombre del archivo local)
+            encoding: 'gzip', 'br' o 'none' (default: Config.R2_PUBLISH_ENCODING)
+            level: Nivel de compresión (default: Config.R2_COMPRESSION_LEVEL)
+        
+        Returns:
+            True si la publicación fue exitosa, False en caso contrario
+        """
+        try:
+            with open(local_file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error al leer {local_file_path}: {e}")
+            return False
+        
+        if remote_key is None:
+            remote_key = os.path.basename(local_file_path)
+        
+        return self.publish_snapshot(data, remote_key, encoding=encoding, level=level)
+
+    def load_latest_manifest(self) -> Dict[str, Any]:
+        """
+        Cargar la copia local del manifiesto latest.json
+        
+        Returns:
+            Manifiesto con la clave actual de cada fuente
+        """
+        try:
+            if os.path.exists(self.latest_path):
+                with open(self.latest_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning(f"No se pudo leer la copia local de {Config.R2_LATEST_KEY}: {e}")
+        return {'updated_at': None, 'sources': {}}
+
+    def _publish_partitioned_file(self, local_file_path: str, latest: Dict[str, Any],
+                                  encoding: Optional[str]) -> Dict[str, Any]:
+        """
+        Publicar un archivo de datos bajo una clave inmutable particionada si su contenido cambió
+        
+        Args:
+            local_file_path: Ruta local del archivo JSON
+            latest: Manifiesto latest.json actual
+            encoding: 'gzip', 'br' o None
+        
+        Returns:
+            Resultado de la publicación, con la entrada nueva del manifiesto en 'entry'
+        """
+        start = time.perf_counter()
+        source = source_name(local_file_path)
+        size = os.path.getsize(local_file_path)
+        md5 = self.file_md5(local_file_path)
+        
+        current = latest['sources'].get(source, {})
+        if current.get('md5') == md5 and current.get('encoding') == encoding:
+            logger.info(f"Sin cambios, se mantiene {current['key']}")
+            return {'file': os.path.basename(local_file_path), 'success': True, 'skipped': True,
+                    'bytes': 0, 'bytes_saved': size, 'seconds': time.perf_counter() - start, 'entry': current}
+        
+        with open(local_file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        # Particionar por la marca de tiempo de la ingesta si existe
+        try:
+            timestamp = datetime.fromisoformat(data['timestamp_utc'])
+        except (KeyError, TypeError, ValueError):
+            timestamp = datetime.utcnow()
+        
+        key = snapshot_key(source, timestamp, md5)
+        success = self.publish_snapshot(data, key, encoding=encoding or 'none',
+                                        cache_control=Config.R2_IMMUTABLE_CACHE_CONTROL)
+        entry = {'key': key, 'md5': md5, 'size': size, 'encoding': encoding,
+                 'timestamp': timestamp.isoformat()} if success else None
+        if success:
+            entry.update(self._publish_delta(source, current, data, md5, encoding))
+        
+        return {'file': os.path.basename(local_file_path), 'success': success, 'skipped': False,
+                'bytes': size if success else 0, 'bytes_saved': 0,
+                'seconds': time.perf_counter() - start, 'entry': entry}
+
+    def load_published_copy(self, source: str, entry: Dict[str, Any]) -> Optional[Any]:
+        """
+        Obtener el contenido del snapshot al que apunta una entrada de latest.json
+        
+        Se usa la copia local si corresponde a esa versión y, si no, se descarga de R2.
+        
+        Args:
+            source: Nombre de la fuente
+            entry: Entrada actual de la fuente en latest.json
+        
+        Returns:
+            Datos del snapshot, o None si no se pueden obtener
+        """
+        if not entry:
+            return None
+        path = os.path.join(self.published_dir, f"{source}.json")
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    published = json.load(f)
+                if published.get('md5') == entry.get('md5'):
+                    return published['data']
+            return self.download_json(entry['key'])
+        except Exception as e:
+            logger.warning(f"No se pudo obtener la versión publicada de {source}, sin delta: {e}")
+            return None
+
+    def _publish_delta(self, source: str, previous: Dict[str, Any], data: Any, md5: str,
+                       encoding: Optional[str]) -> Dict[str, Any]:
+        """
+        Publicar el delta JSON Patch entre la versión anterior de una fuente y la nueva
+        
+        Args:
+            source: Nombre de la fuente
+            previous: Entrada anterior de la fuente en latest.json ({} si no existe)
+            data: Datos del snapshot nuevo
+            md5: Hash del archivo nuevo
+            encoding: 'gzip', 'br' o None
+        
+        Returns:
+            Campos de versión para la entrada de latest.json: 'version', 'delta_from' y 'delta_prefix'
+            (un cliente en una versión >= delta_from puede aplicar los deltas hasta 'version')
+        """
+        version = previous.get('version', 0) + 1
+        delta_from = version
+        
+        old = self.load_published_copy(source, previous)
+        if old is not None:
+            patch = {'source': source, 'from_version': version - 1, 'to_version': version,
+                     'ops': make_patch(old, data)}
+            # Si el delta no es más pequeño que el snapshot se corta la cadena
+            if len(dumps_bytes(patch)) < len(dumps_bytes(data)):
+                if self.publish_snapshot(patch, delta_key(source, version), encoding=encoding or 'none',
+                                         cache_control=Config.R2_IMMUTABLE_CACHE_CONTROL):
+                    delta_from = max(previous.get('delta_from', version - 1), version - Config.R2_DELTA_MAX_CHAIN)
+        
+        try:
+            atomic_write_json(os.path.join(self.published_dir, f"{source}.json"),
+                              {'version': version, 'md5': md5, 'data': data})
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la copia publicada de {source}: {e}")
+        
+        return {'version': version, 'delta_from': delta_from, 'delta_prefix': f"{Config.R2_DELTA_PREFIX}/{source}/"}
+
+    def publish_partitioned_snapshots(self, max_workers: Optional[int] = None,
+                                      encoding: Optional[str] = None) -> bool:
+        """
+        Publicar los archivos de datos con claves inmutables por fuente y fecha/hora y
+        actualizar el manifiesto latest.json (TTL corto) que apunta al snapshot actual de cada fuente
+        
+        Cada snapshot nuevo incrementa la versión de su fuente y publica además el delta JSON Patch
+        desde la versión anterior, para que los clientes actualizados solo descarguen los cambios.
+        
+        Args:
+            max_workers: Número de subidas simultáneas (default: Config.R2_UPLOAD_WORKERS)
+            encoding: 'gzip', 'br' o 'none' (default: Config.R2_PUBLISH_ENCODING)
+        
+        Returns:
+            True si todas las publicaciones fueron exitosas, False en caso contrario
+        """
+        data_dir = Config.DATA_DIR
+        
+        if not os.path.exists(data_dir):
+            logger.warning(f"Directorio de datos {data_dir} no existe")
+            return True
+        
+        local_paths = [
+            os.path.join(data_dir, filename)
+            for filename in sorted(os.listdir(data_dir))
+            if filename.endswith('.json')
+        ]
+        return self.publish_partitioned_files(local_paths, max_workers=max_workers, encoding=encoding)
+
+    def publish_partitioned_files(self, local_paths: List[str], max_workers: Optional[int] = None,
+                                  encoding: Optional[str] = None) -> bool:
+        """
+        Publicar archivos concretos como snapshots particionados y actualizar latest.json
+        
+        Las llamadas concurrentes (p. ej. una por fuente según terminan las ingestas) se serializan
+        para que ninguna pierda las entradas de latest.json escritas por otra.
+        
+        Args:
+            local_paths: Rutas locales de los archivos JSON
+            max_workers: Número de subidas simultáneas (default: Config.R2_UPLOAD_WORKERS)
+            encoding: 'gzip', 'br' o 'none' (default: Config.R2_PUBLISH_ENCODING)
+        
+        Returns:
+            True si todas las publicaciones fueron exitosas, False en caso contrario
+        """
+        try:
+            if max_workers is None:
+                max_workers = Config.R2_UPLOAD_WORKERS
+            if encoding is None:
+                encoding = Config.R2_PUBLISH_ENCODING
+            if encoding == 'none':
+                encoding = None
+            
+            with self.latest_lock:
+                latest = self.load_latest_manifest()
+
+                def publish(path):
+                    return self._publish_partitioned_file(path, latest, encoding)
+                
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(local_paths) or 1))) as executor:
+                    results = list(executor.map(publish, local_paths))
+                
+                # Actualizar el manifiesto solo si cambió alguna fuente
+                changed = False
+                for path, result in zip(local_paths, results):
+                    if result['success'] and not result['skipped']:
+                        latest['sources'][source_name(path)] = result['entry']
+                        changed = True
+                
+                if changed:
+                    latest['updated_at'] = datetime.utcnow().isoformat()
+                    if self.publish_snapshot(latest, Config.R2_LATEST_KEY, encoding='none',
+                                             cache_control=Config.R2_LATEST_CACHE_CONTROL):
+                        os.makedirs(os.path.dirname(self.latest_path), exist_ok=True)
+                        atomic_write_json(self.latest_path, latest, indent=2)
+                    else:
+                        # Sin manifiesto publicado los snapshots nuevos no son visibles para los clientes
+                        for result in results:
+                            if not result['skipped']:
+                                result['success'] = False
+                elapsed = time.perf_counter() - start
+                
+                success_count = sum(1 for result in results if result['success'])
+                total_count = len(results)
+                total_bytes = sum(result['bytes'] for result in results)
+                
+                self.last_upload_summary = {
+                    'success_count': success_count,
+                    'total_count': total_count,
+                    'total_bytes': total_bytes,
+                    'skipped_count': sum(1 for result in results if result['skipped']),
+                    'bytes_saved': sum(result['bytes_saved'] for result in results),
+                    'seconds': elapsed,
+                    'files_per_second': total_count / elapsed if elapsed > 0 else 0,
+                    'bytes_per_second': total_bytes / elapsed if elapsed > 0 else 0,
+                    'max_workers': max_workers,
+                    'results': results
+                }
+                
+                logger.info(f"Snapshots particionados publicados: {success_count}/{total_count}")
+                return success_count == total_count
+            
+        except Exception as e:
+            logger.error(f"Error al publicar snapshots particionados: {e}")
             return False
 
+    def _iter_bucket_objects(self, prefix: str = '', start_after: Optional[str] = None):
+        """
+        Recorrer los objetos del bucket página a página (list_objects_v2 devuelve máximo 1000 por llamada)
+        
+        Args:
+            prefix: Prefijo para filtrar objetos
+            start_after: Empezar después de esta clave (listado incremental)
+        
+        Yields:
+            Diccionarios con key, size, last_modified y etag de cada objeto
+        """
+        params = {'Bucket': self.bucket_name, 'Prefix': prefix}
+        if start_after:
+            params['StartAfter'] = start_after
+        
+        while True:
+            response = self.s3_client.list_objects_v2(**params)
+            
+            for obj in response.get('Contents', []):
+                yield {
+                    'key': obj['Key'],
+                    'size': obj['Size'],
+                    'last_modified': obj['LastModified'].isoformat(),
+                    'etag': obj['ETag']
+                }
+            
+            if not response.get('IsTruncated'):
+                break
+            params['ContinuationToken'] = response['NextContinuationToken']
+            params.pop('StartAfter', None)
+
     def list_files(self, prefix: str = '') -> list:
         """
-        Listar archivos en el bucket
+        Listar archivos en el bucket (todas las páginas) y actualizar el índice local
         
         Args:
             prefix: Prefijo para filtrar archivos
@@ -173,31 +700,119 @@ class R2Uploader:
         try:
             logger.info(f"Listando archivos en bucket {self.bucket_name}")
             
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=prefix
-            )
-            
-            files = []
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    files.append({
-                        'key': obj['Key'],
-                        'size': obj['Size'],
-                        'last_modified': obj['LastModified'].isoformat(),
-                        'etag': obj['ETag']
-                    })
+            files = list(self._iter_bucket_objects(prefix))
+            self._update_index(prefix, files, replace=True)
             
             logger.info(f"Encontrados {len(files)} archivos")
             return files
             
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             logger.error(f"Error al listar archivos: {e}")
             return []
         except Exception as e:
             logger.error(f"Error inesperado al listar archivos: {e}")
             return []
 
+    def load_index(self) -> Dict[str, Any]:
+        """
+        Cargar el índice local de objetos del bucket
+        
+        Returns:
+            Diccionario con 'objects' (clave -> metadatos) y 'prefixes' (prefijo -> última actualización)
+        """
+        try:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                index.setdefault('objects', {})
+                index.setdefault('prefixes', {})
+                return index
+        except Exception as e:
+            logger.warning(f"No se pudo leer el índice local del bucket, se ignorará: {e}")
+        return {'objects': {}, 'prefixes': {}}
+
+    def save_index(self) -> None:
+        """Guardar el índice local de objetos del bucket"""
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            atomic_write_json(self.index_path, self.index)
+        except Exception as e:
+            logger.error(f"Error al guardar el índice local del bucket: {e}")
+
+    def _update_index(self, prefix: str, files: List[Dict[str, Any]], replace: bool) -> None:
+        """
+        Incorporar un listado al índice local
+        
+        Args:
+            prefix: Prefijo listado
+            files: Objetos devueltos por el listado
+            replace: Si True, el listado es completo para el prefijo y se eliminan las claves ausentes
+        """
+        objects = self.index['objects']
+        if replace:
+            for key in [k for k in objects if k.startswith(prefix)]:
+                del objects[key]
+        for obj in files:
+            objects[obj['key']] = {'size': obj['size'], 'etag': obj['etag'], 'last_modified': obj['last_modified']}
+        self.index['prefixes'][prefix] = datetime.utcnow().isoformat()
+        self.save_index()
+
+    def refresh_index(self, prefix: str = '', full: bool = False) -> int:
+        """
+        Actualizar el índice local para un prefijo
+        
+        Si el prefijo ya se indexó, solo se listan las claves posteriores a la última conocida
+        (adecuado para claves inmutables que crecen en orden, como los snapshots por fecha).
+        
+        Args:
+            prefix: Prefijo a actualizar
+            full: Forzar un listado completo del prefijo (detecta borrados y sobrescrituras)
+        
+        Returns:
+            Número de objetos listados
+        """
+        try:
+            known = [k for k in self.index['objects'] if k.startswith(prefix)]
+            incremental = not full and prefix in self.index['prefixes'] and known
+            start_after = max(known) if incremental else None
+            
+            files = list(self._iter_bucket_objects(prefix, start_after=start_after))
+            self._update_index(prefix, files, replace=not incremental)
+            
+            logger.info(f"Índice actualizado para '{prefix}': {len(files)} objetos "
+                        f"({'incremental' if incremental else 'completo'})")
+            return len(files)
+            
+        except botocore_exceptions.ClientError as e:
+            logger.error(f"Error al actualizar el índice: {e}")
+            return 0
+        except Exception as e:
+            logger.error(f"Error inesperado al actualizar el índice: {e}")
+            return 0
+
+    def query_index(self, prefix: str = '', start: Optional[str] = None,
+                    end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Consultar el índice local sin llamar al bucket
+        
+        Args:
+            prefix: Prefijo de las claves
+            start: Fecha ISO mínima de last_modified (inclusive)
+            end: Fecha ISO máxima de last_modified (exclusiva)
+        
+        Returns:
+            Lista de archivos ordenada por clave, con el mismo formato que list_files
+        """
+        files = []
+        for key in sorted(k for k in self.index['objects'] if k.startswith(prefix)):
+            obj = self.index['objects'][key]
+            if start and obj['last_modified'] < start:
+                continue
+            if end and obj['last_modified'] >= end:
+                continue
+            files.append({'key': key, **obj})
+        return files
+
     def delete_file(self, remote_key: str) -> bool:
         """
         Eliminar un archivo de R2
@@ -219,17 +834,242 @@ class R2Uploader:
             logger.info(f"✅ Archivo eliminado exitosamente: {remote_key}")
             return True
             
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             logger.error(f"Error al eliminar archivo: {e}")
             return False
         except Exception as e:
             logger.error(f"Error inesperado al eliminar archivo: {e}")
             return False
 
-    def upload_all_data_files(self) -> bool:
+    def delete_files(self, remote_keys: List[str], batch_size: int = 1000) -> List[str]:
+        """
+        Eliminar varios archivos de R2 con peticiones delete_objects por lotes
+        
+        Args:
+            remote_keys: Claves de los archivos a eliminar
+            batch_size: Claves por petición (máximo 1000 en S3/R2)
+        
+        Returns:
+            Lista de claves eliminadas correctamente
+        """
+        deleted = []
+        batch_size = min(max(batch_size, 1), 1000)
+        
+        for start in range(0, len(remote_keys), batch_size):
+            batch = remote_keys[start:start + batch_size]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+                failed = {error['Key'] for error in response.get('Errors', [])}
+                for error in response.get('Errors', []):
+                    logger.error(f"Error al eliminar {error['Key']}: {error.get('Message')}")
+                deleted.extend(key for key in batch if key not in failed)
+                
+            except botocore_exceptions.ClientError as e:
+                logger.error(f"Error al eliminar lote de {len(batch)} archivos: {e}")
+            except Exception as e:
+                logger.error(f"Error inesperado al eliminar lote de {len(batch)} archivos: {e}")
+        
+        # Mantener el índice local coherente con el bucket
+        if deleted:
+            for key in deleted:
+                self.index['objects'].pop(key, None)
+            self.save_index()
+        
+        logger.info(f"Eliminados {len(deleted)}/{len(remote_keys)} archivos")
+        return deleted
+
+    def download_json(self, remote_key: str) -> Any:
+        """
+        Descargar y decodificar un objeto JSON (descomprimiendo gzip/br si hace falta)
+        
+        Args:
+            remote_key: Clave del objeto
+        
+        Returns:
+            Datos decodificados
+        """
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=remote_key)
+        payload = response['Body'].read()
+        
+        encoding = response.get('ContentEncoding')
+        if encoding == 'gzip':
+            payload = gzip.decompress(payload)
+        elif encoding == 'br':
+            if brotli is None:
+                raise ValueError(f"{remote_key} está comprimido con brotli y el paquete no está instalado")
+            payload = brotli.decompress(payload)
+        
+        return json.loads(payload)
+
+    def load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Cargar el manifiesto local de hashes de los objetos subidos
+        
+        Returns:
+            Diccionario clave remota -> {'md5', 'size', 'uploaded_at'}
+        """
+        try:
+            if os.path.exists(self.manifest_path):
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning(f"No se pudo leer el manifiesto de subidas, se ignorará: {e}")
+        return {}
+
+    def save_manifest(self) -> None:
+        """Guardar el manifiesto local de hashes"""
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            with self.manifest_lock:
+                atomic_write_json(self.manifest_path, self.manifest, indent=2)
+        except Exception as e:
+            logger.error(f"Error al guardar el manifiesto de subidas: {e}")
+
+    def refresh_manifest_from_bucket(self, prefix: str = '') -> int:
+        """
+        Sembrar el manifiesto con los ETag remotos usando el listado del bucket
+        
+        Para objetos subidos en una sola parte el ETag es el MD5 del contenido, así que
+        basta un listado (sin un HEAD por archivo) para detectar objetos ya actualizados.
+        upload_files lo usa cuando el manifiesto local está vacío; también con --refresh-manifest.
+        
+        Args:
+            prefix: Prefijo para filtrar objetos
+        
+        Returns:
+            Número de entradas añadidas o actualizadas
+        """
+        updated = 0
+        for obj in self.list_files(prefix):
+            etag = obj['etag'].strip('"')
+            # Los ETag multipart ('<hash>-<partes>') no son un MD5 del contenido
+            if '-' in etag:
+                continue
+            with self.manifest_lock:
+                entry = self.manifest.get(obj['key'], {})
+                if entry.get('md5') != etag:
+                    self.manifest[obj['key']] = {'md5': etag, 'size': obj['size'], 'encoding': None,
+                                                 'uploaded_at': obj['last_modified']}
+                    updated += 1
+        
+        logger.info(f"Manifiesto actualizado desde el bucket: {updated} entradas")
+        return updated
+
+    @staticmethod
+    def file_md5(local_file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """
+        Calcular el MD5 de un archivo leyendo por bloques
+        
+        Args:
+            local_file_path: Ruta local del archivo
+            chunk_size: Tamaño de bloque en bytes
+        
+        Returns:
+            Hash MD5 en hexadecimal
+        """
+        digest = hashlib.md5()
+        with open(local_file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _upload_with_stats(self, local_file_path: str, skip_unchanged: bool = False,
+                           encoding: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Subir un archivo y medir tamaño y duración
+        
+        Args:
+            local_file_path: Ruta local del archivo
+            skip_unchanged: Omitir la subida si el hash coincide con el del manifiesto
+            encoding: Si se indica ('gzip'/'br'), publicar como snapshot compacto y comprimido
+        
+        Returns:
+            Resultado de la subida del archivo
+        """
+        start = time.perf_counter()
+        remote_key = os.path.basename(local_file_path)
+        exists = os.path.exists(local_file_path)
+        size = os.path.getsize(local_file_path) if exists else 0
+        md5 = self.file_md5(local_file_path) if exists else None
+        
+        if skip_unchanged and md5 is not None:
+            with self.manifest_lock:
+                entry = self.manifest.get(remote_key, {})
+                unchanged = entry.get('md5') == md5 and entry.get('encoding') == encoding
+            if unchanged:
+                logger.info(f"Sin cambios, se omite: {remote_key}")
+                return {
+                    'file': remote_key,
+                    'success': True,
+                    'skipped': True,
+                    'bytes': 0,
+                    'bytes_saved': size,
+                    'seconds': time.perf_counter() - start
+                }
+        
+        if encoding:
+            success = self.publish_file(local_file_path, remote_key, encoding=encoding)
+        else:
+            success = self.upload_file(local_file_path, remote_key)
+        if success and md5 is not None:
+            with self.manifest_lock:
+                self.manifest[remote_key] = {'md5': md5, 'size': size, 'encoding': encoding,
+                                             'uploaded_at': datetime.utcnow().isoformat()}
+        
+        return {
+            'file': remote_key,
+            'success': success,
+            'skipped': False,
+            'bytes': size if success else 0,
+            'bytes_saved': 0,
+            'seconds': time.perf_counter() - start
+        }
+
+    def upload_files(self, local_paths: List[str], max_workers: int = 1,
+                     skip_unchanged: bool = False, encoding: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Subir varios archivos, en paralelo si max_workers > 1
+        
+        Args:
+            local_paths: Rutas locales de los archivos
+            max_workers: Número máximo de subidas simultáneas
+            skip_unchanged: Omitir los archivos cuyo hash coincide con el del manifiesto
+            encoding: Publicar como snapshots comprimidos ('gzip'/'br') en lugar de subir el archivo tal cual
+        
+        Returns:
+            Lista de resultados por archivo, en el mismo orden que local_paths
+        """
+        def upload(path):
+            return self._upload_with_stats(path, skip_unchanged=skip_unchanged, encoding=encoding)
+        
+        # Sin manifiesto local (primer arranque o estado borrado) se siembra con los ETag del bucket
+        # para no volver a subir lo que ya está publicado
+        if skip_unchanged and not self.manifest:
+            self.refresh_manifest_from_bucket()
+        
+        if max_workers <= 1 or len(local_paths) <= 1:
+            results = [upload(path) for path in local_paths]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(local_paths))) as executor:
+                results = list(executor.map(upload, local_paths))
+        
+        self.save_manifest()
+        return results
+
+    def upload_all_data_files(self, max_workers: Optional[int] = None,
+                              skip_unchanged: Optional[bool] = None,
+                              encoding: Optional[str] = None) -> bool:
         """
         Subir todos los archivos de datos del directorio local
         
+        Args:
+            max_workers: Número de subidas simultáneas (default: Config.R2_UPLOAD_WORKERS)
+            skip_unchanged: Omitir archivos sin cambios según el manifiesto (default: Config.R2_SKIP_UNCHANGED)
+            encoding: 'gzip', 'br' o 'none' para publicar snapshots comprimidos (default: Config.R2_PUBLISH_ENCODING)
+        
         Returns:
             True si todas las subidas fueron exitosas, False en caso contrario
         """
@@ -240,21 +1080,54 @@ class R2Uploader:
                 logger.warning(f"Directorio de datos {data_dir} no existe")
                 return True
             
-            success_count = 0
-            total_count = 0
+            if max_workers is None:
+                max_workers = Config.R2_UPLOAD_WORKERS
+            if skip_unchanged is None:
+                skip_unchanged = Config.R2_SKIP_UNCHANGED
+            if encoding is None:
+                encoding = Config.R2_PUBLISH_ENCODING
+            if encoding == 'none':
+                encoding = None
             
             # Buscar archivos JSON en el directorio de datos
-            for filename in os.listdir(data_dir):
-                if filename.endswith('.json'):
-                    total_count += 1
-                    local_path = os.path.join(data_dir, filename)
-                    
-                    if self.upload_file(local_path):
-                        success_count += 1
-                    else:
-                        logger.error(f"Falló la subida de {filename}")
+            local_paths = [
+                os.path.join(data_dir, filename)
+                for filename in sorted(os.listdir(data_dir))
+                if filename.endswith('.json')
+            ]
+            
+            start = time.perf_counter()
+            results = self.upload_files(local_paths, max_workers=max_workers,
+                                        skip_unchanged=skip_unchanged, encoding=encoding)
+            elapsed = time.perf_counter() - start
             
-            logger.info(f"Subidas completadas: {success_count}/{total_count}")
+            for result in results:
+                if not result['success']:
+                    logger.error(f"Falló la subida de {result['file']}")
+            
+            success_count = sum(1 for result in results if result['success'])
+            total_count = len(results)
+            total_bytes = sum(result['bytes'] for result in results)
+            skipped_count = sum(1 for result in results if result['skipped'])
+            bytes_saved = sum(result['bytes_saved'] for result in results)
+            
+            self.last_upload_summary = {
+                'success_count': success_count,
+                'total_count': total_count,
+                'total_bytes': total_bytes,
+                'skipped_count': skipped_count,
+                'bytes_saved': bytes_saved,
+                'seconds': elapsed,
+                'files_per_second': total_count / elapsed if elapsed > 0 else 0,
+                'bytes_per_second': total_bytes / elapsed if elapsed > 0 else 0,
+                'max_workers': max_workers,
+                'results': results
+            }
+            
+            logger.info(f"Subidas completadas: {success_count}/{total_count} "
+                        f"({skipped_count} sin cambios, {bytes_saved} bytes ahorrados; "
+                        f"{total_bytes} bytes en {elapsed:.2f}s, "
+                        f"{self.last_upload_summary['files_per_second']:.1f} archivos/s, {max_workers} hilos)")
             return success_count == total_count
             
         except Exception as e:
@@ -268,8 +1141,25 @@ def main():
     parser.add_argument('--key', '-k', help='Clave remota para el archivo')
     parser.add_argument('--all', '-a', action='store_true', help='Subir todos los archivos de datos')
     parser.add_argument('--list', '-l', action='store_true', help='Listar archivos en el bucket')
+    parser.add_argument('--prefix', '-p', default='', help='Prefijo para --list y --refresh-manifest')
+    parser.add_argument('--offline', action='store_true',
+                        help='Con --list, consultar solo el índice local sin llamar al bucket')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='Número de subidas simultáneas con --all (default: R2_UPLOAD_WORKERS)')
+    parser.add_argument('--compress', '-c', choices=['gzip', 'br', 'none'], default=None,
+                        help='Publicar con --all como JSON compacto precomprimido (default: R2_PUBLISH_ENCODING)')
+    parser.add_argument('--partitioned', action='store_true',
+                        help='Con --all, publicar snapshots inmutables por fuente y fecha más el manifiesto latest.json')
+    parser.add_argument('--force', action='store_true',
+                        help='Subir todos los archivos aunque no hayan cambiado desde la última subida '
+                             '(no compatible con --partitioned)')
+    parser.add_argument('--refresh-manifest', action='store_true',
+                        help='Actualizar el manifiesto de subidas con los ETag del bucket (antes de --all)')
     
     args = parser.parse_args()
+    if args.force and args.partitioned:
+        # Los snapshots particionados son inmutables: los que no cambiaron se reconocen por su MD5 en latest.json
+        parser.error('--force no es compatible con --partitioned')
     
     try:
         # Validar configuración
@@ -278,16 +1168,39 @@ def main():
         # Crear instancia del uploader
         uploader = R2Uploader()
         
+        if args.refresh_manifest:
+            updated = uploader.refresh_manifest_from_bucket(args.prefix)
+            uploader.save_manifest()
+            print(f"🔄 Manifiesto de subidas: {updated} entradas actualizadas desde el bucket")
+        
         if args.list:
             # Listar archivos
-            files = uploader.list_files()
+            if args.offline:
+                files = uploader.query_index(args.prefix)
+            else:
+                files = uploader.list_files(args.prefix)
             print(f"\n📁 Archivos en bucket {uploader.bucket_name}:")
             for file_info in files:
                 print(f"  - {file_info['key']} ({file_info['size']} bytes, {file_info['last_modified']})")
             
         elif args.all:
             # Subir todos los archivos de datos
-            if uploader.upload_all_data_files():
+            if args.partitioned:
+                success = uploader.publish_partitioned_snapshots(max_workers=args.workers,
+                                                                 encoding=args.compress)
+            else:
+                success = uploader.upload_all_data_files(max_workers=args.workers,
+                                                         skip_unchanged=False if args.force else None,
+                                                         encoding=args.compress)
+            summary = uploader.last_upload_summary
+            if summary:
+                for result in summary['results']:
+                    status = "⏭️" if result['skipped'] else "✅" if result['success'] else "❌"
+                    print(f"  {status} {result['file']} ({result['bytes']} bytes, {result['seconds']:.2f}s)")
+                print(f"📊 {summary['success_count']}/{summary['total_count']} archivos, "
+                      f"{summary['skipped_count']} sin cambios ({summary['bytes_saved']} bytes ahorrados), "
+                      f"{summary['bytes_per_second'] / 1024:.1f} KiB/s")
+            if success:
                 print("✅ Todos los archivos de datos subidos exitosamente")
             else:
                 print("❌ Error al subir algunos archivos de datos")
@@ -300,7 +1213,7 @@ def main():
             else:
                 print(f"❌ Error al subir archivo {args.file}")
                 sys.exit(1)
-        else:
+        elif not args.refresh_manifest:
             parser.print_help()
         
     except Exception as e:
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Volatilidad realizada de BTC y clasificación del régimen de volatilidad
+Calcula los estimadores close-to-close, Parkinson y Garman-Klass sobre varias ventanas (en días)
+con el motor vectorizado de scripts/indicators.py o de forma incremental con el estado de
+scripts/indicator_state.py, y clasifica el régimen actual (baja / normal / alta / extrema) para el
+snapshot de Binance y el motor de decisión
+"""
+
+import os
+import sys
+import logging
+import argparse
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+# Añadir el directorio padre al path para importar config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+from scripts.indicators import compute_indicators, klines_to_arrays
+from scripts.indicator_state import load_history, update_indicator_state
+from scripts.resample import interval_ms
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DAY_MS = 24 * 3600 * 1000
+
+# Regímenes de menor a mayor volatilidad (separados por Config.VOLATILITY_REGIME_THRESHOLDS)
+REGIMES = ['baja', 'normal', 'alta', 'extrema']
+UNKNOWN = 'desconocido'
+
+# Cociente ventana corta / ventana larga a partir del cual la volatilidad se expande o se contrae
+TREND_BAND = 0.2
+
+def volatility_column(estimator: str, days: int) -> str:
+    """Nombre de la columna de un estimador y una ventana (p. ej. 'vol_parkinson_7d')"""
+    return f"vol_{estimator}_{days}d"
+
+def volatility_specs(interval: Optional[str] = None, estimators: Optional[List[str]] = None,
+                     windows: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """
+    Especificaciones de indicadores para cada estimador y ventana
+    
+    Args:
+        interval: Intervalo de las velas (default: Config.KLINE_PRIMARY_INTERVAL)
+        estimators: Estimadores (default: Config.VOLATILITY_ESTIMATORS)
+        windows: Ventanas en días (default: Config.VOLATILITY_WINDOWS_DAYS)
+    
+    Returns:
+        Lista de {'name': 'realized_vol', ...} con la ventana convertida a velas y su alias
+    """
+    bar_ms = interval_ms(interval or Config.KLINE_PRIMARY_INTERVAL)
+    periods_per_year = 365 * DAY_MS / bar_ms
+    return [
+        {'name': 'realized_vol', 'period': max(2, round(days * DAY_MS / bar_ms)), 'estimator': estimator,
+         'periods_per_year': periods_per_year, 'alias': volatility_column(estimator, days)}
+        for estimator in (estimators or Config.VOLATILITY_ESTIMATORS)
+        for days in (windows or Config.VOLATILITY_WINDOWS_DAYS)
+    ]
+
+def regime_specs(interval: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Especificaciones de las dos series que usa el régimen: ventana más corta y más larga"""
+    windows = sorted({min(Config.VOLATILITY_WINDOWS_DAYS), max(Config.VOLATILITY_WINDOWS_DAYS)})
+    return volatility_specs(interval, [Config.VOLATILITY_REGIME_ESTIMATOR], windows)
+
+def compute_volatility(arrays: Dict[str, np.ndarray], interval: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Volatilidad realizada de todo el histórico, todos los estimadores y ventanas a la vez
+    
+    Args:
+        arrays: Arrays de klines (ver klines_to_arrays)
+        interval: Intervalo de las velas (default: Config.KLINE_PRIMARY_INTERVAL)
+    
+    Returns:
+        {columna: array} en % anualizado, alineado con las velas
+    """
+    return compute_indicators(arrays, volatility_specs(interval))
+
+def regime_codes(volatility: Any) -> np.ndarray:
+    """
+    Índice en REGIMES del régimen de cada valor de volatilidad
+    
+    Args:
+        volatility: Volatilidad anualizada en % (escalar o array)
+    
+    Returns:
+        Array int con el índice del régimen (-1 si el valor es NaN)
+    """
+    values = np.atleast_1d(np.asarray(volatility, dtype=np.float64))
+    codes = np.digitize(values, Config.VOLATILITY_REGIME_THRESHOLDS)
+    return np.where(np.isnan(values), -1, codes)
+
+def regime_label(code: int) -> str:
+    """Nombre del régimen de un índice de regime_codes"""
+    return REGIMES[code] if 0 <= code < len(REGIMES) else UNKNOWN
+
+def blocked_codes(regimes: Optional[List[str]] = None) -> List[int]:
+    """Índices de los regímenes sin operación (default: Config.SIGNAL_BLOCKED_REGIMES)"""
+    regimes = regimes if regimes is not None else Config.SIGNAL_BLOCKED_REGIMES
+    return [REGIMES.index(regime) for regime in regimes if regime in REGIMES]
+
+def classify_regime(values: Dict[str, Optional[float]], interval: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Clasificar el régimen actual a partir del último valor de cada estimador
+    
+    Args:
+        values: {columna: volatilidad en %} (salida del estado incremental o de latest_values)
+        interval: Intervalo de las velas (default: Config.KLINE_PRIMARY_INTERVAL)
+    
+    Returns:
+        Régimen, volatilidad de la ventana corta y larga, tendencia (expansión / contracción /
+        estable) y el valor de todos los estimadores
+    """
+    specs = regime_specs(interval)
+    short_spec, long_spec = specs[0], specs[-1]
+    short, long = values.get(short_spec['alias']), values.get(long_spec['alias'])
+    code = int(regime_codes(np.nan if short is None else short)[0])
+    
+    trend, ratio = UNKNOWN, None
+    if short is not None and long:
+        ratio = short / long
+        trend = 'expansion' if ratio > 1 + TREND_BAND else 'contraccion' if ratio < 1 - TREND_BAND else 'estable'
+    return {
+        'regimen': regime_label(code),
+        'volatilidad': short,
+        'volatilidad_larga': long,
+        'tendencia': trend,
+        'ratio_corta_larga': ratio,
+        'operacion_bloqueada': code in blocked_codes(),
+        'estimadores': values
+    }
+
+def update_volatility_state(symbol: str, interval: str, klines: List[Dict[str, Any]],
+                            now_ms: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Actualizar de forma incremental la volatilidad con las velas cerradas nuevas y clasificar el régimen
+    
+    El estado se guarda aparte del de Config.INDICATORS (ver state_path) y se reconstruye desde
+    el histórico si cambian las ventanas o los estimadores.
+    
+    Args:
+        symbol: Par de trading
+        interval: Intervalo de las velas
+        klines: Velas recién obtenidas
+        now_ms: Instante actual en ms (default: ahora)
+    
+    Returns:
+        Clasificación del régimen (ver classify_regime)
+    """
+    values = update_indicator_state(symbol, interval, klines, specs=volatility_specs(interval), now_ms=now_ms,
+                                    kind='volatility_state')
+    return classify_regime(values, interval)
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Volatilidad realizada y régimen de volatilidad')
+    parser.add_argument('--symbol', default='BTCUSDT', help='Par de trading (default: BTCUSDT)')
+    parser.add_argument('--interval', default=Config.KLINE_PRIMARY_INTERVAL,
+                        help=f"Intervalo de las velas (default: {Config.KLINE_PRIMARY_INTERVAL})")
+    
+    args = parser.parse_args()
+    
+    try:
+        history = load_history(args.symbol, args.interval)
+        if not history:
+            print(f"❌ No hay velas de {args.symbol} {args.interval} guardadas")
+            sys.exit(1)
+        results = compute_volatility(klines_to_arrays(history), args.interval)
+        
+        print(f"  {'estimador':<16}" + ''.join(f"{f'{days}d':>9}" for days in Config.VOLATILITY_WINDOWS_DAYS))
+        for estimator in Config.VOLATILITY_ESTIMATORS:
+            cells = [results[volatility_column(estimator, days)][-1] for days in Config.VOLATILITY_WINDOWS_DAYS]
+            print(f"  {estimator:<16}" + ''.join(f"{value:>8.1f}%" for value in cells))
+        
+        regime = classify_regime({name: None if np.isnan(values[-1]) else float(values[-1])
+                                  for name, values in results.items()}, args.interval)
+        codes = regime_codes(results[regime_specs(args.interval)[0]['alias']])
+        shares = {regime_label(code): f"{(codes == code).mean() * 100:.0f}%" for code in np.unique(codes)}
+        print(f"📊 Régimen {regime['regimen']} ({regime['tendencia']}); histórico de {len(history)} velas: {shares}")
+    
+    except Exception as e:
+        logger.error(f"Error en main: {e}")
+        print(f"❌ Error al calcular la volatilidad: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()